@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Executes a provisioning plan on the VPS, so that the whole plan costs a single round trip
+# instead of one per command. This file is sent to the VPS as is and run with its python3, it
+# must only depend on the standard library and remain compatible with the python3 release of
+# the supported Ubuntu versions (3.5).
+#
+# The plan is read as JSON from stdin and the progress is written to stdout, one JSON event per
+# line. The commands are built by the utility, the agent only sequences them and decides on
+# their results.
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import tempfile
+import threading
+import subprocess
+
+DEFAULT_DECODE = "utf-8"
+
+EXIT_FAILED = 1
+EXIT_UPLOAD_REQUIRED = 3
+
+EVENT_STEP = "step"
+EVENT_OUTPUT = "output"
+EVENT_DONE = "done"
+EVENT_UPLOAD = "upload"
+EVENT_FAILED = "failed"
+
+INITIAL_DELAY_SEC = 0.5
+MAX_DELAY_SEC = 4
+BACKOFF_FACTOR = 2
+
+LOG_POLL_INTERVAL_SEC = 1
+
+OUTPUT_POLL_INTERVAL_SEC = 0.1
+
+# Time given to the last of the output once the command exited, a daemon it forked may keep the
+# pipes open forever so their end can't be waited for
+OUTPUT_DRAIN_TIMEOUT_SEC = 0.5
+
+class StepError(Exception):
+    """A step of the plan failed, the message is reported to the utility."""
+
+class UploadRequired(Exception):
+    """A step needs a file that is sent by the utility before the plan is run again.
+
+    Args:
+        path (str): Full path of the file on this host.
+    """
+
+    def __init__(self, path):
+        Exception.__init__(self, path)
+        self.path = path
+
+def readLines(stream, name, lines):
+    """Queue the lines of a pipe until its end, to be run in a thread.
+
+    Args:
+        stream (obj): The pipe to be read.
+        name (str): The name of the stream, queued along with every line.
+        lines (obj): The queue receiving the lines, and None once the pipe is closed.
+    """
+    with stream:
+        for line in iter(stream.readline, b""):
+            lines.put((name, line))
+
+    lines.put((name, None))
+
+class Host(object):
+    """Runs the commands of the plan and accesses the files of this host."""
+
+    def run(self, command, onLine=None):
+        """Run a shell command.
+
+        Args:
+            command (str): The command to be executed.
+            onLine (callable): Function called with every line of the stdout and stderr of the command as soon
+                as it is written, both are then returned as stdout.
+
+        Returns:
+            3-Tuple: Tuple containing the exit status, stdout and stderr of the command.
+        """
+        proc = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT if onLine else subprocess.PIPE)
+
+        streams = {"output": proc.stdout}
+        if onLine is None:
+            streams["errors"] = proc.stderr
+
+        # The pipes are read by threads so that the exit of the command can be noticed even if
+        # a daemon it forked keeps them open
+        lines = queue.Queue()
+        for name, stream in streams.items():
+            threading.Thread(target=readLines, args=(stream, name, lines), daemon=True).start()
+
+        received = dict((name, list()) for name in streams)
+        pending = set(streams)
+        deadline = None
+
+        while pending:
+            if deadline is None and proc.poll() is not None:
+                deadline = time.time() + OUTPUT_DRAIN_TIMEOUT_SEC
+            elif deadline is not None and time.time() >= deadline:
+                break
+
+            try:
+                name, line = lines.get(timeout=OUTPUT_POLL_INTERVAL_SEC)
+            except queue.Empty:
+                continue
+
+            if line is None:
+                pending.discard(name)
+                continue
+
+            received[name].append(line.decode(DEFAULT_DECODE, "replace"))
+
+            if onLine is not None:
+                onLine(received[name][-1])
+
+        proc.wait()
+
+        return (proc.returncode, "".join(received["output"]), "".join(received.get("errors", [])))
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def readFile(self, path):
+        """Read a text file.
+
+        Args:
+            path (str): Full path to the file.
+
+        Returns:
+            Str: The contents of the file, None if it doesn't exist.
+        """
+        try:
+            with open(path) as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def writeFile(self, path, contents):
+        """Replace the contents of a text file, creating its directory if necessary.
+
+        Args:
+            path (str): Full path to the file.
+            contents (str): The new contents of the file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Never leave a partially written file behind. The directory may be writable by other
+        # users, the temporary file is created exclusively under a random name
+        descriptor, temporaryPath = tempfile.mkstemp(dir=os.path.dirname(path))
+
+        try:
+            with os.fdopen(descriptor, "w") as f:
+                f.write(contents)
+
+            os.replace(temporaryPath, path)
+        except BaseException:
+            os.remove(temporaryPath)
+            raise
+
+    def waitForLog(self, path, pattern, timeout):
+        """Follow a log file until a line matches a pattern.
+
+        The file may not exist yet, and is read from its start if it is truncated or replaced.
+
+        Args:
+            path (str): Full path to the log file.
+            pattern (str): Regular expression searched in every line.
+            timeout (float): The maximum number of seconds to wait for.
+
+        Returns:
+            Str: The first matching line.
+        """
+        deadline = time.time() + timeout
+        offset = 0
+        partial = ""
+
+        while True:
+            if os.path.exists(path):
+                if os.path.getsize(path) < offset:
+                    offset = 0
+                    partial = ""
+
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+
+                offset += len(data)
+                lines = (partial + data.decode(DEFAULT_DECODE, "replace")).split("\n")
+                partial = lines.pop()
+
+                for line in lines:
+                    if re.search(pattern, line):
+                        return line
+
+            if time.time() >= deadline:
+                raise StepError("Timed out after {0} seconds waiting for {1} in {2}".format(timeout, pattern, path))
+
+            self.sleep(LOG_POLL_INTERVAL_SEC)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class Agent(object):
+    """Executes the steps of a plan on a host.
+
+    Args:
+        host (obj): The Host the commands are run on.
+        emit (callable): Function called with every progress event.
+    """
+
+    def __init__(self, host, emit):
+        self.host = host
+        self.emit = emit
+
+        self.actions = {"run": self.run,
+                        "require": self.require,
+                        "refuse": self.refuse,
+                        "unless": self.unless,
+                        "writeFile": self.writeFile,
+                        "stopDaemon": self.stopDaemon,
+                        "startDaemon": self.startDaemon,
+                        "waitForLog": self.waitForLog}
+
+    def output(self, text):
+        if text.strip():
+            self.emit({"event": EVENT_OUTPUT, "text": text.rstrip("\n")})
+
+    def execute(self, command):
+        """Run a command, failing the step if it doesn't succeed.
+
+        Its output is sent line by line while it runs, so that long commands (e.g. apt-get) report their progress.
+
+        Returns:
+            Str: The stdout and stderr of the command.
+        """
+        exitStatus, output, errors = self.host.run(command, self.output)
+
+        if exitStatus != 0:
+            raise StepError("Command: \"{0}\" failed with status: {1} {2}".format(command, exitStatus, errors.strip()).strip())
+
+        return output + errors
+
+    def succeeds(self, command):
+        return self.host.run(command)[0] == 0
+
+    def waitUntil(self, condition, timeout, description):
+        deadline = time.time() + timeout
+        delay = INITIAL_DELAY_SEC
+
+        while True:
+            if condition():
+                return
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise StepError("Timed out after {0} seconds waiting for {1}".format(timeout, description))
+
+            self.host.sleep(min(delay, remaining))
+            delay = min(delay * BACKOFF_FACTOR, MAX_DELAY_SEC)
+
+    def run(self, step):
+        self.execute(step["command"])
+
+    def require(self, step):
+        output = self.execute(step["command"])
+
+        if step["contains"] not in output:
+            raise StepError(step["error"])
+
+    def refuse(self, step):
+        if self.succeeds(step["command"]):
+            raise StepError(step["error"])
+
+    def unless(self, step):
+        if self.succeeds(step["test"]):
+            self.output(step.get("message", ""))
+            return
+
+        upload = step.get("upload")
+        if upload and not self.host.exists(upload):
+            raise UploadRequired(upload)
+
+        self.execute(step["command"])
+
+    def writeFile(self, step):
+        existing = self.host.readFile(step["path"])
+        contents = step["contents"]
+
+        # Keep the values of the existing file so that re-runs produce the same file
+        if existing:
+            values = dict(line.split("=", 1) for line in existing.splitlines() if "=" in line)
+
+            for key in step.get("keep", []):
+                if values.get(key):
+                    contents = re.sub(r"(?m)^{0}=.*$".format(re.escape(key)), lambda match: "{0}={1}".format(key, values[key]), contents)
+
+        if contents == existing:
+            self.output("{0} is unchanged.. skipping.".format(step["path"]))
+            return
+
+        self.host.writeFile(step["path"], contents)
+
+    def stopDaemon(self, step):
+        if not self.succeeds(step["running"]):
+            return
+
+        self.execute(step["command"])
+        self.waitUntil(lambda: not self.succeeds(step["running"]), step["timeout"], "the daemon to stop")
+
+    def startDaemon(self, step):
+        self.execute(step["command"])
+
+        def isReady():
+            if self.succeeds(step["ready"]):
+                return True
+
+            if not self.succeeds(step["running"]):
+                raise StepError("Daemon exited on VPS")
+
+            return False
+
+        try:
+            self.waitUntil(isReady, step["timeout"], "the daemon to answer RPC calls")
+        except StepError:
+            if not self.succeeds(step["running"]):
+                raise
+
+            self.output("Daemon is running but not answering RPC calls yet, continuing..")
+
+    def waitForLog(self, step):
+        self.output(self.host.waitForLog(step["path"], step["pattern"], step["timeout"]))
+
+    def runStep(self, step):
+        self.actions[step["action"]](step)
+
+def runPlan(plan, host, emit):
+    """Execute the steps of a plan in order, stopping at the first one that fails.
+
+    Args:
+        plan (dict): The plan, its steps each have a name, an action and the arguments of the action.
+        host (obj): The Host the commands are run on.
+        emit (callable): Function called with every progress event.
+
+    Returns:
+        Int: The exit status of the agent, 0 once every step is done.
+    """
+    agent = Agent(host, emit)
+
+    for step in plan["steps"]:
+        emit({"event": EVENT_STEP, "step": step["name"]})
+
+        try:
+            agent.runStep(step)
+        except UploadRequired as e:
+            emit({"event": EVENT_UPLOAD, "step": step["name"], "path": e.path})
+            return EXIT_UPLOAD_REQUIRED
+        except StepError as e:
+            emit({"event": EVENT_FAILED, "step": step["name"], "error": str(e)})
+            return EXIT_FAILED
+        except Exception as e:
+            emit({"event": EVENT_FAILED, "step": step["name"], "error": "{0}: {1}".format(type(e).__name__, str(e))})
+            return EXIT_FAILED
+
+        emit({"event": EVENT_DONE, "step": step["name"]})
+
+    return 0
+
+def emitLine(event):
+    """Write an event to stdout as a JSON line, flushed so that the utility receives it at once."""
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+def main():
+    plan = json.loads(sys.stdin.read())
+    return runPlan(plan, Host(), emitLine)
+
+if __name__ == "__main__":
+    sys.exit(main())
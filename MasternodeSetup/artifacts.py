@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import hashlib
+
+from urllib.request import urlopen
+
+from . import trace
+from . import storage
+
+CHUNK_SIZE = 1024 * 1024
+
+CHECKSUM_ALGORITHM = "sha256"
+CHECKSUM_FILE_SUFFIX = ".sha256"
+CHECKSUM_ASSET_PATTERNS = ("SHA256SUMS", "sha256sums", "checksums")
+
+# One lock per cached file so that concurrent workers download it once
+downloadLocks = storage.KeyedLocks()
+
+# The checksums of the assets downloaded by this run without a published checksum, keyed by path.
+# They are shared by the VPS instances of the run but never trusted from the cache by later runs
+unverifiedChecksums = dict()
+
+def computeChecksum(path):
+    """Compute the checksum of a local file.
+
+    Args:
+        path (str): Full path to the file.
+
+    Returns:
+        String: The hex digest of the file.
+    """
+    digest = hashlib.new(CHECKSUM_ALGORITHM)
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def getPublishedChecksum(release, asset):
+    """Get the checksum published for a release asset, if any.
+
+    The digest reported by github for the asset is used first, followed by a checksum file
+    published along with the release (e.g. SHA256SUMS or <asset>.sha256).
+
+    Args:
+        release (dict): The release, as returned by the github releases api.
+        asset (dict): The asset of the release to be checked.
+
+    Returns:
+        String: The hex digest of the asset, or None if no checksum was published.
+    """
+    digest = asset.get("digest") or ""
+    if digest.startswith(CHECKSUM_ALGORITHM + ":"):
+        return digest.split(":", 1)[1].lower()
+
+    for candidate in release.get("assets", []):
+        name = candidate["name"]
+
+        if name == asset["name"] + CHECKSUM_FILE_SUFFIX or any(pattern in name for pattern in CHECKSUM_ASSET_PATTERNS):
+            contents = urlopen(candidate["browser_download_url"]).read().decode("utf-8", "replace")
+
+            # Lines are formatted as: <checksum> [*]<file name>
+            for line in contents.splitlines():
+                fields = line.split()
+
+                if len(fields) == 1 and name == asset["name"] + CHECKSUM_FILE_SUFFIX:
+                    return fields[0].lower()
+
+                if len(fields) == 2 and fields[1].lstrip("*") == asset["name"]:
+                    return fields[0].lower()
+
+    return None
+
+def download(url, path):
+    """Download a file, the destination only appears once the download is complete.
+
+    Args:
+        url (str): The url of the file.
+        path (str): Full path of the destination file.
+    """
+    partialPath = path + ".part"
+
+    with trace.span("download", trace.NETWORK, url=url), urlopen(url) as response, open(partialPath, "wb") as f:
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+            f.write(chunk)
+
+    os.replace(partialPath, path)
+
+def getAsset(release, asset):
+    """Get a release asset from the local cache, downloading and verifying it if necessary.
+
+    The checksum of the asset is stored next to it. Assets without a published checksum are not
+    cached, they are downloaded again by every run (once for all its VPS instances) with a warning.
+
+    Args:
+        release (dict): The release, as returned by the github releases api.
+        asset (dict): The asset of the release to be returned.
+
+    Returns:
+        2-Tuple: Tuple containing the full path of the cached asset and its checksum.
+    """
+    path = os.path.join(storage.getDirectory("artifacts", release["tag_name"]), asset["name"])
+    checksumPath = path + CHECKSUM_FILE_SUFFIX
+
+    with downloadLocks.get(path):
+        if path in unverifiedChecksums and computeChecksum(path) == unverifiedChecksums[path]:
+            return (path, unverifiedChecksums[path])
+
+        if os.path.exists(path) and os.path.exists(checksumPath):
+            with open(checksumPath) as f:
+                checksum = f.read().strip()
+
+            if computeChecksum(path) == checksum:
+                return (path, checksum)
+
+            print("Cached release {0} is corrupted, downloading it again..".format(asset["name"]))
+
+        print("Downloading release: {0}".format(asset["browser_download_url"]))
+        download(asset["browser_download_url"], path)
+
+        checksum = computeChecksum(path)
+        expected = getPublishedChecksum(release, asset)
+
+        if expected is not None and checksum != expected:
+            os.remove(path)
+            raise ValueError("Checksum mismatch for release {0}: expected {1}, got {2}".format(asset["name"], expected, checksum))
+
+        if expected is None:
+            print("Warning: no checksum is published for release {0}, it can't be verified and is not cached".format(asset["name"]))
+
+            # A cached checksum left by a previous version of this utility must not be trusted either
+            if os.path.exists(checksumPath):
+                os.remove(checksumPath)
+
+            unverifiedChecksums[path] = checksum
+            return (path, checksum)
+
+        with open(checksumPath, "w") as f:
+            f.write(checksum)
+
+        return (path, checksum)
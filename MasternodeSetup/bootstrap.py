@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import tarfile
+import posixpath
+
+from . import vps
+from . import artifacts
+
+# The directories of the local data directory making up the blockchain snapshot
+SNAPSHOT_DIRECTORIES = ("blocks", "chainstate")
+
+HAS_BLOCKCHAIN_COMMAND = "test -d {0}/blocks"
+EXTRACT_SNAPSHOT_COMMAND = "mkdir -p {0} && tar xzf {1} -C {0} && rm -f {1}"
+
+def buildSnapshot(dataDirectory, snapshotPath):
+    """Build a compressed blockchain snapshot from a local data directory.
+
+    The daemon using the data directory must be stopped while the snapshot is built.
+
+    Args:
+        dataDirectory (str): Full path to the local coin data directory.
+        snapshotPath (str): Full path of the snapshot to be created (.tar.gz).
+    """
+    print("Building blockchain snapshot: {0}".format(snapshotPath))
+
+    directories = [name for name in SNAPSHOT_DIRECTORIES if os.path.isdir(os.path.join(dataDirectory, name))]
+
+    if not directories:
+        raise ValueError("No blockchain found in {0}".format(dataDirectory))
+
+    partialPath = snapshotPath + ".part"
+
+    with tarfile.open(partialPath, "w:gz") as snapshot:
+        for name in directories:
+            snapshot.add(os.path.join(dataDirectory, name), arcname=name)
+
+    os.replace(partialPath, snapshotPath)
+
+    checksum = getSnapshotChecksum(snapshotPath)
+    print("Snapshot created, checksum: {0}\n".format(checksum))
+
+def getSnapshotChecksum(snapshotPath):
+    """Get the checksum of a snapshot, computed once and stored next to it.
+
+    Args:
+        snapshotPath (str): Full path to the snapshot.
+
+    Returns:
+        String: The sha256 checksum of the snapshot.
+    """
+    checksumPath = snapshotPath + artifacts.CHECKSUM_FILE_SUFFIX
+
+    if os.path.exists(checksumPath) and os.path.getmtime(checksumPath) >= os.path.getmtime(snapshotPath):
+        with open(checksumPath) as f:
+            return f.read().strip()
+
+    checksum = artifacts.computeChecksum(snapshotPath)
+
+    with open(checksumPath, "w") as f:
+        f.write(checksum)
+
+    return checksum
+
+def getSnapshotRemotePath(snapshotPath):
+    """Get the path the snapshot is sent to on the VPS.
+
+    The snapshot is staged in the private directory of the SSH user, so that it can't be replaced
+    between the verification of its checksum and its extraction.
+
+    Args:
+        snapshotPath (str): Full path to the local snapshot (.tar.gz).
+
+    Returns:
+        Str: The path of the snapshot, relative to the home directory of the user.
+    """
+    return posixpath.join(vps.REMOTE_PRIVATE_DIRECTORY, os.path.basename(snapshotPath))
+
+def seedVpsBlockchain(channel, snapshotPath, dataDirectory):
+    """Seed the VPS data directory with a blockchain snapshot so that the daemon doesn't sync from scratch.
+
+    The snapshot may contain the blocks and chainstate directories or a bootstrap.dat file.
+    VPS instances that already hold a blockchain are left untouched. The daemon must be stopped.
+
+    Args:
+        channel (obj): The client object returned by the vps open function.
+        snapshotPath (str): Full path to the local snapshot (.tar.gz).
+        dataDirectory (str): Full path of the coin data directory on the VPS.
+    """
+    exitStatus, output, errors = vps.runCommand(channel, HAS_BLOCKCHAIN_COMMAND.format(dataDirectory))
+
+    if exitStatus == 0:
+        print("VPS already contains a blockchain.. skipping bootstrap.\n")
+        return
+
+    checksum = getSnapshotChecksum(snapshotPath)
+    remotePath = getSnapshotRemotePath(snapshotPath)
+
+    print("Sending blockchain snapshot to VPS..")
+    vps.makePrivateDirectory(channel)
+    vps.uploadFileResumable(channel, snapshotPath, remotePath, checksum)
+
+    vps.sendCommand(channel, EXTRACT_SNAPSHOT_COMMAND.format(dataDirectory, remotePath))
+    print("Blockchain snapshot extracted to {0}\n".format(dataDirectory))
+
+def getSeedStep(snapshotPath, dataDirectory):
+    """Get the agent step seeding the VPS data directory, the counterpart of seedVpsBlockchain.
+
+    Args:
+        snapshotPath (str): Full path to the local snapshot (.tar.gz).
+        dataDirectory (str): Full path of the coin data directory on the VPS.
+
+    Returns:
+        3-Tuple: Tuple containing the step, the path the snapshot is sent to and the function sending it.
+    """
+    remotePath = getSnapshotRemotePath(snapshotPath)
+
+    def upload(channel):
+        print("Sending blockchain snapshot to VPS..")
+        vps.makePrivateDirectory(channel)
+        vps.uploadFileResumable(channel, snapshotPath, remotePath, getSnapshotChecksum(snapshotPath))
+
+    step = {"name": "bootstrapVpsBlockchain",
+            "action": "unless",
+            "test": HAS_BLOCKCHAIN_COMMAND.format(dataDirectory),
+            "command": EXTRACT_SNAPSHOT_COMMAND.format(dataDirectory, remotePath),
+            "upload": remotePath,
+            "message": "VPS already contains a blockchain.. skipping bootstrap."}
+
+    return (step, remotePath, upload)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import hashlib
+import threading
+
+from . import storage
+
+def getJournalFilename(name):
+    """Get the name of the journal file of a masternode.
+
+    The name comes from the inventory, any character that is not safe in a file name (e.g. a path
+    separator) is replaced and a hash of the name keeps the files of similar names apart.
+
+    Args:
+        name (str): The name of the masternode.
+
+    Returns:
+        Str: The file name of the journal.
+    """
+    return "{0}-{1}.json".format(re.sub(r"[^\w-]", "_", name), hashlib.sha1(name.encode("utf-8")).hexdigest()[:8])
+
+class Journal(object):
+    """Per masternode record of the completed provisioning steps and their results.
+
+    Every change is saved immediately so that a failed or interrupted run may be resumed
+    at the first incomplete step.
+    """
+
+    def __init__(self, name, server):
+        self.name = name
+        self.path = os.path.join(storage.getDirectory("journal"), getJournalFilename(name))
+        self.lock = threading.Lock()
+
+        self.entries = storage.loadJson(self.path, dict())
+
+        recordedServer = self.entries.setdefault("server", server)
+        if recordedServer != server:
+            message = "Masternode {0} was previously setup on VPS {1}, remove {2} to start over".format(name, recordedServer, self.path)
+            raise ValueError(message)
+
+        self.entries.setdefault("steps", dict())
+
+    def isResumed(self):
+        """Check if a previous run of this masternode recorded any progress.
+
+        Returns:
+            Boolean: True if at least one step or value was recorded.
+        """
+        return len(self.entries) > 2 or len(self.entries["steps"]) > 0
+
+    def get(self, key, default=None):
+        """Get a value recorded by a previous step.
+
+        Args:
+            key (str): The name of the value.
+            default (obj): The value returned if nothing was recorded.
+
+        Returns:
+            Obj: The recorded value.
+        """
+        with self.lock:
+            return self.entries.get(key, default)
+
+    def set(self, key, value):
+        """Record a value and save the journal.
+
+        Args:
+            key (str): The name of the value.
+            value (obj): The value, must be JSON serializable.
+        """
+        with self.lock:
+            self.entries[key] = value
+            storage.saveJson(self.path, self.entries)
+
+    def isDone(self, step):
+        """Check if a step was completed.
+
+        Args:
+            step (str): The name of the step.
+
+        Returns:
+            Boolean: True if the step was completed, False otherwise.
+        """
+        with self.lock:
+            return self.entries["steps"].get(step, False)
+
+    def markDone(self, step):
+        """Record a step as completed and save the journal.
+
+        Args:
+            step (str): The name of the step.
+        """
+        with self.lock:
+            self.entries["steps"][step] = True
+            storage.saveJson(self.path, self.entries)
+
+    def clear(self):
+        """Remove the journal, to be called once the masternode is fully setup."""
+        with self.lock:
+            self.entries = {"server": self.entries["server"], "steps": dict()}
+
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+def runStep(journal, step, function):
+    """Run a provisioning step unless the journal records it as completed.
+
+    Args:
+        journal (obj): The Journal of the masternode, or None to always run the step.
+        step (str): The name of the step.
+        function (callable): Function executing the step.
+    """
+    if journal is not None and journal.isDone(step):
+        print("Step {0} was completed by a previous run.. skipping.\n".format(step))
+        return
+
+    function()
+
+    if journal is not None:
+        journal.markDone(step)
@@ -22,8 +22,247 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from . import masternode
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
 
-def main():
+DESCRIPTION = "Setup, monitor and query Cosmos masternodes"
+
+COMMAND_PROVISION = "provision"
+COMMAND_STATUS = "status"
+COMMAND_SYNC_WAIT = "sync-wait"
+COMMAND_CONF = "conf"
+COMMAND_MONITOR = "monitor"
+
+COMMANDS = (COMMAND_PROVISION, COMMAND_STATUS, COMMAND_SYNC_WAIT, COMMAND_CONF, COMMAND_MONITOR)
+
+WARMUP_POLL_INTERVAL_SEC = 1
+
+# The modules used by each subcommand are only imported once it runs, so that the local queries
+# (status, sync-wait and conf) start without loading the SSH stack (paramiko and cryptography)
+
+def connectLocalWallet(config):
+    """Connect to the local daemon over JSON-RPC.
+
+    Args:
+        config (dict): Dictionary containing the options parsed.
+
+    Returns:
+        String: The full path of the local cli binary.
+    """
+    from . import daemon
+    from . import settings
+
+    settings.checkIfEnvironmentDefined(config["Environment"]["Home"], config["Environment"]["User"])
+
+    cli, daemonCli = settings.getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
+    walletConfFile, masternodeConfFile = settings.getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
+
+    daemon.configureRpc(cli, walletConfFile, int(config["Coin"]["RpcPort"]))
+    return cli
+
+def readMasternodeConf(config):
+    """Read the entries of the local masternode conf file.
+
+    Args:
+        config (dict): Dictionary containing the options parsed.
+
+    Returns:
+        List: The alias, address, key, txid and output index of each masternode.
+    """
+    from . import settings
+
+    walletConfFile, masternodeConfFile = settings.getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
+
+    if not os.path.exists(masternodeConfFile):
+        return list()
+
+    with open(masternodeConfFile) as f:
+        return [line.split() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def provision(argv):
+    """Setup one masternode, or every masternode of an inventory (see masternode.setup)."""
+    from . import masternode
+
+    masternode.setup(argv, "{0} {1}".format(os.path.basename(sys.argv[0]), COMMAND_PROVISION))
+
+def status(args):
+    """Print the state of the local wallet.
+
+    Returns:
+        Int: The exit code, 0 if the daemon is running and synced.
+    """
+    from . import rpc
+    from . import sync
+    from . import daemon
+    from . import settings
+
+    try:
+        config = settings.getConfig()
+        cli = connectLocalWallet(config)
+        masternodes = len(readMasternodeConf(config))
+    except (ValueError, OSError) as e:
+        print("Wallet status failed. Reason: {0}.".format(e))
+        return 1
+
+    values = {"running": False, "synced": False, "masternodes": masternodes}
+
+    try:
+        info = json.loads(daemon.getBlockchainInfo(cli))
+        values.update(running=True, blocks=info.get("blocks"), headers=info.get("headers"), synced=sync.isSynced(cli, info))
+        values.update(balance=float(daemon.getTotalBalance(cli)))
+    except (rpc.RpcError, ValueError) as e:
+        values.update(running=True, synced=False, error=str(e))
+    except (OSError, subprocess.CalledProcessError):
+        values.update(running=False, synced=False, error="Local daemon is not running")
+
+    if args.json:
+        print(json.dumps(values, sort_keys=True))
+    elif "error" in values:
+        print("{0}, {1} masternodes configured".format(values["error"], values["masternodes"]))
+    else:
+        print("Local daemon running, {0} (block {1} of {2}), balance {3}, {4} masternodes configured".format(
+              "synced" if values["synced"] else "syncing", values["blocks"], values["headers"], values["balance"], values["masternodes"]))
+
+    return 0 if values["synced"] else 1
+
+def syncWait(args):
+    """Wait for the local wallet to be synced.
+
+    Returns:
+        Int: The exit code, 0 once synced.
+    """
+    from . import rpc
+    from . import sync
+    from . import trace
+    from . import settings
+
+    deadline = time.time() + args.timeout if args.timeout else None
+
+    def checkDeadline():
+        if deadline is not None and time.time() >= deadline:
+            raise ValueError("Timed out after {0} seconds waiting for the wallet to be synced".format(args.timeout))
+
+    def onProgress(progress):
+        checkDeadline()
+
+        if not args.quiet:
+            sync.printProgress(progress)
+
+    try:
+        cli = connectLocalWallet(settings.getConfig())
+
+        while True:
+            try:
+                sync.waitForSync(cli, onProgress)
+                break
+            except rpc.RpcError as e:
+                if e.code != rpc.RPC_IN_WARMUP:
+                    raise
+
+                checkDeadline()
+                trace.sleep(WARMUP_POLL_INTERVAL_SEC, "wait for warmup")
+    except (ValueError, OSError, rpc.RpcError, subprocess.CalledProcessError) as e:
+        print("Wallet sync failed. Reason: {0}.".format(str(e) or "local daemon is not running"))
+        return 1
+
+    if not args.quiet:
+        print("Wallet is synced.")
+
+    return 0
+
+def conf(args):
+    """Print the configuration, a single option or the masternodes of the local masternode conf file.
+
+    Returns:
+        Int: The exit code, 0 unless the option doesn't exist.
+    """
+    from . import settings
+
+    config = settings.getConfig()
+
+    if args.masternodes:
+        for entry in readMasternodeConf(config):
+            print(" ".join(entry))
+    elif args.option:
+        section, separator, option = args.option.partition(".")
+
+        if not separator or not config.has_option(section, option):
+            print("Unknown option: {0}, expected SECTION.OPTION (e.g. Coin.Collateral)".format(args.option))
+            return 1
+
+        print(config[section][option])
+    else:
+        config.write(sys.stdout)
+
+    return 0
+
+def monitorFleet(args):
+    """Collect the health of every masternode of an inventory on a schedule (see monitor.monitor)."""
+    from . import vps
+    from . import fleet
+    from . import monitor
+    from . import settings
+
+    interval = monitor.DEFAULT_INTERVAL_SEC if args.interval is None else args.interval
+    workers = monitor.DEFAULT_WORKERS if args.workers is None else args.workers
+
+    try:
+        monitor.monitor(fleet.readInventory(args.inventory), settings.getConfig(), args.monitor_file, interval, args.cycles, workers)
+    finally:
+        vps.closeAllChannels()
+
+    return 0
+
+def getParser():
+    """Build the parser of the subcommands, provision is parsed by masternode.setup."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION, epilog="Run with the options of provision and no subcommand for the previous command line.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    commands.add_parser(COMMAND_PROVISION, help="Setup a masternode, or every masternode of an inventory (see provision --help)", add_help=False)
+
+    command = commands.add_parser(COMMAND_STATUS, help="Print the state of the local wallet, exits with 1 unless it is running and synced")
+    command.add_argument("--json", action="store_true", help="Print a JSON object instead")
+
+    command = commands.add_parser(COMMAND_SYNC_WAIT, help="Wait for the local wallet to be synced")
+    command.add_argument("--timeout", action="store", type=float, default=0, help="The maximum number of seconds to wait for, 0 to wait until synced")
+    command.add_argument("--quiet", action="store_true", help="Don't print the progress")
+
+    command = commands.add_parser(COMMAND_CONF, help="Print the configuration, or a single option")
+    command.add_argument("option", nargs="?", metavar="SECTION.OPTION", help="The option to be printed, e.g. Coin.Collateral")
+    command.add_argument("--masternodes", action="store_true", help="Print the entries of the local masternode conf file instead")
+
+    command = commands.add_parser(COMMAND_MONITOR, help="Monitor the masternodes of an inventory")
+    command.add_argument("--inventory", action="store", required=True, help="A CSV or JSON file listing the name, host and password of the masternodes")
+    command.add_argument("--interval", action="store", type=float, help="The number of seconds between two cycles")
+    command.add_argument("--cycles", action="store", type=int, default=0, help="The number of cycles, 0 to monitor until interrupted")
+    command.add_argument("--workers", action="store", type=int, help="The maximum number of VPS servers checked concurrently")
+    command.add_argument("--monitor-file", action="store", metavar="FILE", help="The file the samples are appended to, one JSON line per masternode and cycle")
+
+    return parser
+
+def main(argv=None):
     """This is the top level command line function that will be called."""
-    masternode.setup()
\ No newline at end of file
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == COMMAND_PROVISION:
+        return provision(argv[1:])
+
+    if argv and argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        # The options of the previous versions, without subcommand
+        return provision(argv)
+
+    args = getParser().parse_args(argv)
+
+    if args.command is None:
+        getParser().print_help()
+        sys.exit(2)
+
+    handlers = {COMMAND_STATUS: status, COMMAND_SYNC_WAIT: syncWait, COMMAND_CONF: conf, COMMAND_MONITOR: monitorFleet}
+    sys.exit(handlers[args.command](args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import subprocess
+
+from . import rpc
+from . import trace
+from . import daemon
+
+# Kept below the RPC client timeout so that the long poll is not mistaken for a dropped connection
+WAIT_FOR_BLOCK_TIMEOUT_SEC = 30
+
+# Used when the daemon doesn't support waitfornewblock
+POLL_INTERVAL_SEC = 10
+
+CONFIRMATION_TIMEOUT_SEC = 3600
+
+class OutputIndex(object):
+    """View of the masternode outputs of the wallet, keyed by (txhash, outputidx)."""
+
+    def __init__(self):
+        self.outputs = dict()
+        self.outputIndexes = dict()
+
+    def update(self, output):
+        """Refresh the view with the latest masternode outputs, only the differences are applied.
+
+        Args:
+            output (str): The masternode outputs returned by the daemon.
+
+        Returns:
+            Int: The number of outputs that were not listed before.
+        """
+        values = json.loads(output)
+        keys = set((value["txhash"], int(value["outputidx"])) for value in values)
+
+        # Spent outputs are no longer listed
+        for key in set(self.outputs) - keys:
+            del self.outputs[key]
+            self.outputIndexes[key[0]].discard(key[1])
+
+        added = 0
+        for value in values:
+            key = (value["txhash"], int(value["outputidx"]))
+
+            if key not in self.outputs:
+                self.outputs[key] = value
+                self.outputIndexes.setdefault(key[0], set()).add(key[1])
+                added += 1
+
+        return added
+
+    def find(self, txid, outputIndex=None):
+        """Find the masternode output of a collateral transaction.
+
+        Args:
+            txid (str): The txid associated with the collateral.
+            outputIndex (int): The index of the output, required if the transaction funded several masternodes.
+
+        Returns:
+            Dict: The masternode output, or None if it is not listed (yet).
+        """
+        if outputIndex is not None:
+            return self.outputs.get((txid, outputIndex))
+
+        outputIndexes = self.outputIndexes.get(txid, set())
+
+        if len(outputIndexes) > 1:
+            raise ValueError("Transaction: {0} has several masternode outputs, the output index is required".format(txid))
+
+        return self.outputs[(txid, next(iter(outputIndexes)))] if outputIndexes else None
+
+def waitForNewBlock(cli, timeout):
+    """Long poll the daemon until it receives a new block.
+
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        timeout (float): The maximum number of seconds to wait for.
+
+    Returns:
+        Boolean: False if the daemon doesn't support waiting for a block, True otherwise.
+    """
+    try:
+        with trace.span("wait for new block", trace.SLEEP):
+            daemon.waitForNewBlock(cli, int(timeout * 1000))
+    except rpc.RpcError as e:
+        if e.code != rpc.RPC_METHOD_NOT_FOUND:
+            raise
+
+        return False
+    except subprocess.CalledProcessError:
+        return False
+
+    return True
+
+def waitForOutputs(cli, index, pending, timeout=CONFIRMATION_TIMEOUT_SEC):
+    """Wait for the collateral of several masternodes to be listed in the masternode outputs.
+
+    Depending on the wallet, a new collateral is only listed once it has enough confirmations.
+    Rather than polling, the daemon is asked to return as soon as a new block arrives, then the
+    outputs are refreshed once for all the masternodes still waiting.
+
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        index (obj): The OutputIndex, already refreshed with the latest masternode outputs.
+        pending (dict): Dictionary mapping each masternode to its (txid, output index) tuple, the index may be None.
+        timeout (float): The maximum number of seconds to wait for.
+
+    Returns:
+        Dict: Dictionary mapping each masternode to its masternode output.
+    """
+    pending = dict(pending)
+    resolved = dict()
+
+    deadline = time.time() + timeout
+    isLongPollSupported = True
+
+    while True:
+        for name, (txid, outputIndex) in list(pending.items()):
+            output = index.find(txid, outputIndex)
+
+            if output is not None:
+                resolved[name] = output
+                del pending[name]
+
+        if not pending:
+            return resolved
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise ValueError("Timed out after {0} seconds waiting for the collateral of: {1} to be confirmed".format(timeout, ", ".join(sorted(pending))))
+
+        print("Waiting for the collateral of {0} masternode(s) to be confirmed..".format(len(pending)))
+
+        if isLongPollSupported:
+            isLongPollSupported = waitForNewBlock(cli, min(WAIT_FOR_BLOCK_TIMEOUT_SEC, remaining))
+
+        if not isLongPollSupported:
+            trace.sleep(min(POLL_INTERVAL_SEC, remaining), "wait for collateral confirmation")
+
+        index.update(daemon.getMasternodeOutputs(cli))
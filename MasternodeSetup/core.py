@@ -23,41 +23,54 @@
 # SOFTWARE.
 
 import os
+import re
 import glob
-import time
 import json
 
 import pprint
 import string
 import random
+import posixpath
 
 import getpass
 import subprocess
 
 from . import vps
+from . import rpc
+from . import sync
+from . import probe
+from . import trace
+from . import tasks
 from . import daemon
-
-from os import environ
+from . import bootstrap
+from . import confirmations
+from . import checkpoints
+from . import localdaemon
+from . import settings
 
 RPC_USER_LENGTH = 32
 RPC_PASSWORD_LENGTH = 32
 
 CONF_TEMPLATE_FILE = os.path.join(os.path.dirname(__file__), "conf", "conf.template")
 ACTIVATION_STRING = "waiting for remote activation"
+ACTIVATION_TIMEOUT_SEC = 1800
+
+LOCAL_DAEMON_START_TIMEOUT_SEC = 600
+
+# The error printed by the cli when the wallet is locked, e.g. "error code: -13" or {"code":-13,...}
+WALLET_LOCKED_PATTERN = re.compile(r"code\"?:\s*{0}\b".format(rpc.RPC_WALLET_UNLOCK_NEEDED))
+
+VPS_DAEMON_STOP_TIMEOUT_SEC = 120
+VPS_DAEMON_START_TIMEOUT_SEC = 120
+
+VPS_STOP_DAEMON_COMMAND = "su -c \"{0} stop\" {1}"
+VPS_START_DAEMON_COMMAND = "su -c \"{0} -daemon\" {1}"
+VPS_UPDATE_PERMISSIONS_COMMAND = "chmod -R 777 /home/{0}"
+VPS_CLEAR_DEBUG_FILE_COMMAND = "rm -rf {0}"
+
+# Conf file values kept from an existing file so that re-runs produce the same file
+VPS_CONF_KEPT_VALUES = ("rpcuser", "rpcpassword")
 
-def checkIfEnvironmentDefined(envHome, envUser):
-    """Checks if the required environment variables are defined.
-    
-    Args:
-        envHome (str): The name of the home environment variable.
-        envUser (str): The name of the user environment variable.
-    """
-    if envHome not in environ:
-        raise ValueError("Please set {0} environment variable".format(envHome))
-        
-    elif envUser not in environ:
-        raise ValueError("Please set {0} environment variable".format(envUser))
-       
 def checkIfWalletInstalled(cli, daemonCli):
     """Check if the local wallet is installed.
 
@@ -71,11 +84,12 @@ def checkIfWalletInstalled(cli, daemonCli):
     elif not glob.glob("{0}*".format(daemonCli)):
         raise ValueError("Unable to find file: {0}, please check your installation".format(daemonCli))
 
-def setupWallet(walletConfFile):
+def setupWallet(walletConfFile, rpcPort):
     """This function will setup the local wallet requirements.
     
     Args:
         walletConfFile (str): Full path to wallet conf file.
+        rpcPort (int): The RPC port to be used if the wallet conf file doesn't define one.
     """
     print("Setup wallet configuration..")
     if "rpcuser" not in open(walletConfFile).read():
@@ -88,12 +102,29 @@ def setupWallet(walletConfFile):
         with open(walletConfFile, "a") as f:
             f.write("rpcpassword={0}\n".format(generateRandomString(RPC_PASSWORD_LENGTH)))
     
+    if "rpcport" not in open(walletConfFile).read():
+        print("Creating rpcport setting..")
+        with open(walletConfFile, "a") as f:
+            f.write("rpcport={0}\n".format(rpcPort))
+    
     print("")
     
-def startLocalDaemon(daemonCli):
-    """Start the local daemon. Required to use the coin cli.
+def connectLocalRpc(cli, walletConfFile, rpcPort):
+    """Connect to the local daemon over JSON-RPC using the wallet conf credentials.
     
     Args:
+        cli (str): The full path of the local cli binary.
+        walletConfFile (str): Full path to wallet conf file.
+        rpcPort (int): The RPC port to be used if the wallet conf file doesn't define one.
+    """
+    daemon.configureRpc(cli, walletConfFile, rpcPort)
+    
+@trace.traced()
+def startLocalDaemon(cli, daemonCli):
+    """Start the local daemon and wait until it answers RPC calls. Required to use the coin cli.
+    
+    Args:
+        cli (str): The full path of the local cli binary.
         daemonCli (str): The full path of the local daemon binary.
         
     Returns:
@@ -101,19 +132,18 @@ def startLocalDaemon(daemonCli):
     """    
     print("Starting local daemon..")
     
+    proc = daemon.start(daemonCli)
+    
+    # Ensure that the daemon did not fail and is ready to be used
     try:
-        proc = daemon.start(daemonCli)
-        
-        # Ensure that the daemon did not fail and is still running
-        proc.communicate(timeout=20)
-    except subprocess.TimeoutExpired:
-        pass
-    else:
-        raise ValueError("Failed to start local daemon")
+        probe.waitForLocalDaemonReady(proc, cli, LOCAL_DAEMON_START_TIMEOUT_SEC)
+    except ValueError as e:
+        raise ValueError("Failed to start local daemon: {0}".format(str(e)))
         
     print("")
     return proc
 
+@trace.traced()
 def stopLocalDaemon(cli):
     """Stop the local daemon.
     
@@ -125,30 +155,90 @@ def stopLocalDaemon(cli):
         daemon.stop(cli)
     except:
         raise ValueError("Failed to stop local daemon")
+    finally:
+        daemon.closeRpc(cli)
         
     print("")
 
-def pollForWalletSync(cli):
+def getLocalDaemon(cli, daemonCli, keepRunning=False):
+    """Get the local daemon shared by the runs of this utility.
+    
+    Args:
+        cli (str): The full path of the local cli binary.
+        daemonCli (str): The full path of the local daemon binary.
+        keepRunning (bool): Leave the daemon running once this run is done with it.
+        
+    Returns:
+        Obj: The LocalDaemon object.
+    """
+    return localdaemon.LocalDaemon(cli, lambda: startLocalDaemon(cli, daemonCli), lambda: stopLocalDaemon(cli), keepRunning)
+
+def isLocalDaemonKept(config):
+    """Check if the local daemon is to be left running between runs.
+    
+    Args:
+        config (dict): Dictionary containing the options parsed by the utility.
+        
+    Returns:
+        Boolean: True if the daemon is kept running, False if it is stopped by the last run using it.
+    """
+    return config["Wallet"].getboolean("KeepDaemonRunning", fallback=False)
+
+def startLocalWallet(cli, daemonCli, walletConfFile, rpcPort, keepRunning=False):
+    """Setup the wallet configuration, then connect to the local daemon, starting it unless it is already running.
+    
+    Args:
+        cli (str): The full path of the local cli binary.
+        daemonCli (str): The full path of the local daemon binary.
+        walletConfFile (str): Full path to wallet conf file.
+        rpcPort (int): The RPC port to be used if the wallet conf file doesn't define one.
+        keepRunning (bool): Leave the daemon running once released, to be reused by the next run.
+        
+    Returns:
+        Obj: The LocalDaemon object, to be released once the wallet is no longer used.
+    """
+    setupWallet(walletConfFile, rpcPort)
+    connectLocalRpc(cli, walletConfFile, rpcPort)
+    
+    localDaemon = getLocalDaemon(cli, daemonCli, keepRunning)
+    localDaemon.acquire()
+    
+    return localDaemon
+
+def stopLocalWallet(config):
+    """Stop the local daemon left running by previous runs.
+    
+    Args:
+        config (dict): Dictionary containing the options parsed by the utility.
+    """
+    cli, daemonCli = settings.getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
+    walletConfFile, masternodeConfFile = settings.getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
+    
+    connectLocalRpc(cli, walletConfFile, int(config["Coin"]["RpcPort"]))
+    getLocalDaemon(cli, daemonCli).shutdown()
+
+@trace.traced()
+def pollForWalletSync(cli, onProgress=sync.printProgress, graph=None):
     """Poll for the wallet to be fully synced (on daemon).
     
     Utilizes the blockchain info RPC call to check that verification in progress
-    is at least 1.00. This field is an estimate of the synchronization status. 
-    Checking this number ensures we are in sync with a good confidence level.
+    is at least 1.00, or that all known blocks are downloaded and the daemon left
+    the initial block download (or its best block is recent). The polling interval
+    adapts to the observed block throughput.
     
     Args:
         cli (str): The full path of the local cli binary.
+        onProgress (callable): Function called with the sync progress after each poll.
+        graph (obj): The TaskGraph running this step, if any. Polling stops as soon as another task fails.
     """    
+    def onGraphProgress(progress):
+        graph.checkCancelled()
+        
+        if onProgress is not None:
+            onProgress(progress)
+    
     print("Wait for wallet to by synchronized..")
-    blockchaininfo = daemon.getBlockchainInfo(cli)
-    blockchainvalues = json.loads(blockchaininfo)
-
-    # Loop continuously until we know we are synced
-    while blockchainvalues["verificationprogress"] < 1:
-        blockchaininfo = daemon.getBlockchainInfo(cli)
-        blockchainvalues = json.loads(blockchaininfo)
-
-        print("Progress.. {0}%".format(blockchainvalues["verificationprogress"] * 100))
-        time.sleep(5)
+    sync.waitForSync(cli, onProgress if graph is None else onGraphProgress)
      
     print("")
             
@@ -162,6 +252,18 @@ def getTotalUnlockedBalance(cli):
         Int: The total unlocked balance present.
     """    
     output = daemon.listUnspent(cli)
+    
+    return sumUnspent(output)
+    
+def sumUnspent(output):
+    """Sum the amounts of the unspent outputs returned by the daemon.
+    
+    Args:
+        output (str): The listunspent output.
+        
+    Returns:
+        Int: The total unlocked balance present.
+    """
     values = json.loads(output)
     
     return sum(input['amount'] for input in values)
@@ -187,51 +289,114 @@ def unlockWallet(cli):
     
     print("")
     
-def sendCollateralToAddress(cli, address, collateral):
-    """Send the collateral amount to the specified address.
+def isWalletLocked(error):
+    """Check if a wallet call failed because the wallet must be unlocked first.
+    
+    Args:
+        error (obj): The exception raised by the call.
+        
+    Returns:
+        Boolean: True if the wallet is locked, False for any other error (e.g. a dropped connection).
+    """
+    if isinstance(error, rpc.RpcError):
+        return error.code == rpc.RPC_WALLET_UNLOCK_NEEDED
+    
+    if isinstance(error, subprocess.CalledProcessError):
+        return WALLET_LOCKED_PATTERN.search((error.output or b"").decode(daemon.DEFAULT_DECODE, "replace")) is not None
+    
+    return False
+    
+def sendWithUnlock(cli, send):
+    """Send a transaction, unlocking the wallet and sending it again if the wallet is locked.
     
     Args:
         cli (str): The full path of the local cli binary.
-        address (str): The address to be used for the masternode.
-        collateral (int): The collateral amount to be sent.
+        send (callable): Function sending the transaction and returning its txid.
         
     Returns:
         String: The txid associated with this transaction.
-    """    
+    """
     try:
         # If the wallet is not encrypted, no unlocking is necessary
-        txid = daemon.sendToAddress(cli, address, collateral)
+        txid = send()
     
-    except:
+    except (rpc.RpcError, subprocess.CalledProcessError) as e:
+        # Any other error may happen after the daemon sent the transaction, sending it again
+        # could pay the collateral twice. The next run finds it with the journal instead.
+        if not isWalletLocked(e):
+            raise
+        
         print("Wallet is locked, please unlock your wallet..")
             
         unlockWallet(cli)
-        txid = daemon.sendToAddress(cli, address, collateral)
+        txid = send()
     
     return txid
+    
+def sendCollateralToAddress(cli, address, collateral):
+    """Send the collateral amount to the specified address.
+    
+    Args:
+        cli (str): The full path of the local cli binary.
+        address (str): The address to be used for the masternode.
+        collateral (int): The collateral amount to be sent.
+        
+    Returns:
+        String: The txid associated with this transaction.
+    """    
+    return sendCollateralToAddresses(cli, [address], collateral)
 
-def getMasternodeOutput(cli, txid):
-    """Get the masternode output containing the masternode txid.
+def sendCollateralToAddresses(cli, addresses, collateral):
+    """Send the collateral amount to several addresses in a single transaction.
     
     Args:
         cli (str): The full path of the local cli binary.
+        addresses (list): The addresses to be used for the masternodes.
+        collateral (int): The collateral amount to be sent to each address.
+        
+    Returns:
+        String: The txid associated with this transaction.
+    """    
+    amounts = dict((address, collateral) for address in addresses)
+    
+    return sendWithUnlock(cli, lambda: daemon.sendMany(cli, amounts))
+
+def findCollateralOutputIndex(output, txid, address, collateral):
+    """Find the index of the collateral output sent to an address.
+    
+    Args:
+        output (str): The listunspent output of the masternode addresses.
         txid (str): The txid associated with the collateral.
+        address (str): The address of the masternode.
+        collateral (int): The collateral amount.
         
     Returns:
-        Dict: A dictionary containing the masternode output
-    """         
-    output = daemon.getMasternodeOutputs(cli)
+        Int: The output index, or None if the output is not listed.
+    """
     values = json.loads(output)
     
-    txValues = [value for value in values if value['txhash'] == txid]
+    matches = [value["vout"] for value in values if value["txid"] == txid and value.get("address") == address and value["amount"] == collateral]
     
-    # There should be a single match, check to be sure
-    if len(txValues) != 1:
-        raise ValueError("Transaction: {0} was not found in masternode outputs".format(txid))
+    return matches[0] if len(matches) == 1 else None
+
+def findCollateralTransaction(cli, address, collateral):
+    """Find a collateral transaction already sent to the specified address.
     
-    return txValues[0]
+    Args:
+        cli (str): The full path of the local cli binary.
+        address (str): The address used for the masternode.
+        collateral (int): The collateral amount.
+        
+    Returns:
+        String: The txid of the collateral transaction, or None if no collateral was sent.
+    """
+    values = json.loads(daemon.listUnspentForAddress(cli, address))
+    matches = [value for value in values if value["amount"] == collateral]
+    
+    return matches[0]["txid"] if matches else None
     
-def setupMasternodeTransaction(cli, label, collateral):
+@trace.traced()
+def setupMasternodeTransaction(cli, label, collateral, journal=None):
     """Performs a setup of the transactions required to create a masternode.
     
     Specifically:
@@ -245,38 +410,138 @@ def setupMasternodeTransaction(cli, label, collateral):
         cli (str): The full path of the local cli binary.
         label (str): The label to be used when generating a new address.
         collateral (int): The collateral amount to be sent.
+        journal (obj): The checkpoints Journal of the masternode, if any.
         
     Returns:
         2-Tuple: Tuple containing the masternode output and masternode key
     """         
+    journals = {label: journal} if journal is not None else None
+    return setupMasternodeTransactions(cli, [label], collateral, journals)[label]
+    
+@trace.traced()
+def setupMasternodeTransactions(cli, labels, collateral, journals=None):
+    """Performs a setup of the transactions required to create several masternodes.
+    
+    Independent calls are batched so that the number of wallet round trips does not
+    grow with the number of masternodes:
+    1. Check balance and generate the addresses
+    2. Send collateral to all the addresses in a single transaction
+    3. Get the masternode outputs, the collateral output of each address and the keys
+    
+    Each result is recorded in the masternode journal as soon as it is known. A resumed run
+    reuses the recorded address, txid and key, so collateral is never sent twice.
+    
+    Args:
+        cli (str): The full path of the local cli binary.
+        labels (list): The labels to be used when generating the new addresses.
+        collateral (int): The collateral amount to be sent to each address.
+        journals (dict): Dictionary mapping labels to the checkpoints Journal of the masternode, if any.
+        
+    Returns:
+        Dict: Dictionary mapping each label to a tuple containing the masternode output and masternode key
+    """         
     print("Setup masternode transaction..\n")
     
-    # First check we have enough balance
-    balance = getTotalUnlockedBalance(cli)
-    print("Collateral required: {0}, total unlocked balance: {1}".format(collateral, balance))
+    journals = journals or dict()
+    recorded = lambda label, key: journals[label].get(key) if label in journals else None
+    
+    def record(label, key, value):
+        if label in journals:
+            journals[label].set(key, value)
+    
+    results = dict()
+    
+    # Masternodes whose transactions were completed by a previous run
+    for label in labels:
+        if label in journals and journals[label].isDone("setupMasternodeTransaction"):
+            print("Masternode transaction for {0} was completed by a previous run.. skipping.\n".format(label))
+            results[label] = (recorded(label, "masternodeOutput"), recorded(label, "masternodeKey"))
+    
+    pending = [label for label in labels if label not in results]
+    if not pending:
+        return results
     
-    if balance < collateral:
+    # Check balance and generate new addresses for the masternodes
+    resumed = [label for label in pending if recorded(label, "address")]
+    generated = [label for label in pending if label not in resumed]
+    
+    requests = [daemon.listUnspentRequest(cli)] + [daemon.generateNewAddressRequest(cli, label) for label in generated]
+    outputs = daemon.batch(cli, requests)
+    
+    balance = sumUnspent(outputs[0])
+    
+    for label, output in zip(generated, outputs[1:]):
+        record(label, "address", output.strip())
+    
+    addresses = dict(zip(generated, [output.strip() for output in outputs[1:]]))
+    addresses.update((label, recorded(label, "address")) for label in resumed)
+    
+    # A previous run may have been interrupted after sending the collateral but before recording it
+    for label in resumed:
+        if not recorded(label, "txid"):
+            txid = findCollateralTransaction(cli, addresses[label], collateral)
+            
+            if txid is not None:
+                print("Found collateral sent by a previous run for {0}, txid: {1}".format(label, txid))
+                record(label, "txid", txid)
+    
+    unfunded = [label for label in pending if not recorded(label, "txid")]
+    print("Collateral required: {0}, total unlocked balance: {1}".format(collateral * len(unfunded), balance))
+    
+    if balance < collateral * len(unfunded):
         raise ValueError("Insufficient funds")    
     
-    # Generate new address for masternode
-    address = daemon.generateNewAddress(cli, label)
-    print("Send collateral to new address: {{{0}: {1}}}".format(label, address))
+    # Send collateral to new addresses, a single transaction (and fee) funds all of them
+    txids = dict((label, recorded(label, "txid")) for label in pending)
+    if unfunded:
+        for label in unfunded:
+            print("Send collateral to new address: {{{0}: {1}}}".format(label, addresses[label]))
+        
+        if len(unfunded) == 1:
+            txid = sendCollateralToAddress(cli, addresses[unfunded[0]], collateral)
+        else:
+            txid = sendCollateralToAddresses(cli, [addresses[label] for label in unfunded], collateral)
+        
+        for label in unfunded:
+            record(label, "txid", txid)
+            txids[label] = txid
+            
+        print("Sent collateral successfully, txid: {0}\n".format(txid))
     
-    # Send collateral to new address
-    txid = sendCollateralToAddress(cli, address, collateral)
-    print("Sent collateral successfully, txid: {0}\n".format(txid))
+    # Get masternode outputs associated with collateral and the masternode keys to be used
+    print("Get masternode output and key..")
+    keyless = [label for label in pending if not recorded(label, "masternodeKey")]
     
-    # Get masternode output associated with collateral
-    print("Get masternode output..")
-    masternodeOutput = getMasternodeOutput(cli, txid)
-    print("Masternode output:\n{0}\n".format(masternodeOutput))
+    # The unspent outputs of the addresses tell which output of a shared transaction funds which masternode
+    requests = [daemon.getMasternodeOutputsRequest(cli), daemon.listUnspentForAddressesRequest(cli, [addresses[label] for label in pending])]
+    requests += [daemon.generateMasternodeKeyRequest(cli) for _ in keyless]
+    outputs = daemon.batch(cli, requests)
     
-    # Get masternode key to be used
-    print("Get masternode key..")
-    masternodeKey = daemon.generateMasternodeKey(cli)
-    print("Masternode key: {0}\n".format(masternodeKey))
+    masternodeKeys = dict((label, recorded(label, "masternodeKey")) for label in pending)
+    masternodeKeys.update(zip(keyless, [output.strip() for output in outputs[2:]]))
     
-    return (masternodeOutput, masternodeKey)
+    # New collateral may only be listed once confirmed, wait for all of them at once
+    index = confirmations.OutputIndex()
+    index.update(outputs[0])
+    
+    pendingOutputs = dict((label, (txids[label], findCollateralOutputIndex(outputs[1], txids[label], addresses[label], collateral))) for label in pending)
+    masternodeOutputs = confirmations.waitForOutputs(cli, index, pendingOutputs)
+    
+    for label in pending:
+        masternodeOutput = masternodeOutputs[label]
+        masternodeKey = masternodeKeys[label]
+        
+        print("Masternode output for {0}:\n{1}\n".format(label, masternodeOutput))
+        print("Masternode key for {0}: {1}\n".format(label, masternodeKey))
+        
+        record(label, "masternodeOutput", masternodeOutput)
+        record(label, "masternodeKey", masternodeKey)
+        if label in journals:
+            journals[label].markDone("setupMasternodeTransaction")
+        
+        results[label] = (masternodeOutput, masternodeKey)
+    
+    return results
 
 def generateRandomString(length):
     """Generate a random string of a specified length. To be used in rpc information.
@@ -290,23 +555,23 @@ def generateRandomString(length):
     choice = string.ascii_uppercase + string.ascii_lowercase + string.digits
     return ''.join(random.SystemRandom().choice(choice) for _ in range(length))
 
-def setupVpsConfFile(server, user, password, confFile, masternodeKey):
-    """Setup the vps masternode configuration file.
+def generateVpsConfFile(server, masternodeKey, existingValues=None):
+    """Generate the contents of the vps masternode configuration file.
     
     Args:
-        server (str): The IP address of the server to connect to.
-        user (str): The username to be used in the connection.
-        password (str): The password associated with the user.
-        confFile (str): The full path to the configuration file to be used.
+        server (str): The IP address of the server.
         masternodeKey (str): The masternode key associated with this node.
+        existingValues (dict): The values of the existing conf file, if any.
+        
+    Returns:
+        String: The contents of the configuration file.
     """
-    print("Setup VPS conf file..")
-
+    existingValues = existingValues or dict()
     values = dict()
     
     # Generate random values for user and password
-    values["rpcuser"] = generateRandomString(RPC_USER_LENGTH)
-    values["rpcpassword"] = generateRandomString(RPC_PASSWORD_LENGTH)
+    values["rpcuser"] = existingValues.get("rpcuser") or generateRandomString(RPC_USER_LENGTH)
+    values["rpcpassword"] = existingValues.get("rpcpassword") or generateRandomString(RPC_PASSWORD_LENGTH)
     
     values["externalip"] = server
     values["masternodepivkey"] = masternodeKey  
@@ -316,7 +581,26 @@ def setupVpsConfFile(server, user, password, confFile, masternodeKey):
     with open(CONF_TEMPLATE_FILE) as template:
         source = string.Template(template.read())
     
-    sourceFile = source.substitute(values)
+    return source.substitute(values)
+
+@trace.traced()
+def setupVpsConfFile(server, user, password, confFile, masternodeKey):
+    """Setup the vps masternode configuration file.
+    
+    Args:
+        server (str): The IP address of the server to connect to.
+        user (str): The username to be used in the connection.
+        password (str): The password associated with the user.
+        confFile (str): The full path to the configuration file to be used.
+        masternodeKey (str): The masternode key associated with this node.
+    """
+    print("Setup VPS conf file..")
+    
+    # Keep the user and password of an existing conf file so that re-runs produce the same file
+    existing = vps.readFile(server, user, password, confFile)
+    existingValues = rpc.parseConf(existing) if existing else dict()
+    
+    sourceFile = generateVpsConfFile(server, masternodeKey, existingValues)
     
     print("Generated configuration file:")
     pprint.pprint(sourceFile)
@@ -324,8 +608,11 @@ def setupVpsConfFile(server, user, password, confFile, masternodeKey):
     
     # Send configuration file to vps
     print("Send configuration file to VPS..")
-    vps.createFileWithContents(server, user, password, confFile, sourceFile)
-    print("Configuration file sent successfully!\n")
+    
+    if vps.createFileWithContents(server, user, password, confFile, sourceFile):
+        print("Configuration file sent successfully!\n")
+    else:
+        print("Configuration file is unchanged.. skipping.\n")
 
 def updateVpsPermissions(server, user, password, coinName):
     """Updates the folder permissions for the coin user so that the daemon may run.
@@ -338,11 +625,12 @@ def updateVpsPermissions(server, user, password, coinName):
     """
     print("Updating folder permissions for {0} user.".format(coinName))
     
-    command = "chmod -R 777 /home/{0}".format(coinName)
+    command = VPS_UPDATE_PERMISSIONS_COMMAND.format(coinName)
     vps.sendSingleCommand(server, user, password, command)
     
     print("")
     
+@trace.traced()
 def stopVpsDaemon(cli, daemonCli, server, user, password, coinName): 
     """Stops the vps daemon if it's running.
     
@@ -362,21 +650,23 @@ def stopVpsDaemon(cli, daemonCli, server, user, password, coinName):
     try: 
         if vps.isProcessRunning(channel, daemonCli):
             # Stop the process if it's currently running
-            command = "su -c \"{0} stop\" {1}".format(cli, coinName)
+            command = VPS_STOP_DAEMON_COMMAND.format(cli, coinName)
             output = vps.sendCommand(channel, command)
 
-            # Allow enough time for process to terminate
-            time.sleep(20)
+            # Wait for process to terminate
+            probe.waitForRemoteProcessExit(channel, daemonCli, VPS_DAEMON_STOP_TIMEOUT_SEC)
     finally:
         # Close ssh connection
         vps.closeChannel(channel)
 
     print("")
     
-def startVpsDaemon(daemonCli, server, user, password, coinName):
-    """Starts the vps daemon.
+@trace.traced()
+def startVpsDaemon(cli, daemonCli, server, user, password, coinName):
+    """Starts the vps daemon and waits for it to answer RPC calls.
     
     Args:
+        cli (str): The name of the coin cli to be used.
         daemonCli (str): The name of the coin daemon to be used.
         server (str): The IP address of the server to connect to.
         user (str): The username to be used in the connection.
@@ -389,14 +679,14 @@ def startVpsDaemon(daemonCli, server, user, password, coinName):
     channel = vps.openChannel(server, user, password)
 
     try:
-        command = "su -c \"{0} -daemon\" {1}".format(daemonCli, coinName)
+        command = VPS_START_DAEMON_COMMAND.format(daemonCli, coinName)
         print(vps.sendCommand(channel, command))
         
-        # Allow enough time for daemon to start
-        time.sleep(20) 
-
-        if not vps.isProcessRunning(channel, daemonCli):
-            raise ValueError("Failed to start daemon on VPS")
+        # Wait for daemon to be ready
+        try:
+            probe.waitForRemoteDaemonReady(channel, cli, daemonCli, coinName, VPS_DAEMON_START_TIMEOUT_SEC)
+        except ValueError as e:
+            raise ValueError("Failed to start daemon on VPS: {0}".format(str(e)))
         
     finally:
         # Close ssh connection
@@ -413,40 +703,109 @@ def clearVpsDebugFile(server, user, password, debugFile):
     """
     print("Removing VPS debug file: {0}".format(debugFile))
     
-    command = "rm -rf {0}".format(debugFile)
+    command = VPS_CLEAR_DEBUG_FILE_COMMAND.format(debugFile)
     vps.sendSingleCommand(server, user, password, command)
     
     print("")
     
-def pollForVpsDaemonActivationReady(server, user, password, debugFile):
+@trace.traced()
+def bootstrapVpsBlockchain(server, user, password, snapshotPath, dataDirectory):
+    """Seeds the VPS data directory with a blockchain snapshot built on this computer.
+
+    Args:
+        server (str): The IP address of the server to connect to.
+        user (str): The username to be used in the connection.
+        password (str): The password associated with the user.
+        snapshotPath (str): Full path to the local blockchain snapshot.
+        dataDirectory (str): Full path of the coin data directory on the VPS.
+    """
+    print("Bootstrap VPS blockchain..")
+    
+    # Open SSH connection
+    channel = vps.openChannel(server, user, password)
+    
+    try:
+        bootstrap.seedVpsBlockchain(channel, snapshotPath, dataDirectory)
+    finally:
+        # Close ssh connection
+        vps.closeChannel(channel)
+    
+@trace.traced()
+def pollForVpsDaemonActivationReady(server, user, password, debugFile, timeout=ACTIVATION_TIMEOUT_SEC):
     """Waits until the daemon is ready to be activated.
 
+    The debug file is followed over a single stream, returning as soon as the daemon logs
+    that it waits for remote activation.
+
     Args:
         server (str): The IP address of the server to connect to.
         user (str): The username to be used in the connection.
         password (str): The password associated with the user.
         debugFile (str): The name of the file to search.
+        timeout (float): The maximum number of seconds to wait for.
     """
-    done = False
-    command = "grep \"{0}\" {1} > /dev/null".format(ACTIVATION_STRING, debugFile)
-        
-    while done == False:
-        try:
-            print("Wait until VPS daemon is activation ready.. This may take some time..")
-            vps.sendSingleCommand(server, user, password, command)
-        except:
-            time.sleep(10)
-        else:
-            done = True
+    print("Wait until VPS daemon is activation ready.. This may take some time..")
+    
+    # Open SSH connection
+    channel = vps.openChannel(server, user, password)
+    
+    try:
+        vps.watchLog(channel, debugFile, [re.escape(ACTIVATION_STRING)], timeout)
+    finally:
+        # Close ssh connection
+        vps.closeChannel(channel)
     
     print("")
     
-def setupVpsMasternode(cli, daemonCli, server, user, password, confFile, masternodeKey, coinName, debugFile):
+def getVpsMasternodePlan(cli, daemonCli, server, confFile, masternodeKey, coinName, debugFile, snapshot=None, waitForActivation=False):
+    """Get the agent steps setting up the masternode on the VPS, the counterpart of the steps run by setupVpsMasternode.
+    
+    Args:
+        cli (str): The name of the coin cli to be used.
+        daemonCli (str): The name of the coin daemon to be used.
+        server (str): The IP address of the server.
+        confFile (str): The full path to the configuration file to be used.
+        masternodeKey (str): The masternode key associated with this node. 
+        coinName (str): The name of the coin.
+        debugFile (str): The full path to the debug file of the daemon.
+        snapshot (str): Full path to a local blockchain snapshot used to seed the daemon, if any.
+        waitForActivation (bool): Wait until the daemon logs that it is ready for remote activation.
+        
+    Returns:
+        2-Tuple: Tuple containing the steps and the functions sending the files they may need, keyed by path on the VPS.
+    """
+    running = vps.CHECK_IF_PROCESS_RUNNING_COMMAND_FMT.format(daemonCli)
+    
+    steps = list()
+    uploads = dict()
+    
+    steps.append({"name": "stopVpsDaemon", "action": "stopDaemon", "running": running, "command": VPS_STOP_DAEMON_COMMAND.format(cli, coinName), "timeout": VPS_DAEMON_STOP_TIMEOUT_SEC})
+    steps.append({"name": "setupVpsConfFile", "action": "writeFile", "path": confFile, "contents": generateVpsConfFile(server, masternodeKey), "keep": list(VPS_CONF_KEPT_VALUES)})
+    
+    if snapshot:
+        step, remotePath, upload = bootstrap.getSeedStep(snapshot, posixpath.dirname(confFile))
+        
+        steps.append(step)
+        uploads[remotePath] = upload
+    
+    steps.append({"name": "updateVpsPermissions", "action": "run", "command": VPS_UPDATE_PERMISSIONS_COMMAND.format(coinName)})
+    steps.append({"name": "clearVpsDebugFile", "action": "run", "command": VPS_CLEAR_DEBUG_FILE_COMMAND.format(debugFile)})
+    steps.append({"name": "startVpsDaemon", "action": "startDaemon", "command": VPS_START_DAEMON_COMMAND.format(daemonCli, coinName), "ready": probe.REMOTE_RPC_CHECK_COMMAND.format(cli, coinName), "running": running, "timeout": VPS_DAEMON_START_TIMEOUT_SEC})
+    
+    if waitForActivation:
+        steps.append({"name": "pollForVpsDaemonActivationReady", "action": "waitForLog", "path": debugFile, "pattern": re.escape(ACTIVATION_STRING), "timeout": ACTIVATION_TIMEOUT_SEC})
+    
+    return (steps, uploads)
+
+@trace.traced()
+def setupVpsMasternode(cli, daemonCli, server, user, password, confFile, masternodeKey, coinName, debugFile, snapshot=None, waitForActivation=False, useAgent=False):
     """Sets up the masternode on the VPS.  Specifically:
     
     1. Stop daemon (if necessary).
     2. Copy masternode conf file to vps.
-    3. Start daemon.
+    3. Seed the blockchain from a snapshot (if provided).
+    4. Start daemon.
+    5. Wait for the daemon to be ready for activation (if requested).
     
     Args:
         cli (str): The name of the coin cli to be used.
@@ -457,13 +816,36 @@ def setupVpsMasternode(cli, daemonCli, server, user, password, confFile, mastern
         confFile (str): The full path to the configuration file to be used.
         masternodeKey (str): The masternode key associated with this node. 
         coinName (str): The name of the coin.
+        debugFile (str): The full path to the debug file of the daemon.
+        snapshot (str): Full path to a local blockchain snapshot used to seed the daemon, if any.
+        waitForActivation (bool): Wait until the daemon logs that it is ready for remote activation.
+        useAgent (bool): Run all the steps on the VPS with the agent, in a single round trip.
     """  
+    if useAgent:
+        print("Setup masternode on VPS with the agent..")
+        steps, uploads = getVpsMasternodePlan(cli, daemonCli, server, confFile, masternodeKey, coinName, debugFile, snapshot, waitForActivation)
+        
+        # Open SSH connection
+        channel = vps.openChannel(server, user, password)
+        
+        try:
+            vps.runAgentPlan(channel, steps, uploads)
+        finally:
+            # Close ssh connection
+            vps.closeChannel(channel)
+        
+        return
+    
     # We must stop the current daemon to prevent issues with the conf file
     stopVpsDaemon(cli, daemonCli, server, user, password, coinName)
         
     # Load new conf file
     setupVpsConfFile(server, user, password, confFile, masternodeKey)
     
+    # Avoid syncing the whole blockchain from peers
+    if snapshot:
+        bootstrapVpsBlockchain(server, user, password, snapshot, posixpath.dirname(confFile))
+    
     # We must update folder permissions so that daemon can run
     updateVpsPermissions(server, user, password, coinName)
     
@@ -471,11 +853,11 @@ def setupVpsMasternode(cli, daemonCli, server, user, password, confFile, mastern
     clearVpsDebugFile(server, user, password, debugFile)
     
     # Start daemon
-    startVpsDaemon(daemonCli, server, user, password, coinName)
+    startVpsDaemon(cli, daemonCli, server, user, password, coinName)
     
-    # Poll for daemon to be ready for activation
-    # Note: It seems like the activation doesn't work outside of wallet so disabling for now..
-    #pollForVpsDaemonActivationReady(server, user, password, debugFile)
+    # Wait for daemon to be ready for activation
+    if waitForActivation:
+        pollForVpsDaemonActivationReady(server, user, password, debugFile)
 
 def setupMasternodeConfFile(server, label, masternodeConfFile, masternodePort, masternodeOutput, masternodeKey):
     """Sets up the local masternode conf file with the masternode values.
@@ -516,7 +898,8 @@ def startMasternodeAlias(cli, label):
 
     print("Masternode started successfully!")
 
-def setupWalletForMasternode(cli, server, label, masternodeConfFile, masternodePort, masternodeOutput, masternodeKey):
+@trace.traced()
+def setupWalletForMasternode(cli, server, label, masternodeConfFile, masternodePort, masternodeOutput, masternodeKey, journal=None):
     """Sets up the wallet for the newly created masternode.
         
     Args:
@@ -527,45 +910,26 @@ def setupWalletForMasternode(cli, server, label, masternodeConfFile, masternodeP
         masternodePort (int): The port number associated with the masternode.        
         masternodeOutput (dict): The masternode output containing the collateral txinfo.
         masternodeKey (str): The masternode key associated with this node.        
+        journal (obj): The checkpoints Journal of the masternode, if any.
     """  
-    setupMasternodeConfFile(server, label, masternodeConfFile, masternodePort, masternodeOutput, masternodeKey)
-    startMasternodeAlias(cli, label)
+    checkpoints.runStep(journal, "setupMasternodeConfFile", lambda: setupMasternodeConfFile(server, label, masternodeConfFile, masternodePort, masternodeOutput, masternodeKey))
+    checkpoints.runStep(journal, "startMasternodeAlias", lambda: startMasternodeAlias(cli, label))
 
-def getCoinBinaries(envHome, cliName, daemonName):
-    """Gets the full paths of the binaries associated with this coin.
+def getVpsFiles(config):
+    """Gets the full paths of the files associated with this coin on the VPS.
     
     Args:
-        envHome (str): The name of the home environment variable.
-        cliName (str): The name of the cli binary associated with this coin.
-        daemonName (str): The name of the daemon binary associated with this coin.
+        config (dict): Dictionary containing the options parsed by the utility.
         
     Returns:
-        2-Tuple: Tuple containing the full paths as described.
+        2-Tuple: Tuple containing the VPS conf file and debug file paths.
     """
-    homePath = environ.get(envHome)
-
-    cli = os.path.join(homePath, "daemon", cliName)
-    daemonCli = os.path.join(homePath, "daemon", daemonName)
+    dataPath = "/home/{0}/{1}".format(config["Coin"]["Name"], config["VPS"]["DataDir"])
     
-    return (cli, daemonCli)
-
-def getCoinFiles(envUser, walletConf, masternodeConf):    
-    """Gets the full paths of the conf files associated with this coin.
+    vpsConfFile = "{0}/{1}".format(dataPath, config["VPS"]["ConfFile"])
+    vpsDebugFile = "{0}/{1}".format(dataPath, config["VPS"]["DebugFile"])
     
-    Args:
-        envUser (str): The name of the user environment variable.
-        walletConf (str): The name of the wallet conf file.
-        masternodeConf (str): The name of the masternode conf file.
-        
-    Returns:
-        2-Tuple: Tuple full paths as described.
-    """
-    userPath = environ.get(envUser)
-    
-    walletConfFile = os.path.join(userPath, walletConf)
-    masternodeConfFile = os.path.join(userPath, masternodeConf)
-    
-    return (walletConfFile, masternodeConfFile)
+    return (vpsConfFile, vpsDebugFile)
 
 def checkPrerequisites(config):
     """Checks that certain prerequisits are met before continuing. Specifically:
@@ -579,42 +943,60 @@ def checkPrerequisites(config):
     """
     print("Checking wallet requirements..")    
     
-    cli, daemonCli = getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])    
-    checkIfEnvironmentDefined(config["Environment"]["Home"], config["Environment"]["User"])
+    settings.checkIfEnvironmentDefined(config["Environment"]["Home"], config["Environment"]["User"])
+    cli, daemonCli = settings.getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
     checkIfWalletInstalled(cli, daemonCli)    
     
     print("")
         
-def setup(server, user, password, label, config):
-    """Top level function associated with this module. Responsible for the core configuration
+def setup(server, user, password, label, config, journal=None):
+    """Top level function associated with this module. Responsible for the end to end setup
     of this masternode. Specifically it will:
     
-    1. Start local daemon.
-    2. Poll for wallet to be synced.
-    3. Perform masternode transactions.
-    4. Setup masternode config on vps.
-    5. Setup the local wallet for the masternode.
-    6. Stop local daemon.
+    1. Setup the VPS (update packages, install binaries).
+    2. Start local daemon (or attach to the one already running).
+    3. Poll for wallet to be synced.
+    4. Perform masternode transactions.
+    5. Setup masternode config on vps.
+    6. Setup the local wallet for the masternode.
+    7. Stop local daemon, unless it is kept running or used by another run.
+    
+    The VPS setup is independent of the local wallet, so it runs while the local daemon starts
+    and syncs. The collateral is only sent once the VPS is setup, so that a failed VPS setup
+    leaves the funds untouched:
+    
+        setupVps -----------------------+
+                                        +--> setupMasternodeTransaction --> setupVpsMasternode --> setupWalletForMasternode
+        startLocalWallet --> syncWallet +
+    
+    Steps recorded as completed in the journal are skipped, so that a failed run may be resumed.
     """
     # Determine binary and file names based on config
-    cli, daemonCli = getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
-    walletConfFile, masternodeConfFile = getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
-
-    setupWallet(walletConfFile)
-    localDaemon = startLocalDaemon(daemonCli)   
+    cli, daemonCli = settings.getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
+    walletConfFile, masternodeConfFile = settings.getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
+    vpsConfFile, vpsDebugFile = getVpsFiles(config)
+    
+    graph = tasks.TaskGraph()
+    
+    def setupVpsForMasternode():
+        masternodeOutput, masternodeKey = graph.results["setupMasternodeTransaction"]
+        setupVpsMasternode(config["Coin"]["Cli"], config["Coin"]["Daemon"], server, user, password, vpsConfFile, masternodeKey, config["Coin"]["Name"], vpsDebugFile, config["Bootstrap"]["Snapshot"], config["VPS"].getboolean("WaitForActivation", fallback=False), config["VPS"].getboolean("Agent", fallback=False))
+    
+    def setupLocalWallet():
+        masternodeOutput, masternodeKey = graph.results["setupMasternodeTransaction"]
+        setupWalletForMasternode(cli, server, label, masternodeConfFile, int(config["Coin"]["Port"]), masternodeOutput, masternodeKey, journal)
+    
+    graph.add("setupVps", lambda: vps.setup(server, user, password, config, journal))
+    graph.add("startLocalWallet", lambda: startLocalWallet(cli, daemonCli, walletConfFile, int(config["Coin"]["RpcPort"]), isLocalDaemonKept(config)))
+    graph.add("syncWallet", lambda: pollForWalletSync(cli, graph=graph), ["startLocalWallet"])
+    graph.add("setupMasternodeTransaction", lambda: setupMasternodeTransaction(cli, label, float(config["Coin"]["Collateral"]), journal), ["setupVps", "syncWallet"])
+    graph.add("setupVpsMasternode", lambda: checkpoints.runStep(journal, "setupVpsMasternode", setupVpsForMasternode), ["setupVps", "setupMasternodeTransaction"])
+    graph.add("setupWalletForMasternode", setupLocalWallet, ["setupVpsMasternode"])
     
     try:
-        pollForWalletSync(cli)
-        masternodeOutput, masternodeKey = setupMasternodeTransaction(cli, label, float(config["Coin"]["Collateral"]))
-        
-        vpsConfFile = "/home/{0}/{1}/{2}".format(config["Coin"]["Name"], config["VPS"]["DataDir"], config["VPS"]["ConfFile"])
-        vpsDebugFile = "/home/{0}/{1}/{2}".format(config["Coin"]["Name"], config["VPS"]["DataDir"], config["VPS"]["DebugFile"])
-        
-        setupVpsMasternode(config["Coin"]["Cli"], config["Coin"]["Daemon"], server, user, password, vpsConfFile, masternodeKey, config["Coin"]["Name"], vpsDebugFile)
-        
-        setupWalletForMasternode(cli, server, label, masternodeConfFile, int(config["Coin"]["Port"]), masternodeOutput, masternodeKey)
-
+        graph.run()
     finally:
-        stopLocalDaemon(cli)
-        localDaemon.wait()
+        # The local daemon is only released once every running task completed
+        if "startLocalWallet" in graph.results:
+            graph.results["startLocalWallet"].release()
     
\ No newline at end of file
@@ -22,8 +22,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
 import subprocess
 
+from . import rpc
+from . import trace
+
 DEFAULT_DECODE = "utf-8"
 WALLET_LOCK_TIMEOUT_SEC = 60
 
@@ -32,11 +36,15 @@ DAEMON_START_COMMAND = "{0} -daemon"
 
 CLI_GET_BALANCE = "{0} getbalance"
 CLI_LIST_UNSPENT = "{0} listunspent"
+CLI_LIST_UNSPENT_FOR_ADDRESSES = "{0} listunspent 0 9999999 [{1}]"
 
 CLI_GET_BLOCKCHAIN_INFO = "{0} getblockchaininfo"
+CLI_GET_BLOCK_HEADER = "{0} getblockheader {1}"
+CLI_WAIT_FOR_NEW_BLOCK = "{0} waitfornewblock {1}"
 CLI_UNLOCK_WALLET = "{0} walletpassphrase {1} {2}"
 
 CLI_SEND_TO_ADDRESS = "{0} sendtoaddress {1} {2}"
+CLI_SEND_MANY = "{0} sendmany \"\" {1}"
 CLI_GENERATE_NEW_ADDRESS = "{0} getnewaddress {1}"
 
 CLI_MASTERNODE_GENKEY = "{0} masternode genkey"
@@ -44,6 +52,115 @@ CLI_MASTERNODE_OUTPUTS = "{0} masternode outputs"
   
 CLI_MASTERNODE_START_ALIAS = "{0} masternode start-alias {1}"  
 
+# Native RPC clients keyed by the cli binary they replace
+rpcClients = dict()
+
+def configureRpc(cli, walletConfFile, rpcPort):
+    """Route the calls made for the specified cli through a native JSON-RPC connection.
+    
+    The credentials are read from the wallet conf file. Calls fall back to the cli binary
+    if the conf file has no credentials or the daemon RPC port cannot be reached.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        walletConfFile (str): Full path to wallet conf file.
+        rpcPort (int): The RPC port to be used if the conf file doesn't define one.
+    """
+    closeRpc(cli)
+    
+    client = rpc.createClient(walletConfFile, rpcPort)
+    if client is not None:
+        rpcClients[cli] = client
+
+def closeRpc(cli):
+    """Close the native JSON-RPC connection associated with the cli, if any.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+    """
+    client = rpcClients.pop(cli, None)
+    if client is not None:
+        client.close()
+
+def quoteJson(value):
+    """Encode a value as a cli argument, the quotes are escaped so that they reach the cli.
+    
+    Args:
+        value (obj): The value to be encoded.
+        
+    Returns:
+        String: The JSON encoded value.
+    """
+    return json.dumps(value, separators=(",", ":")).replace("\"", "\\\"")
+
+def formatResult(result):
+    """Format an RPC result the same way the cli binary prints it.
+    
+    Args:
+        result (obj): The decoded result of the RPC call.
+        
+    Returns:
+        String: The result as printed by the cli.
+    """
+    if result is None:
+        return ""
+    
+    elif isinstance(result, str):
+        return result
+    
+    return json.dumps(result, indent=2)
+
+def call(cli, method, params, command, stderr=None):
+    """Execute an RPC call natively if configured, otherwise through the cli binary.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        method (str): The name of the RPC method.
+        params (list): The parameters of the RPC method.
+        command (str): The equivalent cli command, used as a fallback.
+        stderr (int): Where the stderr of the cli command is sent.
+        
+    Returns:
+        String: String containing the command output.
+    """
+    client = rpcClients.get(cli)
+    
+    # The parameters are left out of the trace, they may hold the wallet passphrase
+    with trace.span(method, trace.RPC, native=client is not None):
+        if client is not None:
+            try:
+                return formatResult(client.call(method, *params))
+            except rpc.RpcUnavailableError:
+                # The call was not sent, it is safe to try again with the cli
+                pass
+            
+        return subprocess.check_output(command, stderr=stderr).decode(DEFAULT_DECODE)
+
+def batch(cli, requests):
+    """Execute several independent calls in a single round trip when using native RPC.
+    
+    Falls back to running the equivalent cli commands one after the other.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        requests (list): List of (method, params, command) tuples, as returned by the request functions.
+        
+    Returns:
+        List: The output of each call, in the order of the requests provided.
+    """
+    client = rpcClients.get(cli)
+    
+    with trace.span("batch", trace.RPC, native=client is not None, methods=[method for method, params, command in requests]):
+        if client is not None:
+            try:
+                results = client.batch([(method, params) for method, params, command in requests])
+                return [formatResult(result) for result in results]
+            except rpc.RpcUnavailableError:
+                # The calls were not sent, it is safe to try again with the cli
+                pass
+        
+        return [subprocess.check_output(command).decode(DEFAULT_DECODE) for method, params, command in requests]
+
 def start(daemon):
     """Wrapper function for the relevant RPC function call.
     
@@ -54,7 +171,7 @@ def start(daemon):
         String: String containing the command output.
     """
     command = DAEMON_START_COMMAND.format(daemon).split(" ")
-    return subprocess.Popen(command, stdout=subprocess.PIPE)
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     
 def stop(cli):
     """Wrapper function for the relevant RPC function call.
@@ -66,7 +183,7 @@ def stop(cli):
         String: String containing the command output.        
     """
     command = DAEMON_STOP_COMMAND.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE)
+    return call(cli, "stop", [], command)
 
 def getBlockchainInfo(cli):
     """Wrapper function for the relevant RPC function call.
@@ -78,8 +195,46 @@ def getBlockchainInfo(cli):
         String: String containing the command output.        
     """
     command = CLI_GET_BLOCKCHAIN_INFO.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE)
+    return call(cli, "getblockchaininfo", [], command)
+    
+def getBlockHeader(cli, blockHash):
+    """Wrapper function for the relevant RPC function call.
     
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        blockHash (str): Hash of the block whose header is requested.
+        
+    Returns:
+        String: String containing the command output.        
+    """
+    command = CLI_GET_BLOCK_HEADER.format(cli, blockHash)
+    return call(cli, "getblockheader", [blockHash], command)
+    
+def waitForNewBlock(cli, timeout):
+    """Wrapper function for the relevant RPC function call, returns once a new block is received or on timeout.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        timeout (int): The maximum number of milliseconds to wait for.
+        
+    Returns:
+        String: String containing the command output.
+    """
+    command = CLI_WAIT_FOR_NEW_BLOCK.format(cli, timeout)
+    return call(cli, "waitfornewblock", [timeout], command)
+
+def generateNewAddressRequest(cli, label):
+    """Build the request used to generate a new address, see batch.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        label (str): Label associated with the address to be generated.
+        
+    Returns:
+        3-Tuple: Tuple containing the RPC method, params and equivalent cli command.
+    """
+    return ("getnewaddress", [label], CLI_GENERATE_NEW_ADDRESS.format(cli, label))
+
 def generateNewAddress(cli, label):
     """Wrapper function for the relevant RPC function call.
     
@@ -90,8 +245,7 @@ def generateNewAddress(cli, label):
     Returns:
         String: String containing the command output.        
     """
-    command = CLI_GENERATE_NEW_ADDRESS.format(cli, label)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE).strip()
+    return call(cli, *generateNewAddressRequest(cli, label)).strip()
     
 def unlockWallet(cli, passphrase):
     """Wrapper function for the relevant RPC function call.
@@ -104,7 +258,7 @@ def unlockWallet(cli, passphrase):
         String: String containing the command output.        
     """
     command = CLI_UNLOCK_WALLET.format(cli, passphrase, WALLET_LOCK_TIMEOUT_SEC)
-    return subprocess.check_output(command, stderr=subprocess.STDOUT).decode(DEFAULT_DECODE)
+    return call(cli, "walletpassphrase", [passphrase, WALLET_LOCK_TIMEOUT_SEC], command, subprocess.STDOUT)
             
 def sendToAddress(cli, address, amount):
     """Wrapper function for the relevant RPC function call.
@@ -118,7 +272,20 @@ def sendToAddress(cli, address, amount):
         String: String containing the command output.        
     """
     command = CLI_SEND_TO_ADDRESS.format(cli, address, amount)
-    return subprocess.check_output(command, stderr=subprocess.STDOUT).decode(DEFAULT_DECODE).strip()
+    return call(cli, "sendtoaddress", [address, amount], command, subprocess.STDOUT).strip()
+
+def sendMany(cli, amounts):
+    """Wrapper function for the relevant RPC function call, sends to several addresses in a single transaction.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        amounts (dict): Dictionary mapping each address to the amount of coins to be sent.
+        
+    Returns:
+        String: String containing the command output.        
+    """
+    command = CLI_SEND_MANY.format(cli, quoteJson(amounts))
+    return call(cli, "sendmany", ["", amounts], command, subprocess.STDOUT).strip()
 
 def getTotalBalance(cli):
     """Wrapper function for the relevant RPC function call.
@@ -130,7 +297,18 @@ def getTotalBalance(cli):
         String: String containing the command output.        
     """
     command = CLI_GET_BALANCE.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE)
+    return call(cli, "getbalance", [], command)
+
+def listUnspentRequest(cli):
+    """Build the request used to list the unspent outputs, see batch.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        
+    Returns:
+        3-Tuple: Tuple containing the RPC method, params and equivalent cli command.
+    """
+    return ("listunspent", [], CLI_LIST_UNSPENT.format(cli))
 
 def listUnspent(cli):
     """Wrapper function for the relevant RPC function call.
@@ -141,8 +319,43 @@ def listUnspent(cli):
     Returns:
         String: String containing the command output.        
     """
-    command = CLI_LIST_UNSPENT.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE)
+    return call(cli, *listUnspentRequest(cli))
+    
+def listUnspentForAddressesRequest(cli, addresses):
+    """Build the request used to list the unspent outputs of several addresses, including unconfirmed outputs, see batch.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        addresses (list): The addresses whose unspent outputs are listed.
+        
+    Returns:
+        3-Tuple: Tuple containing the RPC method, params and equivalent cli command.
+    """
+    command = CLI_LIST_UNSPENT_FOR_ADDRESSES.format(cli, ",".join(quoteJson(address) for address in addresses))
+    return ("listunspent", [0, 9999999, list(addresses)], command)
+
+def listUnspentForAddress(cli, address):
+    """Wrapper function for the relevant RPC function call, includes unconfirmed outputs.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        address (str): The address whose unspent outputs are listed.
+        
+    Returns:
+        String: String containing the command output.        
+    """
+    return call(cli, *listUnspentForAddressesRequest(cli, [address]))
+    
+def getMasternodeOutputsRequest(cli):
+    """Build the request used to list the masternode outputs, see batch.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        
+    Returns:
+        3-Tuple: Tuple containing the RPC method, params and equivalent cli command.
+    """
+    return ("masternode", ["outputs"], CLI_MASTERNODE_OUTPUTS.format(cli))
     
 def getMasternodeOutputs(cli):
     """Wrapper function for the relevant RPC function call.
@@ -153,8 +366,18 @@ def getMasternodeOutputs(cli):
     Returns:
         String: String containing the command output.        
     """
-    command = CLI_MASTERNODE_OUTPUTS.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE)
+    return call(cli, *getMasternodeOutputsRequest(cli))
+    
+def generateMasternodeKeyRequest(cli):
+    """Build the request used to generate a masternode key, see batch.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        
+    Returns:
+        3-Tuple: Tuple containing the RPC method, params and equivalent cli command.
+    """
+    return ("masternode", ["genkey"], CLI_MASTERNODE_GENKEY.format(cli))
     
 def generateMasternodeKey(cli):
     """Wrapper function for the relevant RPC function call.
@@ -165,9 +388,8 @@ def generateMasternodeKey(cli):
     Returns:
         String: String containing the command output.        
     """
-    command = CLI_MASTERNODE_GENKEY.format(cli)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE).strip()
-
+    return call(cli, *generateMasternodeKeyRequest(cli)).strip()
+    
 def masternodeStartAlias(cli, alias):
     """Wrapper function for the relevant RPC function call.
     
@@ -179,4 +401,4 @@ def masternodeStartAlias(cli, alias):
         String: String containing the command output.        
     """
     command = CLI_MASTERNODE_START_ALIAS.format(cli, alias)
-    return subprocess.check_output(command).decode(DEFAULT_DECODE).strip()
+    return call(cli, "masternode", ["start-alias", alias], command).strip()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import csv
+import json
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import vps
+from . import core
+from . import tasks
+from . import settings
+from . import checkpoints
+
+DEFAULT_USER = "root"
+DEFAULT_WORKERS = 8
+
+INVENTORY_FIELDS = ("name", "host", "password")
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+class Node(object):
+    """A single masternode entry of the inventory along with its provisioning result."""
+
+    def __init__(self, name, host, user, password):
+        self.name = name
+        self.host = host
+        self.user = user
+        self.password = password
+        self.journal = None
+
+        self.status = None
+        self.reason = ""
+        self.elapsed = 0.0
+
+    def succeed(self, elapsed):
+        self.status = STATUS_OK
+        self.elapsed += elapsed
+
+    def fail(self, elapsed, reason):
+        self.status = STATUS_FAILED
+        self.reason = reason
+        self.elapsed += elapsed
+
+    def isFailed(self):
+        return self.status == STATUS_FAILED
+
+def readInventory(inventoryFile):
+    """Parse the inventory file describing the masternodes to be provisioned.
+
+    The inventory may be a CSV file with a header row or a JSON list of objects. Both forms
+    must provide the name, host and password fields, the user field is optional and
+    defaults to root.
+
+    Args:
+        inventoryFile (str): Full path to the inventory file.
+
+    Returns:
+        List: List of Node objects, one per inventory entry.
+    """
+    with open(inventoryFile) as f:
+        if os.path.splitext(inventoryFile)[1].lower() == ".json":
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+
+    nodes = list()
+    for index, entry in enumerate(entries):
+        missing = [field for field in INVENTORY_FIELDS if not entry.get(field)]
+
+        if missing:
+            raise ValueError("Inventory entry {0} is missing: {1}".format(index + 1, ", ".join(missing)))
+
+        nodes.append(Node(entry["name"], entry["host"], entry.get("user") or DEFAULT_USER, entry["password"]))
+
+    names = [node.name for node in nodes]
+    duplicates = set(name for name in names if names.count(name) > 1)
+
+    if duplicates:
+        raise ValueError("Duplicate masternode names in inventory: {0}".format(", ".join(sorted(duplicates))))
+
+    return nodes
+
+def runForEachNode(nodes, workers, function):
+    """Run a provisioning function for every node that has not failed yet, using a bounded pool.
+
+    Failures are recorded on the node rather than raised so that a single bad host does
+    not stop the rest of the fleet.
+
+    Args:
+        nodes (list): List of Node objects.
+        workers (int): Maximum number of nodes to be processed concurrently.
+        function (callable): Function taking a Node, executed once per node.
+    """
+    def run(node):
+        start = time.time()
+
+        try:
+            function(node)
+        except Exception as e:
+            node.fail(time.time() - start, str(e))
+            print("Masternode {0} ({1}) failed. Reason: {2}.\n".format(node.name, node.host, str(e)))
+        else:
+            node.succeed(time.time() - start)
+
+    pending = [node for node in nodes if not node.isFailed()]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Consume the results so that unexpected errors in run are not silently lost
+        list(executor.map(run, pending))
+
+def printReport(nodes):
+    """Print the per node result of a fleet run.
+
+    Args:
+        nodes (list): List of Node objects.
+    """
+    print("Fleet provisioning report:\n")
+
+    nameWidth = max([len("Name")] + [len(node.name) for node in nodes])
+    hostWidth = max([len("Host")] + [len(node.host) for node in nodes])
+    line = "{0:<{1}}  {2:<{3}}  {4:<7}  {5:>8}  {6}"
+
+    print(line.format("Name", nameWidth, "Host", hostWidth, "Status", "Time", "Reason"))
+    for node in nodes:
+        status = node.status or STATUS_SKIPPED
+        elapsed = "{0:.1f}s".format(node.elapsed)
+        print(line.format(node.name, nameWidth, node.host, hostWidth, status, elapsed, node.reason))
+
+    print("")
+
+def setup(nodes, config, workers=DEFAULT_WORKERS):
+    """Provision every masternode in the fleet.
+
+    The VPS instances are prepared concurrently while a single local wallet session starts and
+    syncs. Once both are done the masternodes are funded together and their VPS daemons
+    configured. The VPS steps run concurrently so that the total time is bound by the slowest
+    host, or the wallet sync if it takes longer.
+
+    Every masternode keeps a journal of its completed steps, running the fleet again after
+    a failure resumes each masternode where it stopped.
+
+    Args:
+        nodes (list): List of Node objects.
+        config (dict): Dictionary containing the options parsed by the utility.
+        workers (int): Maximum number of hosts to be provisioned concurrently.
+    """
+    walletLock = threading.Lock()
+
+    def setupVps(node):
+        node.journal = checkpoints.Journal(node.name, node.host)
+        vps.setup(node.host, node.user, node.password, config, node.journal)
+
+    def setupFleetVps():
+        # Setup VPS - Update packages, install binaries
+        runForEachNode(nodes, workers, setupVps)
+
+        if all(node.isFailed() for node in nodes):
+            raise ValueError("All masternodes failed during VPS setup")
+
+    cli, daemonCli = settings.getCoinBinaries(config["Environment"]["Home"], config["Coin"]["Cli"], config["Coin"]["Daemon"])
+    walletConfFile, masternodeConfFile = settings.getCoinFiles(config["Environment"]["User"], config["Wallet"]["WalletConf"], config["Wallet"]["MasternodeConf"])
+    vpsConfFile, vpsDebugFile = core.getVpsFiles(config)
+
+    transactions = dict()
+
+    def setupNode(node):
+        masternodeOutput, masternodeKey = transactions[node.name]
+
+        checkpoints.runStep(node.journal, "setupVpsMasternode", lambda: core.setupVpsMasternode(config["Coin"]["Cli"], config["Coin"]["Daemon"], node.host, node.user, node.password, vpsConfFile, masternodeKey, config["Coin"]["Name"], vpsDebugFile, config["Bootstrap"]["Snapshot"], config["VPS"].getboolean("WaitForActivation", fallback=False), config["VPS"].getboolean("Agent", fallback=False)))
+
+        with walletLock:
+            core.setupWalletForMasternode(cli, node.host, node.name, masternodeConfFile, int(config["Coin"]["Port"]), masternodeOutput, masternodeKey, node.journal)
+
+        node.journal.clear()
+
+    def setupFleetTransactions():
+        # Fund all the remaining masternodes at once
+        ready = [node for node in nodes if not node.isFailed()]
+
+        try:
+            journals = dict((node.name, node.journal) for node in ready)
+            transactions.update(core.setupMasternodeTransactions(cli, [node.name for node in ready], float(config["Coin"]["Collateral"]), journals))
+        except Exception as e:
+            print("Masternode transactions failed. Reason: {0}.\n".format(str(e)))
+
+            for node in ready:
+                node.fail(0, "Masternode transaction failed: {0}".format(str(e)))
+
+    # Setup masternodes locally, sharing a single wallet session started while the VPS are setup
+    graph = tasks.TaskGraph()
+
+    graph.add("setupVps", setupFleetVps)
+    graph.add("startLocalWallet", lambda: core.startLocalWallet(cli, daemonCli, walletConfFile, int(config["Coin"]["RpcPort"]), core.isLocalDaemonKept(config)))
+    graph.add("syncWallet", lambda: core.pollForWalletSync(cli, graph=graph), ["startLocalWallet"])
+    graph.add("setupMasternodeTransactions", setupFleetTransactions, ["setupVps", "syncWallet"])
+    graph.add("setupVpsMasternodes", lambda: runForEachNode(nodes, workers, setupNode), ["setupMasternodeTransactions"])
+
+    try:
+        graph.run()
+    finally:
+        if "startLocalWallet" in graph.results:
+            graph.results["startLocalWallet"].release()
+
+        printReport(nodes)
+
+    failed = [node for node in nodes if node.isFailed()]
+    if failed:
+        raise ValueError("{0} of {1} masternodes failed".format(len(failed), len(nodes)))
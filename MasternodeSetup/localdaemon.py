@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import hashlib
+import threading
+import subprocess
+
+from . import rpc
+from . import probe
+from . import trace
+from . import daemon
+from . import storage
+
+LOCK_POLL_INTERVAL_SEC = 0.2
+LOCK_TIMEOUT_SEC = 900
+ATTACH_TIMEOUT_SEC = 600
+
+def isProcessAlive(pid):
+    """Check if a local process is still running.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        Boolean: True if the process is running, False otherwise.
+    """
+    if os.name == "nt":
+        # os.kill terminates the process on windows, query it instead
+        import ctypes
+
+        SYNCHRONIZE = 0x00100000
+        WAIT_TIMEOUT = 0x00000102
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle:
+            return False
+
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == WAIT_TIMEOUT
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+class FileLock(object):
+    """Lock shared by every instance of this utility, held by creating a file exclusively.
+
+    The file holds the id of the owning process so that a lock left behind by a process that
+    was killed is recovered.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT_SEC):
+        self.path = path
+        self.timeout = timeout
+
+    def acquire(self):
+        deadline = time.time() + self.timeout
+
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, "w") as f:
+                    f.write(str(os.getpid()))
+                return
+
+            try:
+                with open(self.path) as f:
+                    owner = int(f.read() or 0)
+            except (IOError, ValueError):
+                owner = 0
+
+            if owner and not isProcessAlive(owner):
+                print("Removing lock {0} left by process {1}..".format(self.path, owner))
+
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            if time.time() >= deadline:
+                raise ValueError("Timed out after {0} seconds waiting for lock {1}".format(self.timeout, self.path))
+
+            trace.sleep(LOCK_POLL_INTERVAL_SEC, "wait for lock {0}".format(os.path.basename(self.path)))
+
+    def release(self):
+        os.remove(self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+class LocalDaemon(object):
+    """The local wallet daemon, shared by the runs of this utility instead of being started
+    and stopped by each of them.
+
+    A daemon already answering RPC calls is attached to, otherwise it is started. The
+    processes using the daemon are recorded in a state file guarded by a lock file, the
+    daemon is stopped when the last of them releases it, unless one of them asked to keep it
+    running. A daemon that was running before the first of them attached to it, including one
+    kept running by a previous run, is never stopped implicitly.
+    """
+
+    def __init__(self, cli, start, stop, keepRunning=False):
+        """
+        Args:
+            cli (str): The full path of the local cli binary.
+            start (callable): Function starting the daemon, returning its process once it answers RPC calls.
+            stop (callable): Function stopping the daemon.
+            keepRunning (bool): Leave the daemon running once released, to be reused by the next run.
+        """
+        self.cli = cli
+        self.start = start
+        self.stop = stop
+        self.keepRunning = keepRunning
+
+        name = "{0}-{1}".format(os.path.basename(cli), hashlib.sha1(cli.encode("utf-8")).hexdigest()[:8])
+        directory = storage.getDirectory("daemon")
+
+        self.path = os.path.join(directory, "{0}.json".format(name))
+        self.lock = FileLock(os.path.join(directory, "{0}.lock".format(name)))
+        self.threadLock = threading.Lock()
+
+        self.process = None
+        self.acquired = 0
+
+    def loadState(self):
+        state = storage.loadJson(self.path, dict())
+
+        # Forget the processes that exited without releasing the daemon
+        state["holders"] = [pid for pid in state.get("holders", list()) if isProcessAlive(pid)]
+        state.setdefault("started", False)
+        state.setdefault("keep", False)
+
+        return state
+
+    def isRunning(self):
+        """Check if the daemon is running, even if it is still warming up.
+
+        Returns:
+            Boolean: True if the daemon answered the RPC call, False otherwise.
+        """
+        try:
+            daemon.getBlockchainInfo(self.cli)
+        except rpc.RpcError:
+            return True
+        except (OSError, subprocess.CalledProcessError):
+            return False
+
+        return True
+
+    def acquire(self):
+        """Attach to the running daemon or start it, and record this process as using it."""
+        with self.threadLock, self.lock:
+            state = self.loadState()
+
+            if self.isRunning():
+                print("Attaching to the running local daemon..")
+                probe.waitUntil(lambda: probe.isLocalRpcReady(self.cli), ATTACH_TIMEOUT_SEC, "local daemon to answer RPC calls")
+                print("")
+            else:
+                self.process = self.start()
+                state["started"] = True
+
+            if self.keepRunning:
+                state["keep"] = True
+
+            state["holders"].append(os.getpid())
+            storage.saveJson(self.path, state)
+
+            self.acquired += 1
+
+    def release(self):
+        """Record that this process no longer uses the daemon, stopping it if it was the last one."""
+        with self.threadLock, self.lock:
+            state = self.loadState()
+
+            if self.acquired:
+                self.acquired -= 1
+
+                if os.getpid() in state["holders"]:
+                    state["holders"].remove(os.getpid())
+
+            if os.getpid() in state["holders"]:
+                # Still used by another session of this process
+                pass
+            elif state["holders"]:
+                print("Local daemon still used by process {0}, leaving it running..\n".format(", ".join(str(pid) for pid in sorted(set(state["holders"])))))
+                daemon.closeRpc(self.cli)
+            elif state["started"] and not state["keep"] and not self.keepRunning:
+                self.stopProcess()
+                state["started"] = False
+            else:
+                print("Leaving the local daemon running..\n")
+                daemon.closeRpc(self.cli)
+
+                # From now on the daemon was already running, the next runs only attach to it
+                state["started"] = False
+                state["keep"] = False
+
+            self.saveState(state)
+
+    def shutdown(self):
+        """Stop the daemon explicitly, whether it was kept running or not started by this utility."""
+        with self.threadLock, self.lock:
+            state = self.loadState()
+
+            if state["holders"]:
+                raise ValueError("Local daemon is used by process {0}".format(", ".join(str(pid) for pid in sorted(set(state["holders"])))))
+
+            if self.isRunning():
+                self.stopProcess()
+            else:
+                print("Local daemon is not running..\n")
+
+            state["started"] = False
+            state["keep"] = False
+            self.saveState(state)
+
+    def stopProcess(self):
+        self.stop()
+
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+
+    def saveState(self, state):
+        if state["holders"] or state["started"]:
+            storage.saveJson(self.path, state)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
@@ -26,26 +26,38 @@ import os
 
 from . import vps
 from . import core
+from . import fleet
+from . import monitor
+from . import bootstrap
+from . import trace
+from . import checkpoints
+from . import settings
 
 import argparse
-import configparser
-
-CONFIG_FILENAME = os.path.join(os.path.dirname(__file__), "conf", "config.ini")
 
 DESCRIPTION = "End to end script to setup a masternode"
 
 ROOT_USER = "root"
 
-def getConfig():
-    """Parse configuration file.
+def setupMasternode(name, server, password, config):
+    """Setup a single masternode, resuming the previous run if it failed.
     
-    Returns:
-        dict: Dictionary containing the options parsed.
+    Args:
+        name (str): The name to be given to the masternode.
+        server (str): The IP address of the VPS server to be used.
+        password (str): The root password for the VPS provided.
+        config (dict): Dictionary containing the options parsed.
     """
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILENAME)
+    # Record the completed steps so that a failed run may be resumed
+    journal = checkpoints.Journal(name, server)
     
-    return config
+    if journal.isResumed():
+        print("Resuming the previous setup of masternode {0}..\n".format(name))
+
+    # Setup VPS (update packages, install binaries) while the local wallet syncs, then setup the masternode
+    core.setup(server, ROOT_USER, password, name, config, journal)
+    
+    journal.clear()
 
 def begin(args):
     """Wrapper function that starts the application with the given arguments.
@@ -53,33 +65,92 @@ def begin(args):
     Args:
         args (obj): Object containing the command line arguments parsed.
     """
+    if args.trace:
+        # Record the time spent in each step, command and call
+        trace.enable()
+    
     try:
         # Parse file configuration
-        config = getConfig()
+        config = settings.getConfig()
 
+        if args.monitor:
+            # Collect the health of every masternode listed in the inventory on a schedule
+            monitor.monitor(fleet.readInventory(args.inventory), config, args.monitor_file, args.interval, args.cycles, args.workers or monitor.DEFAULT_WORKERS)
+            return
+        
         # Ensure all local requirements met (e.g. wallet installed)
         core.checkPrerequisites(config)
+        
+        if args.keep_wallet:
+            # Leave the local daemon running for the next runs, to be stopped with --stop-wallet
+            config["Wallet"]["KeepDaemonRunning"] = "true"
+        
+        if args.agent:
+            # Run the VPS steps on the VPS, in a single round trip
+            config["VPS"]["Agent"] = "true"
+        
+        if args.stop_wallet:
+            # Stop the local daemon left running by the previous runs
+            core.stopLocalWallet(config)
+            return
+        
+        if args.build_bootstrap:
+            # Build a blockchain snapshot from the local wallet data directory
+            bootstrap.buildSnapshot(os.environ[config["Environment"]["User"]], args.build_bootstrap)
+            return
+        
+        if args.inventory:
+            # Setup every masternode listed in the inventory
+            fleet.setup(fleet.readInventory(args.inventory), config, args.workers or fleet.DEFAULT_WORKERS)
+            return
     
-        # Setup VPS - Update packages, install binaries
-        vps.setup(args.vps, ROOT_USER, args.password, config)
-    
-        # Setup masternode locally
-        core.setup(args.vps, ROOT_USER, args.password, args.name, config)
+        setupMasternode(args.name, args.vps, args.password, config)
         
     except Exception as e:
         print("Masternode setup failed. Reason: {0}.".format(str(e)))  
         raise e
+        
+    finally:
+        # Close the SSH connections shared by all the steps
+        vps.closeAllChannels()
+        
+        if args.trace:
+            trace.printSummary()
+            trace.export(args.trace, args.trace_format)
     
-def setup():
+def setup(argv=None, prog=None):
     """Program entrypoint. This function will parse all program arguments and start the application.
+    
+    Args:
+        argv (list): The arguments to be parsed, defaults to the command line arguments.
+        prog (str): The program name shown in the usage, defaults to the script name.
     """
-    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser = argparse.ArgumentParser(prog=prog, description=DESCRIPTION)
+    
+    parser.add_argument("--name", action="store", help="The name to be given to the masternode")
+    parser.add_argument("--vps", action="store", help="The IP address of the VPS server to be used")
+    parser.add_argument("--password", action="store", help="The root password for the VPS provided")
+    parser.add_argument("--inventory", action="store", help="A CSV or JSON file listing the name, host and password of the masternodes to be setup")
+    parser.add_argument("--workers", action="store", type=int, help="The maximum number of VPS servers to setup ({0} by default) or monitor ({1} by default) concurrently (with --inventory)".format(fleet.DEFAULT_WORKERS, monitor.DEFAULT_WORKERS))
+    parser.add_argument("--monitor", action="store_true", help="Monitor the process, block height, masternode status and disk space of the masternodes in the inventory instead of setting them up")
+    parser.add_argument("--interval", action="store", type=float, default=monitor.DEFAULT_INTERVAL_SEC, help="The number of seconds between two monitor cycles (with --monitor)")
+    parser.add_argument("--cycles", action="store", type=int, default=0, help="The number of monitor cycles, 0 to monitor until interrupted (with --monitor)")
+    parser.add_argument("--monitor-file", action="store", metavar="FILE", help="The file the monitor samples are appended to, one JSON line per masternode and cycle (with --monitor)")
+    parser.add_argument("--trace", action="store", metavar="FILE", help="Write the timing of every step, SSH command and wallet call to a trace file")
+    parser.add_argument("--trace-format", action="store", choices=(trace.FORMAT_CHROME, trace.FORMAT_JSON), default=trace.FORMAT_CHROME, help="The format of the trace file, chrome traces can be opened in chrome://tracing or Perfetto")
+    parser.add_argument("--build-bootstrap", action="store", metavar="SNAPSHOT", help="Build a blockchain snapshot (.tar.gz) from the local wallet to seed new VPS daemons, the wallet must be closed")
+    parser.add_argument("--keep-wallet", action="store_true", help="Leave the local wallet daemon running once done so that the next runs skip its start and sync")
+    parser.add_argument("--stop-wallet", action="store_true", help="Stop the local wallet daemon left running by the previous runs")
+    parser.add_argument("--agent", action="store_true", help="Send an agent to each VPS that runs all the VPS steps at once instead of one command at a time")
+    
+    args = parser.parse_args(argv)
+    
+    if args.monitor and not args.inventory:
+        parser.error("--monitor requires --inventory")
     
-    parser.add_argument("--name", action="store", required=True, help="The name to be given to the masternode")
-    parser.add_argument("--vps", action="store", required=True, help="The IP address of the VPS server to be used")
-    parser.add_argument("--password", action="store", required=True, help="The root password for the VPS provided")
+    if not args.stop_wallet and not args.build_bootstrap and not args.inventory and not (args.name and args.vps and args.password):
+        parser.error("either --inventory or all of --name, --vps and --password are required")
     
-    args = parser.parse_args()    
     begin(args)
     
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import vps
+from . import trace
+from . import storage
+
+DEFAULT_WORKERS = 64
+DEFAULT_INTERVAL_SEC = 60
+DEFAULT_SAMPLES_FILENAME = "health.jsonl"
+
+# Number of blocks a node may be behind the highest node of the fleet before being reported
+MAX_BLOCKS_BEHIND = 2
+
+# Warn about the nodes whose data disk is fuller than this percentage
+DISK_USED_WARNING = 90
+
+# Collect every value with a single exec, one line per value
+HEALTH_COMMAND = vps.CHECK_IF_PROCESS_RUNNING_COMMAND_FMT + " && echo running || echo stopped; " \
+                 "su -c \"{1} getblockcount\" {2} 2> /dev/null || echo; " \
+                 "su -c \"{1} masternode status\" {2} 2> /dev/null | tr -d '\\n'; echo; " \
+                 "df -Pk /home/{2} | tail -n 1"
+
+def parseHealth(output):
+    """Parse the output of the health command.
+
+    Args:
+        output (str): The output of the command.
+
+    Returns:
+        Dict: The running, height, status, diskUsed (percentage) and diskFree (MB) values.
+    """
+    lines = output.split("\n")
+    lines += [""] * (4 - len(lines))
+
+    health = {"running": lines[0].strip() == "running", "height": None, "status": None, "diskUsed": None, "diskFree": None}
+
+    if lines[1].strip().isdigit():
+        health["height"] = int(lines[1])
+
+    status = lines[2].strip()
+    if status:
+        try:
+            status = json.loads(status)
+        except ValueError:
+            pass
+
+        # Depending on the version, the status is a message or an object holding one
+        if isinstance(status, dict):
+            status = status.get("message") or status.get("status")
+
+        health["status"] = str(status)
+
+    # Filesystem 1024-blocks Used Available Capacity Mounted-on
+    disk = lines[3].split()
+    if len(disk) >= 5 and disk[3].isdigit() and disk[4].rstrip("%").isdigit():
+        health["diskFree"] = int(disk[3]) // 1024
+        health["diskUsed"] = int(disk[4].rstrip("%"))
+
+    return health
+
+def checkNode(node, config):
+    """Collect the health of a masternode over its pooled SSH connection.
+
+    Args:
+        node (obj): The Node to be checked.
+        config (dict): Dictionary containing the options parsed by the utility.
+
+    Returns:
+        Dict: The sample, holding an error rather than the values if the VPS could not be reached.
+    """
+    sample = {"t": round(time.time(), 1), "name": node.name, "host": node.host}
+    start = time.time()
+
+    try:
+        channel = vps.openChannel(node.host, node.user, node.password)
+        command = HEALTH_COMMAND.format(config["Coin"]["Daemon"], config["Coin"]["Cli"], config["Coin"]["Name"])
+        exitStatus, output, errors = vps.runCommand(channel, command)
+    except Exception as e:
+        # Drop the connection so that the next cycle connects again
+        vps.closeServerChannels(node.host)
+        sample["error"] = str(e) or type(e).__name__
+    else:
+        sample.update(parseHealth(output))
+
+    sample["latency"] = int((time.time() - start) * 1000)
+    return sample
+
+def runCycle(nodes, config, workers=DEFAULT_WORKERS):
+    """Collect the health of every masternode once, using a bounded pool.
+
+    Args:
+        nodes (list): List of Node objects.
+        config (dict): Dictionary containing the options parsed by the utility.
+        workers (int): Maximum number of masternodes checked concurrently.
+
+    Returns:
+        List: The samples, in the order of the nodes.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(lambda node: checkNode(node, config), nodes))
+
+def appendSamples(path, samples):
+    """Append the samples to the time series file, one compact JSON document per line.
+
+    Args:
+        path (str): Full path to the time series file.
+        samples (list): The samples returned by runCycle.
+    """
+    with open(path, "a") as f:
+        for sample in samples:
+            f.write(json.dumps(sample, separators=(",", ":"), sort_keys=True))
+            f.write("\n")
+
+def printCycle(cycle, samples, elapsed):
+    """Print the summary of a cycle, followed by the masternodes requiring attention.
+
+    Args:
+        cycle (int): The number of the cycle.
+        samples (list): The samples returned by runCycle.
+        elapsed (float): The number of seconds taken by the cycle.
+    """
+    heights = [sample["height"] for sample in samples if sample.get("height") is not None]
+    best = max(heights) if heights else None
+
+    problems = list()
+    for sample in samples:
+        if "error" in sample:
+            problems.append((sample, "unreachable: {0}".format(sample["error"])))
+        elif not sample["running"]:
+            problems.append((sample, "daemon not running"))
+        elif sample["height"] is None:
+            problems.append((sample, "daemon not answering"))
+        elif best - sample["height"] > MAX_BLOCKS_BEHIND:
+            problems.append((sample, "{0} blocks behind".format(best - sample["height"])))
+        elif sample["diskUsed"] is not None and sample["diskUsed"] >= DISK_USED_WARNING:
+            problems.append((sample, "disk {0}% full".format(sample["diskUsed"])))
+
+    print("Cycle {0}: {1} of {2} masternodes healthy, best height {3}, {4:.1f}s".format(cycle, len(samples) - len(problems), len(samples), best, elapsed))
+
+    for sample, reason in problems:
+        print("  {0} ({1}): {2}".format(sample["name"], sample["host"], reason))
+
+    print("")
+
+def monitor(nodes, config, path=None, interval=DEFAULT_INTERVAL_SEC, cycles=0, workers=DEFAULT_WORKERS):
+    """Collect the health of every masternode on a schedule.
+
+    The SSH connections are kept open between the cycles, so that a cycle costs a single
+    exec per masternode.
+
+    Args:
+        nodes (list): List of Node objects.
+        config (dict): Dictionary containing the options parsed by the utility.
+        path (str): Full path to the time series file, defaults to the storage directory.
+        interval (float): The number of seconds between the start of two cycles.
+        cycles (int): The number of cycles to be run, 0 to run until interrupted.
+        workers (int): Maximum number of masternodes checked concurrently.
+    """
+    if path is None:
+        path = os.path.join(storage.getDirectory("monitor"), DEFAULT_SAMPLES_FILENAME)
+
+    print("Monitoring {0} masternodes every {1} seconds, writing to {2}..\n".format(len(nodes), interval, path))
+
+    cycle = 0
+    try:
+        while not cycles or cycle < cycles:
+            cycle += 1
+            start = time.time()
+
+            with trace.span("monitorCycle", trace.STEP, cycle=cycle):
+                samples = runCycle(nodes, config, workers)
+
+            elapsed = time.time() - start
+
+            appendSamples(path, samples)
+            printCycle(cycle, samples, elapsed)
+
+            if cycles and cycle >= cycles:
+                break
+
+            trace.sleep(max(0.0, interval - elapsed), "wait for next cycle")
+    except KeyboardInterrupt:
+        print("Monitoring stopped after {0} cycles..".format(cycle))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import subprocess
+
+from . import vps
+from . import rpc
+from . import trace
+from . import daemon
+
+INITIAL_DELAY_SEC = 0.5
+MAX_DELAY_SEC = 4
+BACKOFF_FACTOR = 2
+
+REMOTE_RPC_CHECK_COMMAND = "su -c \"{0} getinfo\" {1} > /dev/null"
+
+def waitUntil(condition, timeout, description, initialDelay=INITIAL_DELAY_SEC, maxDelay=MAX_DELAY_SEC):
+    """Wait for a condition to be met, checking it with exponential backoff until a deadline.
+    
+    Args:
+        condition (callable): Function returning a true value once the condition is met.
+        timeout (float): The maximum number of seconds to wait for.
+        description (str): Description of the condition, used in the error raised.
+        initialDelay (float): The delay before the second check, doubled after each check.
+        maxDelay (float): The maximum delay between two checks.
+        
+    Returns:
+        Obj: The value returned by the condition.
+    """
+    deadline = time.time() + timeout
+    delay = initialDelay
+    
+    while True:
+        value = condition()
+        if value:
+            return value
+        
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise ValueError("Timed out after {0} seconds waiting for {1}".format(timeout, description))
+        
+        trace.sleep(min(delay, remaining), "wait for {0}".format(description))
+        delay = min(delay * BACKOFF_FACTOR, maxDelay)
+
+def isLocalRpcReady(cli):
+    """Check if the local daemon answers RPC calls.
+    
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        
+    Returns:
+        Boolean: True if the daemon answered, False if it is unreachable or still warming up.
+    """
+    try:
+        daemon.getBlockchainInfo(cli)
+    except rpc.RpcError as e:
+        if e.code != rpc.RPC_IN_WARMUP:
+            raise
+        
+        return False
+    except (OSError, subprocess.CalledProcessError):
+        # Not listening yet, or the cli reported an error while warming up
+        return False
+    
+    return True
+
+def waitForLocalDaemonReady(proc, cli, timeout):
+    """Wait for a local daemon that was just started to answer RPC calls.
+    
+    Fails as soon as the daemon process exits with an error, reporting its stderr output.
+    
+    Args:
+        proc (obj): The daemon process, as returned by the daemon start function.
+        cli (str): Full path to cli binary associated with coin.
+        timeout (float): The maximum number of seconds to wait for.
+    """
+    def isReady():
+        # On some systems the process forks itself into the background and exits with 0
+        exitStatus = proc.poll()
+        
+        if exitStatus:
+            errors = proc.stderr.read().decode(daemon.DEFAULT_DECODE, "replace").strip()
+            raise ValueError("Local daemon exited with status {0}: {1}".format(exitStatus, errors))
+        
+        return isLocalRpcReady(cli)
+    
+    waitUntil(isReady, timeout, "local daemon to answer RPC calls")
+
+def waitForRemoteProcessExit(channel, processName, timeout):
+    """Wait for a process running on the VPS to terminate.
+    
+    Args:
+        channel (obj): The client object returned by the vps open function.
+        processName (str): The name of the process.
+        timeout (float): The maximum number of seconds to wait for.
+    """
+    waitUntil(lambda: not vps.isProcessRunning(channel, processName), timeout, "{0} to stop".format(processName))
+    
+def isRemoteRpcReady(channel, cli, coinName):
+    """Check if the daemon running on the VPS answers RPC calls.
+    
+    Args:
+        channel (obj): The client object returned by the vps open function.
+        cli (str): The name of the coin cli to be used.
+        coinName (str): The name of the coin, also the user running the daemon.
+        
+    Returns:
+        Boolean: True if the daemon answered, False otherwise (e.g. still warming up).
+    """
+    exitStatus, output, errors = vps.runCommand(channel, REMOTE_RPC_CHECK_COMMAND.format(cli, coinName))
+    return exitStatus == 0
+
+def waitForRemoteDaemonReady(channel, cli, daemonName, coinName, timeout):
+    """Wait for the daemon running on the VPS to answer RPC calls.
+    
+    Fails as soon as the daemon process exits. If the daemon is still running but warming up
+    when the deadline is reached, a warning is printed and the daemon is considered started.
+    
+    Args:
+        channel (obj): The client object returned by the vps open function.
+        cli (str): The name of the coin cli to be used.
+        daemonName (str): The name of the coin daemon.
+        coinName (str): The name of the coin, also the user running the daemon.
+        timeout (float): The maximum number of seconds to wait for.
+    """
+    def isReady():
+        if isRemoteRpcReady(channel, cli, coinName):
+            return True
+        
+        if not vps.isProcessRunning(channel, daemonName):
+            raise ValueError("Daemon {0} exited on VPS".format(daemonName))
+        
+        return False
+    
+    try:
+        waitUntil(isReady, timeout, "{0} to answer RPC calls".format(daemonName))
+    except ValueError:
+        if not vps.isProcessRunning(channel, daemonName):
+            raise
+        
+        print("Daemon is running but not answering RPC calls yet, continuing..")
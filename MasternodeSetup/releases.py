@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import time
+import hashlib
+
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from . import trace
+from . import storage
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_CACHE_TTL_SEC = 3600
+
+LATEST_RELEASE_URL = "{0}/repos/{1}/{2}/releases/latest"
+
+# One lock per release url so that concurrent workers share a single lookup
+lookupLocks = storage.KeyedLocks()
+
+def getCachePath(url):
+    """Get the path of the file caching the response of the specified url.
+
+    Args:
+        url (str): The url of the release lookup.
+
+    Returns:
+        String: Full path to the cache file.
+    """
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(storage.getDirectory("releases"), "{0}.json".format(name))
+
+def fetch(url, etag):
+    """Query the releases api, revalidating the cached response if there is one.
+
+    Args:
+        url (str): The url of the release lookup.
+        etag (str): The ETag of the cached response, if any.
+
+    Returns:
+        2-Tuple: Tuple containing the release and its ETag, the release is None if the cached response is still valid.
+    """
+    request = Request(url, headers={"Accept": "application/vnd.github+json"})
+
+    if etag:
+        request.add_header("If-None-Match", etag)
+
+    try:
+        with trace.span("fetchRelease", trace.NETWORK, url=url), urlopen(request) as response:
+            return (json.loads(response.read().decode("utf-8")), response.headers.get("ETag"))
+    except HTTPError as e:
+        # Not modified responses don't count against the api rate limit
+        if e.code == 304 and etag:
+            return (None, etag)
+
+        raise
+
+def getLatestRelease(gitOwner, gitProject, apiUrl=DEFAULT_API_URL, cacheTtl=DEFAULT_CACHE_TTL_SEC):
+    """Get the latest release published for the coin.
+
+    The response is cached on disk. Within the cache TTL the cached release is returned
+    directly, after that it is revalidated with a conditional request. If the api cannot be
+    reached the cached release, if any, is returned.
+
+    Args:
+        gitOwner (str): The Git owner of the project.
+        gitProject (str): The name of the project in Git.
+        apiUrl (str): The base url of the github api.
+        cacheTtl (float): The number of seconds a cached release is used without revalidation.
+
+    Returns:
+        Dict: The release, as returned by the github releases api.
+    """
+    url = LATEST_RELEASE_URL.format(apiUrl.rstrip("/"), gitOwner, gitProject)
+    cachePath = getCachePath(url)
+
+    with lookupLocks.get(url):
+        cached = storage.loadJson(cachePath)
+
+        if cached is not None and time.time() - cached["fetched"] < cacheTtl:
+            return cached["release"]
+
+        try:
+            release, etag = fetch(url, cached["etag"] if cached else None)
+        except (HTTPError, URLError) as e:
+            if cached is None:
+                raise
+
+            print("Unable to check for a new release ({0}), using the cached release..".format(str(e)))
+            return cached["release"]
+
+        if release is None:
+            release = cached["release"]
+
+        storage.saveJson(cachePath, {"url": url, "etag": etag, "fetched": time.time(), "release": release})
+        return release
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import base64
+import threading
+import http.client
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_TIMEOUT_SEC = 60
+
+# The daemon drops idle keep-alive connections (rpcservertimeout), reconnect before that happens
+IDLE_RECONNECT_SEC = 15
+
+# Error code returned while the daemon is loading (e.g. block index, wallet)
+RPC_IN_WARMUP = -28
+
+# Error code returned by the wallet calls while the wallet is encrypted and locked
+RPC_WALLET_UNLOCK_NEEDED = -13
+RPC_METHOD_NOT_FOUND = -32601
+
+RPC_PATH = "/"
+RPC_VERSION = "1.0"
+
+# Calls that must never be sent twice, a lost response does not mean the call wasn't executed
+NON_RETRYABLE_METHODS = ("sendtoaddress", "sendmany", "sendfrom")
+
+class RpcError(ValueError):
+    """Error returned by the daemon in response to a JSON-RPC call."""
+
+    def __init__(self, code, message):
+        super(RpcError, self).__init__("RPC error {0}: {1}".format(code, message))
+
+        self.code = code
+        self.message = message
+
+class RpcUnavailableError(OSError):
+    """Raised when no connection could be established with the daemon, the call was not sent."""
+
+class RpcClient(object):
+    """Minimal JSON-RPC client for the coin daemon reusing a single keep-alive HTTP connection."""
+
+    def __init__(self, user, password, port, host=DEFAULT_HOST, timeout=DEFAULT_TIMEOUT_SEC):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        credentials = "{0}:{1}".format(user, password).encode("utf-8")
+        self.authorization = "Basic {0}".format(base64.b64encode(credentials).decode("ascii"))
+
+        self.connection = None
+        self.lastUsed = 0
+        self.nextId = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        """Close the underlying HTTP connection, the next call will open a new one."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def connect(self):
+        """Ensure an HTTP connection to the daemon is open.
+
+        Raises:
+            RpcUnavailableError: If the daemon could not be reached.
+        """
+        if self.connection is not None and time.time() - self.lastUsed > IDLE_RECONNECT_SEC:
+            self.close()
+
+        if self.connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+            try:
+                connection.connect()
+            except OSError as e:
+                raise RpcUnavailableError("Unable to connect to daemon RPC at {0}:{1}: {2}".format(self.host, self.port, str(e)))
+
+            self.connection = connection
+
+    def post(self, payload):
+        """Send a JSON-RPC payload over the keep-alive connection and return the decoded response.
+
+        Args:
+            payload (obj): The request object (or list of objects) to be sent.
+
+        Returns:
+            Obj: The decoded JSON response.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Authorization": self.authorization, "Content-Type": "application/json"}
+
+        self.connect()
+
+        try:
+            self.connection.request("POST", RPC_PATH, body, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+        self.lastUsed = time.time()
+
+        if response.status == http.client.UNAUTHORIZED:
+            raise RpcError(response.status, "Authorization failed, check rpcuser and rpcpassword")
+
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            raise RpcError(response.status, "Invalid response: {0}".format(data[:200]))
+
+    def request(self, payload, retry):
+        """Send a payload, retrying once on a fresh connection if the previous one was dropped.
+
+        Args:
+            payload (obj): The request object (or list of objects) to be sent.
+            retry (bool): True if the payload may safely be sent a second time.
+
+        Returns:
+            Obj: The decoded JSON response.
+        """
+        with self.lock:
+            try:
+                return self.post(payload)
+            except RpcUnavailableError:
+                raise
+            except (OSError, http.client.HTTPException):
+                if not retry:
+                    raise
+
+                return self.post(payload)
+
+    def createRequest(self, method, params):
+        """Build a JSON-RPC request object with a unique id."""
+        self.nextId += 1
+        return {"jsonrpc": RPC_VERSION, "id": self.nextId, "method": method, "params": list(params)}
+
+    def call(self, method, *params):
+        """Execute a single JSON-RPC call.
+
+        Args:
+            method (str): The name of the RPC method.
+            params (list): The positional parameters of the call.
+
+        Returns:
+            Obj: The result of the call.
+        """
+        with self.lock:
+            payload = self.createRequest(method, params)
+
+        response = self.request(payload, method not in NON_RETRYABLE_METHODS)
+        return getResult(response)
+
+    def batch(self, calls):
+        """Execute several independent JSON-RPC calls in a single HTTP request.
+
+        Args:
+            calls (list): List of (method, params) tuples.
+
+        Returns:
+            List: The result of each call, in the order of the calls provided.
+        """
+        if not calls:
+            return []
+
+        with self.lock:
+            payload = [self.createRequest(method, params) for method, params in calls]
+
+        retry = not any(method in NON_RETRYABLE_METHODS for method, params in calls)
+        responses = self.request(payload, retry)
+
+        if not isinstance(responses, list):
+            # The daemon rejected the batch as a whole
+            getResult(responses)
+            raise RpcError(None, "Unexpected response to batch request")
+
+        # Responses may be returned in any order, match them back to the requests by id
+        responsesById = dict((response.get("id"), response) for response in responses)
+
+        results = list()
+        for request in payload:
+            response = responsesById.get(request["id"])
+
+            if response is None:
+                raise RpcError(None, "No response for {0} in batch".format(request["method"]))
+
+            results.append(getResult(response))
+
+        return results
+
+def getResult(response):
+    """Extract the result of a JSON-RPC response, raising the error it contains if any.
+
+    Args:
+        response (dict): The decoded JSON-RPC response.
+
+    Returns:
+        Obj: The result of the call.
+    """
+    error = response.get("error")
+
+    if error:
+        raise RpcError(error.get("code"), error.get("message"))
+
+    return response.get("result")
+
+def readConfFile(confFile):
+    """Parse the key=value settings of a coin conf file.
+
+    Args:
+        confFile (str): Full path to the conf file.
+
+    Returns:
+        Dict: Dictionary of the settings found, the last occurrence of a key wins.
+    """
+    with open(confFile) as f:
+        return parseConf(f.read())
+
+def parseConf(contents):
+    """Parse the key=value settings of the contents of a coin conf file.
+
+    Args:
+        contents (str): The contents of the conf file.
+
+    Returns:
+        Dict: Dictionary of the settings found, the last occurrence of a key wins.
+    """
+    values = dict()
+
+    for line in contents.splitlines():
+        line = line.split("#", 1)[0].strip()
+
+        if "=" in line:
+            key, value = line.split("=", 1)
+            values[key.strip()] = value.strip()
+
+    return values
+
+def createClient(confFile, defaultPort):
+    """Create an RPC client from the credentials present in the wallet conf file.
+
+    Args:
+        confFile (str): Full path to the wallet conf file.
+        defaultPort (int): The RPC port to be used when the conf file doesn't define rpcport.
+
+    Returns:
+        Obj: The RpcClient, or None if the conf file doesn't contain rpcuser / rpcpassword.
+    """
+    values = readConfFile(confFile)
+
+    if "rpcuser" not in values or "rpcpassword" not in values:
+        return None
+
+    port = int(values.get("rpcport", defaultPort))
+    return RpcClient(values["rpcuser"], values["rpcpassword"], port)
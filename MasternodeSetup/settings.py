@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import configparser
+
+from os import environ
+
+CONFIG_FILENAME = os.path.join(os.path.dirname(__file__), "conf", "config.ini")
+
+def getConfig():
+    """Parse configuration file.
+    
+    Returns:
+        dict: Dictionary containing the options parsed.
+    """
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILENAME)
+    
+    return config
+
+def checkIfEnvironmentDefined(envHome, envUser):
+    """Checks if the required environment variables are defined.
+    
+    Args:
+        envHome (str): The name of the home environment variable.
+        envUser (str): The name of the user environment variable.
+    """
+    if envHome not in environ:
+        raise ValueError("Please set {0} environment variable".format(envHome))
+        
+    elif envUser not in environ:
+        raise ValueError("Please set {0} environment variable".format(envUser))
+       
+def getCoinBinaries(envHome, cliName, daemonName):
+    """Gets the full paths of the binaries associated with this coin.
+    
+    Args:
+        envHome (str): The name of the home environment variable.
+        cliName (str): The name of the cli binary associated with this coin.
+        daemonName (str): The name of the daemon binary associated with this coin.
+        
+    Returns:
+        2-Tuple: Tuple containing the full paths as described.
+    """
+    homePath = environ.get(envHome)
+
+    cli = os.path.join(homePath, "daemon", cliName)
+    daemonCli = os.path.join(homePath, "daemon", daemonName)
+    
+    return (cli, daemonCli)
+
+def getCoinFiles(envUser, walletConf, masternodeConf):    
+    """Gets the full paths of the conf files associated with this coin.
+    
+    Args:
+        envUser (str): The name of the user environment variable.
+        walletConf (str): The name of the wallet conf file.
+        masternodeConf (str): The name of the masternode conf file.
+        
+    Returns:
+        2-Tuple: Tuple full paths as described.
+    """
+    userPath = environ.get(envUser)
+    
+    walletConfFile = os.path.join(userPath, walletConf)
+    masternodeConfFile = os.path.join(userPath, masternodeConf)
+    
+    return (walletConfFile, masternodeConfFile)
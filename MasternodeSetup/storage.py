@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import threading
+
+# Environment variable overriding the directory holding the caches and state of this utility
+STORAGE_DIRECTORY_ENV = "MASTERNODE_SETUP_HOME"
+DEFAULT_STORAGE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".MasternodeSetup")
+
+class KeyedLocks(object):
+    """One lock per key (e.g. a cached file or url), so that concurrent workers fill a cache entry once."""
+
+    def __init__(self):
+        self.locks = dict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Get the lock guarding the specified key, creating it if necessary.
+
+        Args:
+            key (str): The key guarded by the lock.
+
+        Returns:
+            Obj: The lock of the key.
+        """
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+def getDirectory(*parts):
+    """Get a directory used to store the caches and state of this utility, creating it if necessary.
+
+    Args:
+        parts (list): The path components of the directory, relative to the storage directory.
+
+    Returns:
+        String: The full path of the directory.
+    """
+    root = os.environ.get(STORAGE_DIRECTORY_ENV, DEFAULT_STORAGE_DIRECTORY)
+    directory = os.path.join(root, *parts)
+
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def loadJson(path, default=None):
+    """Load a JSON document previously saved with saveJson.
+
+    Args:
+        path (str): Full path to the file.
+        default (obj): The value returned if the file doesn't exist or is unreadable.
+
+    Returns:
+        Obj: The decoded document.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return default
+
+def saveJson(path, value):
+    """Save a JSON document, atomically replacing the previous version.
+
+    Args:
+        path (str): Full path to the file.
+        value (obj): The document to be saved.
+    """
+    temporaryPath = "{0}.{1}.tmp".format(path, os.getpid())
+
+    with open(temporaryPath, "w") as f:
+        json.dump(value, f, indent=2, sort_keys=True)
+
+    os.replace(temporaryPath, path)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+
+from . import trace
+from . import daemon
+
+MIN_POLL_INTERVAL_SEC = 1
+MAX_POLL_INTERVAL_SEC = 30
+
+# Fraction of the estimated time remaining to wait between two polls
+POLL_INTERVAL_FRACTION = 0.1
+
+# Weight of the latest sample in the block throughput estimate
+RATE_SMOOTHING = 0.3
+
+# The chain is considered in sync once the best block is at most this old
+RECENT_BLOCK_AGE_SEC = 2 * 60 * 60
+
+class SyncMonitor(object):
+    """Tracks the blockchain info samples of a syncing wallet to estimate its throughput and time remaining."""
+
+    def __init__(self):
+        self.lastTime = None
+        self.lastBlocks = None
+        self.rate = None
+
+        self.values = dict()
+
+    def update(self, values, now=None):
+        """Record a new blockchain info sample.
+
+        Args:
+            values (dict): The decoded getblockchaininfo output.
+            now (float): The time the sample was taken, defaults to the current time.
+        """
+        now = time.time() if now is None else now
+        blocks = values.get("blocks", 0)
+
+        if self.lastTime is not None and now > self.lastTime:
+            rate = max(blocks - self.lastBlocks, 0) / (now - self.lastTime)
+            self.rate = rate if self.rate is None else RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * self.rate
+
+        self.lastTime = now
+        self.lastBlocks = blocks
+        self.values = values
+
+    def getRemainingBlocks(self):
+        """Get the number of blocks still to be downloaded based on the headers known.
+
+        Returns:
+            Int: The number of blocks remaining.
+        """
+        return max(self.values.get("headers", 0) - self.values.get("blocks", 0), 0)
+
+    def getEta(self):
+        """Estimate the time remaining before the wallet is in sync.
+
+        Returns:
+            Float: The number of seconds remaining, or None if no estimate is available yet.
+        """
+        remaining = self.getRemainingBlocks()
+
+        if remaining == 0:
+            return 0
+
+        if not self.rate:
+            return None
+
+        return remaining / self.rate
+
+    def getPollInterval(self):
+        """Determine how long to wait before the next sample, adapted to the observed throughput.
+
+        Returns:
+            Float: The number of seconds to wait.
+        """
+        eta = self.getEta()
+
+        if eta is None:
+            return MIN_POLL_INTERVAL_SEC
+
+        return min(max(eta * POLL_INTERVAL_FRACTION, MIN_POLL_INTERVAL_SEC), MAX_POLL_INTERVAL_SEC)
+
+    def getProgress(self):
+        """Get a summary of the current sync state, as passed to progress callbacks.
+
+        Returns:
+            Dict: Dictionary containing the blocks, headers, progress (0-1), rate (blocks/sec) and eta (sec).
+        """
+        return {"blocks": self.values.get("blocks", 0),
+                "headers": self.values.get("headers", 0),
+                "progress": self.values.get("verificationprogress", 0),
+                "rate": self.rate,
+                "eta": self.getEta()}
+
+def formatDuration(seconds):
+    """Format a number of seconds as a short human readable duration.
+
+    Args:
+        seconds (float): The duration.
+
+    Returns:
+        String: The formatted duration (e.g. 1h02m, 3m20s, 12s).
+    """
+    seconds = int(seconds)
+
+    if seconds >= 3600:
+        return "{0}h{1:02d}m".format(seconds // 3600, (seconds % 3600) // 60)
+
+    elif seconds >= 60:
+        return "{0}m{1:02d}s".format(seconds // 60, seconds % 60)
+
+    return "{0}s".format(seconds)
+
+def printProgress(progress):
+    """Default progress callback, prints the sync progress and estimated time remaining.
+
+    Args:
+        progress (dict): The progress, as returned by SyncMonitor.getProgress.
+    """
+    eta = "unknown" if progress["eta"] is None else formatDuration(progress["eta"])
+
+    print("Progress.. {0:.2f}% (block {1} of {2}, {3} remaining)".format(progress["progress"] * 100, progress["blocks"], progress["headers"], eta))
+
+def isBestBlockRecent(cli, values):
+    """Check if the best block of the wallet was mined recently.
+
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        values (dict): The decoded getblockchaininfo output.
+
+    Returns:
+        Boolean: True if the best block is recent, False otherwise.
+    """
+    if "bestblockhash" not in values:
+        return False
+
+    header = json.loads(daemon.getBlockHeader(cli, values["bestblockhash"]))
+    return time.time() - header.get("time", 0) <= RECENT_BLOCK_AGE_SEC
+
+def isSynced(cli, values):
+    """Check if the wallet is in sync based on a blockchain info sample.
+
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        values (dict): The decoded getblockchaininfo output.
+
+    Returns:
+        Boolean: True if the wallet is in sync, False otherwise.
+    """
+    if values.get("verificationprogress", 0) >= 1:
+        return True
+
+    # Otherwise all the known blocks must be downloaded
+    headers = values.get("headers", 0)
+    if headers == 0 or values.get("blocks", 0) < headers:
+        return False
+
+    # Reported directly by the more recent daemons, otherwise check that the chain tip is recent
+    if "initialblockdownload" in values:
+        return not values["initialblockdownload"]
+
+    return isBestBlockRecent(cli, values)
+
+def waitForSync(cli, onProgress=printProgress):
+    """Wait for the wallet to be in sync, polling at an interval adapted to the sync throughput.
+
+    Args:
+        cli (str): Full path to cli binary associated with coin.
+        onProgress (callable): Function called with the progress (see SyncMonitor.getProgress) after each sample.
+    """
+    monitor = SyncMonitor()
+
+    while True:
+        values = json.loads(daemon.getBlockchainInfo(cli))
+        monitor.update(values)
+
+        if isSynced(cli, values):
+            break
+
+        if onProgress is not None:
+            onProgress(monitor.getProgress())
+
+        trace.sleep(monitor.getPollInterval(), "wait for sync")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from . import trace
+
+class TaskCancelledError(Exception):
+    """Raised by a long running task that gives up because another task failed."""
+
+class TaskGraph(object):
+    """Independent steps run concurrently, each one starting as soon as the steps it depends on complete.
+
+    Once a task fails, or the run is interrupted (e.g. Ctrl+C), no new task is started, the tasks
+    already running are waited for (they may give up early with checkCancelled) and the first
+    error is raised.
+    """
+
+    def __init__(self):
+        self.tasks = OrderedDict()
+        self.results = dict()
+        self.failed = threading.Event()
+
+    def add(self, name, function, dependencies=()):
+        """Add a task to the graph.
+
+        Dependencies must be added first, which keeps the graph free of cycles.
+
+        Args:
+            name (str): The unique name of the task.
+            function (callable): Function executing the task, its return value is stored in results.
+            dependencies (list): The names of the tasks that must complete before this one starts.
+        """
+        if name in self.tasks:
+            raise ValueError("Duplicate task: {0}".format(name))
+
+        unknown = [dependency for dependency in dependencies if dependency not in self.tasks]
+        if unknown:
+            raise ValueError("Task {0} depends on unknown tasks: {1}".format(name, ", ".join(unknown)))
+
+        self.tasks[name] = (function, tuple(dependencies))
+
+    def checkCancelled(self):
+        """Give up a long running task if another task failed.
+
+        Raises:
+            TaskCancelledError: If a task of the graph failed.
+        """
+        if self.failed.is_set():
+            raise TaskCancelledError("Cancelled because another step failed")
+
+    def execute(self, name):
+        """Run a task in a worker thread, tracing its duration.
+
+        Args:
+            name (str): The name of the task.
+
+        Returns:
+            Obj: The return value of the task function.
+        """
+        function, dependencies = self.tasks[name]
+
+        with trace.span(name, trace.STEP, task=True):
+            return function()
+
+    def run(self):
+        """Run every task, using one thread per task that is ready.
+
+        Returns:
+            Dict: Dictionary mapping each task name to its return value.
+        """
+        done = set()
+        running = dict()
+        errors = list()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.tasks))) as executor:
+            try:
+                while True:
+                    if not self.failed.is_set():
+                        for name, (function, dependencies) in self.tasks.items():
+                            if name not in done and name not in running.values() and all(dependency in done for dependency in dependencies):
+                                running[executor.submit(self.execute, name)] = name
+
+                    if not running:
+                        break
+
+                    finished, pending = wait(list(running), return_when=FIRST_COMPLETED)
+
+                    for future in finished:
+                        name = running.pop(future)
+
+                        try:
+                            self.results[name] = future.result()
+                        except Exception as e:
+                            # Cancellations are a consequence of the first error, not worth reporting
+                            if not isinstance(e, TaskCancelledError):
+                                errors.append(e)
+
+                            self.failed.set()
+                        else:
+                            done.add(name)
+            except BaseException:
+                # e.g. KeyboardInterrupt, leaving the executor waits for the running tasks so they must give up
+                self.failed.set()
+                raise
+
+        if errors:
+            raise errors[0]
+
+        if self.failed.is_set():
+            raise TaskCancelledError("Cancelled")
+
+        return self.results
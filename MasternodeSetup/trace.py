@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import threading
+import functools
+
+from contextlib import contextmanager
+
+# Span categories, kept apart so that the time spent waiting on each resource can be compared
+STEP = "step"
+NETWORK = "network"
+REMOTE = "remote"
+RPC = "rpc"
+SLEEP = "sleep"
+
+CATEGORIES = (STEP, NETWORK, REMOTE, RPC, SLEEP)
+
+FORMAT_CHROME = "chrome"
+FORMAT_JSON = "json"
+
+# Spans are only recorded once enabled, leaving normal runs unaffected
+enabled = False
+origin = time.time()
+
+spans = list()
+spansLock = threading.Lock()
+
+def enable():
+    """Start recording spans, discarding any previously recorded ones."""
+    global enabled, origin
+
+    with spansLock:
+        del spans[:]
+        origin = time.time()
+        enabled = True
+
+def record(name, category, start, duration, args=None):
+    """Record a completed span.
+
+    Args:
+        name (str): The name of the span.
+        category (str): One of the span categories.
+        start (float): The start time of the span, as returned by time.time.
+        duration (float): The duration of the span in seconds.
+        args (dict): Optional details shown alongside the span.
+    """
+    thread = threading.current_thread()
+
+    span = {"name": name, "category": category, "start": start - origin, "duration": duration,
+            "thread": thread.ident, "threadName": thread.name, "args": args or dict()}
+
+    with spansLock:
+        spans.append(span)
+
+@contextmanager
+def span(name, category=STEP, **args):
+    """Time the enclosed block, the span is recorded even if the block raises.
+
+    Args:
+        name (str): The name of the span.
+        category (str): One of the span categories.
+        args (dict): Optional details shown alongside the span.
+    """
+    if not enabled:
+        yield
+        return
+
+    start = time.time()
+
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = str(e)
+        raise
+    finally:
+        record(name, category, start, time.time() - start, args)
+
+def traced(category=STEP):
+    """Decorator wrapping every call of a function in a span named after the function.
+
+    Args:
+        category (str): One of the span categories.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(function.__name__, category):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+def sleep(seconds, reason="sleep"):
+    """Deliberate wait, recorded as a sleep span so that it is not mistaken for remote work.
+
+    Args:
+        seconds (float): The number of seconds to sleep for.
+        reason (str): The name given to the span.
+    """
+    with span(reason, SLEEP):
+        time.sleep(seconds)
+
+def getTotals():
+    """Sum the recorded span durations per category.
+
+    Nested spans are counted in their own category as well as in the enclosing one, so the
+    totals of different categories overlap.
+
+    Returns:
+        Dict: Dictionary mapping each category to a (count, total seconds) tuple.
+    """
+    with spansLock:
+        recorded = list(spans)
+
+    totals = dict()
+    for category in CATEGORIES:
+        durations = [s["duration"] for s in recorded if s["category"] == category]
+        totals[category] = (len(durations), sum(durations))
+
+    return totals
+
+def printSummary():
+    """Print the number of spans and total time per category."""
+    print("Trace summary:\n")
+
+    for category, (count, total) in sorted(getTotals().items()):
+        print("{0:<8} {1:>6} spans {2:>10.2f}s".format(category, count, total))
+
+    print("")
+
+def toChromeTrace(recorded):
+    """Convert spans to the Chrome trace event format (chrome://tracing, Perfetto).
+
+    Args:
+        recorded (list): List of recorded spans.
+
+    Returns:
+        Dict: The trace, as complete ("X") events with microsecond timestamps.
+    """
+    events = list()
+    threadNames = dict()
+
+    for s in recorded:
+        threadNames[s["thread"]] = s["threadName"]
+
+        events.append({"name": s["name"], "cat": s["category"], "ph": "X", "pid": 1, "tid": s["thread"],
+                       "ts": int(s["start"] * 1e6), "dur": int(s["duration"] * 1e6), "args": s["args"]})
+
+    for thread, threadName in threadNames.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread, "args": {"name": threadName}})
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def export(path, traceFormat=FORMAT_CHROME):
+    """Write the recorded spans to a file.
+
+    Args:
+        path (str): The full path of the trace file.
+        traceFormat (str): Either FORMAT_CHROME or FORMAT_JSON (a plain list of spans in seconds).
+    """
+    with spansLock:
+        recorded = sorted(spans, key=lambda s: s["start"])
+
+    if traceFormat == FORMAT_CHROME:
+        trace = toChromeTrace(recorded)
+    elif traceFormat == FORMAT_JSON:
+        trace = {"origin": origin, "spans": recorded}
+    else:
+        raise ValueError("Unknown trace format: {0}".format(traceFormat))
+
+    with open(path, "w") as f:
+        json.dump(trace, f, default=str)
+
+    print("Trace with {0} spans written to {1}\n".format(len(recorded), path))
@@ -23,31 +23,180 @@
 # SOFTWARE.
 
 import os
+import re
+import json
+import stat
 import time
+import codecs
 
-import json
+import selectors
+import hashlib
 import paramiko
+import binascii
+import posixpath
+import threading
 
 from io import BytesIO
-from urllib.request import urlopen
+
+from . import agent
+from . import trace
+from . import storage
+from . import releases
+from . import artifacts
+from . import checkpoints
 
 DEFAULT_DECODE = "utf-8"
 
 CHECK_RELEASE_COMMAND = "lsb_release -a"
-UPDATE_TOOLS_COMMAND = "apt-get -y update && apt-get -y upgrade && apt-get -y install wget"
+UNSUPPORTED_RELEASE_MESSAGE = "Unsupported operating system, refer to documentation for more info"
+DAEMON_RUNNING_MESSAGE_FMT = "The \'{0}\' daemon is currently running, please stop it and try again"
+UPDATE_TOOLS_COMMAND = "apt-get {0}-y update && apt-get {0}-y upgrade && apt-get {0}-y install wget"
+
+# Only used for the commands run by this utility, the VPS configuration is left untouched
+APT_PROXY_OPTION = "-o Acquire::http::Proxy={0} "
+
+UPGRADES_FILENAME = "upgrades.json"
 
 INSTALL_COIN_COMMAND = "mkdir -p /home/{0} && " \
                         "wget -qO- {1} | tar xvz --strip-components=1 -C /home/{0} && " \
                         "cp /home/{0}/bin/* /usr/local/bin"
 
-GET_LATEST_GIT_RELEASE_COMMAND = "https://api.github.com/repos/{0}/{1}/releases/latest"
+INSTALL_COIN_FROM_FILE_COMMAND = "mkdir -p /home/{0} && " \
+                                  "tar xvzf {1} --strip-components=1 -C /home/{0} && " \
+                                  "cp /home/{0}/bin/* /usr/local/bin && " \
+                                  "rm -f {1}"
+
+# Either download the release on the VPS, or on this computer once and send it to the VPS
+INSTALL_MODE_DIRECT = "direct"
+INSTALL_MODE_PUSH = "push"
+
+# Files sent to the VPS are staged in a directory only the SSH user may access. The path is relative
+# to the home directory of the user, where SFTP paths are resolved and the commands run.
+REMOTE_PRIVATE_DIRECTORY = ".masternode-setup"
                         
 IS_COIN_INSTALLED_COMMAND = "command -v {0}"
 CHECK_IF_PROCESS_RUNNING_COMMAND_FMT = "ps cax | grep {0} > /dev/null"
 
+# Gathers the facts the preflight checks are decided on in a single round trip, one key=value per line.
+# The arguments are the daemon, cli and coin user names.
+GATHER_FACTS_COMMAND = "echo \"codename=$(lsb_release -cs 2> /dev/null || (. /etc/os-release && echo $VERSION_CODENAME))\"; " \
+                       "echo \"description=$(lsb_release -ds 2> /dev/null || (. /etc/os-release && echo $PRETTY_NAME))\"; " \
+                       "echo \"binary.{0}=$(command -v {0})\"; " \
+                       "echo \"binary.{1}=$(command -v {1})\"; " \
+                       "echo \"version=$(command -v {0} > /dev/null && timeout 10 {0} -version 2> /dev/null | head -n 1)\"; " \
+                       "echo \"processes=$(ps -eo comm= | sort -u | tr '\\n' ' ')\"; " \
+                       "echo \"uid=$(id -u {2} 2> /dev/null)\"; " \
+                       "echo \"disk=$(df -Pk / | tail -n 1)\"; " \
+                       "echo \"memory=$(grep -E '^(MemTotal|MemAvailable):' /proc/meminfo | tr -s ' ' | tr '\\n' ' ')\""
+
+GATHER_FACTS_KEYS = ("codename", "description", "version", "processes", "uid", "disk", "memory")
+REMOTE_CHECKSUM_COMMAND = "sha256sum {0}"
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PARTIAL_UPLOAD_SUFFIX = ".part"
+
+KEEPALIVE_INTERVAL_SEC = 30
+CONNECT_TIMEOUT_SEC = 30
+
+RECEIVE_BUFFER_SIZE = 32768
+
+# Follow the file from its first line, even if it doesn't exist yet or is recreated. The remote
+# timeout ensures tail exits if the connection is dropped before the watch is done
+WATCH_LOG_COMMAND = "timeout {0} tail -n +1 -F {1} 2> /dev/null"
+
+# Upper bound on a single wait, the channel normally wakes us up as soon as output or exit arrives
+COMMAND_WAIT_INTERVAL_SEC = 1
+
+# Time given to the last of the output once the command exited, a daemon it forked may keep the
+# streams open forever so their end can't be waited for
+OUTPUT_DRAIN_TIMEOUT_SEC = 0.5
+
+# The agent is sent once per version to the private directory, named after its checksum, and
+# reads its plan from stdin. It is only run once verified against the checksum of this version
+AGENT_SOURCE_FILE = os.path.join(os.path.dirname(__file__), "agent.py")
+AGENT_REMOTE_PATH_FMT = posixpath.join(REMOTE_PRIVATE_DIRECTORY, "agent-{0}.py")
+AGENT_COMMAND = "echo \"{0}  {1}\" | sha256sum -c --status - 2> /dev/null || exit {2}; python3 {1}"
+
+# Exit status of the command when the agent is missing or altered, and of the shell when python3 is
+AGENT_MISSING_STATUS = 2
+PYTHON_MISSING_STATUS = 127
+
+# Serializes the updates of the upgrades file by concurrent fleet workers
+upgradesLock = threading.Lock()
+
+# Open connections shared by all steps, keyed by (server, username)
+channelPool = dict()
+channelPoolLock = threading.Lock()
+
+class PooledClient(paramiko.SSHClient):
+    """SSH client kept open in the connection pool and shared by every step run against a server."""
+
+    def __init__(self, server, username, password):
+        super(PooledClient, self).__init__()
+        self.set_missing_host_key_policy(paramiko.AutoAddPolicy)
+
+        self.server = server
+        self.username = username
+        self.password = password
+
+        self.lock = threading.RLock()
+        
+        # SFTP sessions keyed by thread, a session can't serve concurrent requests
+        self.sftp = dict()
+
+    def isActive(self):
+        """Check if the underlying transport is still connected.
+
+        Returns:
+            Boolean: True if the connection may be used, False otherwise.
+        """
+        transport = self.get_transport()
+        return transport is not None and transport.is_active()
+
+    def reconnect(self):
+        """Establish the connection, closing the previous one if necessary."""
+        with self.lock:
+            self.sftp = dict()
+            self.close()
+
+            with trace.span("connect", trace.NETWORK, server=self.server):
+                self.connect(self.server, username=self.username, password=self.password, timeout=CONNECT_TIMEOUT_SEC)
+            self.get_transport().set_keepalive(KEEPALIVE_INTERVAL_SEC)
+
+    def ensureActive(self):
+        """Reconnect transparently if the connection was dropped."""
+        if not self.isActive():
+            with self.lock:
+                # Another thread sharing the connection may have reconnected meanwhile
+                if not self.isActive():
+                    self.reconnect()
+
+    def openSftp(self):
+        """Open an SFTP session over the pooled connection, reusing the previous session of this thread if possible.
+
+        Returns:
+            Obj: The SFTP client associated with this connection.
+        """
+        self.ensureActive()
+
+        with self.lock:
+            sftp = self.sftp.get(threading.current_thread().ident)
+            
+            if sftp is None or sftp.get_channel().closed:
+                with trace.span("openSftp", trace.NETWORK, server=self.server):
+                    sftp = self.open_sftp()
+                    
+                self.sftp[threading.current_thread().ident] = sftp
+
+            return sftp
+
 def openChannel(server, username, password):
     """Open an SSH channel with the specified server.
     
+    The connection is borrowed from the pool so that every step run against the same server
+    and user shares a single transport. A new connection is only established the first time
+    or when the previous one was dropped.
+    
     Args:
         server (str): The IP address of the server to connect to.
         username (str): The username to be used in the connection.
@@ -56,124 +205,706 @@ def openChannel(server, username, password):
     Returns:
         Obj: A client object containing the state of the connection.
     """
-    channel = paramiko.SSHClient()
-    channel.set_missing_host_key_policy(paramiko.AutoAddPolicy)
-    channel.connect(server, username=username, password=password)
+    with channelPoolLock:
+        channel = channelPool.get((server, username))
+        
+        if channel is None:
+            channel = PooledClient(server, username, password)
+            channelPool[(server, username)] = channel
     
+    channel.ensureActive()
     return channel
     
 def closeChannel(channel):
-    """Close a previously open SSH connection.
+    """Release a previously open SSH connection.
+    
+    Pooled connections are kept open for the following steps, use closeAllChannels to close them.
     
     Args:
         channel (obj): The client object returned by the open function.
     """
-    channel.close()
+    if not isinstance(channel, PooledClient):
+        channel.close()
     
-def sendCommand(channel, command):
-    """Send a comment across the channel and return the results.
+def closeAllChannels():
+    """Close every SSH connection held in the pool."""
+    with channelPoolLock:
+        channels = list(channelPool.values())
+        channelPool.clear()
+    
+    for channel in channels:
+        channel.close()
+    
+def closeServerChannels(server):
+    """Close the SSH connections held in the pool for a server, e.g. after it stopped responding.
+    
+    Args:
+        server (str): The IP address of the server.
+    """
+    with channelPoolLock:
+        channels = [channelPool.pop(key) for key in list(channelPool) if key[0] == server]
+    
+    for channel in channels:
+        channel.close()
+    
+def execCommand(channel, command):
+    """Start the execution of a command, reconnecting once if the pooled connection was dropped.
     
     Args:
         channel (obj): The client object returned by the open function.
         command (str): The command to be executed.
+    
     Returns:
-        Str: A string object containing the command results.
-    """        
+        3-Tuple: Tuple containing the stdin, stdout and stderr of the command.
+    """
+    if not isinstance(channel, PooledClient):
+        return channel.exec_command(command)
+    
+    channel.ensureActive()
+    
+    try:
+        return channel.exec_command(command)
+    except (paramiko.SSHException, EOFError, OSError):
+        channel.reconnect()
+        return channel.exec_command(command)
+    
+def readAvailableOutput(session, output, errors, onOutput=None, onErrors=None):
+    """Drain whatever stdout and stderr data is currently buffered on the session.
+    
+    Args:
+        session (obj): The paramiko channel the command is running on.
+        output (obj): Buffer receiving the stdout data.
+        errors (obj): Buffer receiving the stderr data.
+        onOutput (callable): Function called with each chunk of stdout data, if any.
+        onErrors (callable): Function called with each chunk of stderr data, if any.
+    """
+    while session.recv_ready() or session.recv_stderr_ready():
+        if session.recv_ready():
+            data = session.recv(RECEIVE_BUFFER_SIZE)
+            output.write(data)
+            
+            if onOutput is not None:
+                onOutput(data)
+            
+        if session.recv_stderr_ready():
+            data = session.recv_stderr(RECEIVE_BUFFER_SIZE)
+            errors.write(data)
+            
+            if onErrors is not None:
+                onErrors(data)
+
+def runCommand(channel, command, onOutput=None, input=None):
+    """Run a command across the channel and wait for it to complete.
+    
+    The channel is waited on with a selector, which wakes up as soon as either stream receives
+    data or the command exits. Both streams are drained on every wake up so that neither 
+    window can fill up and stall the remote command. Once the command exited, the output still
+    in flight is read for at most OUTPUT_DRAIN_TIMEOUT_SEC.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        command (str): The command to be executed.
+        onOutput (callable): Function called with the stdout and stderr text as it arrives, e.g. an OutputPrinter.
+        input (bytes): Data sent to the stdin of the command, which is then closed, if any.
+        
+    Returns:
+        3-Tuple: Tuple containing the exit status, stdout and stderr of the command.
+    """
     output = BytesIO()
-    stdin, stdout, stderr = channel.exec_command(command)
+    errors = BytesIO()
     
-    # Parse the partial command output while the command is running
-    while not stdout.channel.exit_status_ready():
-        while stdout.channel.recv_ready():
-            output.write(stdout.channel.recv(1024))
+    onOutputData = onErrorsData = None
+    if onOutput is not None:
+        # A multi-byte character may be split across two chunks
+        outputDecoder = codecs.getincrementaldecoder(DEFAULT_DECODE)("replace")
+        errorsDecoder = codecs.getincrementaldecoder(DEFAULT_DECODE)("replace")
         
-        time.sleep(2)
+        onOutputData = lambda data: onOutput(outputDecoder.decode(data))
+        onErrorsData = lambda data: onOutput(errorsDecoder.decode(data))
     
-    # Parse any remaining channel output
-    while stdout.channel.recv_ready():
-        output.write(stdout.channel.recv(1024))
+    with trace.span("runCommand", trace.REMOTE, server=getattr(channel, "server", None), command=command):
+        stdin, stdout, stderr = execCommand(channel, command)
+        session = stdout.channel
         
-    # Parse any error channel output
-    while stderr.channel.recv_ready():
-        output.write(stderr.channel.recv(1024))
+        try:
+            if input is not None:
+                session.sendall(input)
+                session.shutdown_write()
+            
+            # Unlike select, the default selector (e.g. epoll) isn't limited to the first 1024 file
+            # descriptors, which are exhausted when hundreds of connections are open
+            with selectors.DefaultSelector() as selector:
+                selector.register(session, selectors.EVENT_READ)
+                drainDeadline = None
+                
+                while True:
+                    readAvailableOutput(session, output, errors, onOutputData, onErrorsData)
+                    
+                    if session.exit_status_ready():
+                        # The exit status may arrive before the last of the output, stop once both are in
+                        # or, when a forked daemon holds the streams open, once the drain time is over
+                        if drainDeadline is None:
+                            drainDeadline = time.time() + OUTPUT_DRAIN_TIMEOUT_SEC
+                        
+                        remaining = drainDeadline - time.time()
+                        if session.eof_received or session.closed or remaining <= 0:
+                            break
+                        
+                        selector.select(min(remaining, COMMAND_WAIT_INTERVAL_SEC))
+                    else:
+                        selector.select(COMMAND_WAIT_INTERVAL_SEC)
+            
+            readAvailableOutput(session, output, errors, onOutputData, onErrorsData)
+            exitStatus = session.recv_exit_status()
+        finally:
+            # Release the channel and the pipe of its selector now rather than at garbage collection
+            session.close()
+    
+    return (exitStatus, output.getvalue().decode(DEFAULT_DECODE), errors.getvalue().decode(DEFAULT_DECODE))
 
-    exitStatus = stdout.channel.recv_exit_status()
+def sendCommand(channel, command, onOutput=None):
+    """Send a comment across the channel and return the results.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        command (str): The command to be executed.
+        onOutput (callable): Function called with the output text as it arrives, if any.
+    Returns:
+        Str: A string object containing the command results.
+    """        
+    exitStatus, output, errors = runCommand(channel, command, onOutput)
     
     if exitStatus != 0:
         raise ValueError("Command: \"{0}\" failed with status: {1}".format(command, exitStatus))
         
-    return output.getvalue().decode(DEFAULT_DECODE)
+    return output + errors
+
+def watchLog(channel, filePath, patterns, timeout):
+    """Follow a file on the VPS until a line matches one of the patterns.
+    
+    A single tail stream is kept open over the connection and every line is matched as it
+    arrives, so the file is read once however long the wait.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        filePath (str): Full path of the file on the VPS, it may not exist yet.
+        patterns (list): The regular expressions searched in each line.
+        timeout (float): The maximum number of seconds to wait for.
+    
+    Returns:
+        2-Tuple: Tuple containing the pattern and the line matched.
+    """
+    expressions = [(pattern, re.compile(pattern)) for pattern in patterns]
+    deadline = time.time() + timeout
+    
+    command = WATCH_LOG_COMMAND.format(int(timeout) + 1, filePath)
+    
+    with trace.span("watchLog", trace.REMOTE, server=getattr(channel, "server", None), file=filePath):
+        stdin, stdout, stderr = execCommand(channel, command)
+        session = stdout.channel
+        
+        pending = b""
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(session, selectors.EVENT_READ)
+                
+                while True:
+                    while session.recv_ready():
+                        pending += session.recv(RECEIVE_BUFFER_SIZE)
+                    
+                    lines = pending.split(b"\n")
+                    pending = lines.pop()
+                    
+                    for line in lines:
+                        line = line.decode(DEFAULT_DECODE, "replace")
+                        
+                        for pattern, expression in expressions:
+                            if expression.search(line):
+                                return (pattern, line)
+                    
+                    if session.exit_status_ready() and not session.recv_ready():
+                        raise ValueError("Watching {0} stopped with status: {1}".format(filePath, session.recv_exit_status()))
+                    
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise ValueError("Timed out after {0} seconds waiting for {1} in {2}".format(timeout, " or ".join(patterns), filePath))
+                    
+                    selector.select(min(remaining, COMMAND_WAIT_INTERVAL_SEC))
+        finally:
+            # tail exits at its next write once the session is closed, or at the remote timeout
+            session.close()
+
+def makeDirectories(sftp, directory):
+    """Create a directory on the VPS along with any missing parent directory.
+    
+    Args:
+        sftp (obj): The SFTP client of the connection.
+        directory (str): Full path of the directory.
+    """
+    if not directory or directory == "/":
+        return
+    
+    try:
+        sftp.stat(directory)
+    except IOError:
+        makeDirectories(sftp, posixpath.dirname(directory))
+        sftp.mkdir(directory)
+    
+def makePrivateDirectory(channel):
+    """Create the directory files are staged in on the VPS, accessible only by the SSH user.
+    
+    Unlike a shared directory such as /tmp, other users can neither create the files sent in
+    advance nor replace them before they are used.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        
+    Returns:
+        Str: The path of the directory, relative to the home directory of the user.
+    """
+    sftp = channel.openSftp()
+    
+    try:
+        sftp.mkdir(REMOTE_PRIVATE_DIRECTORY, 0o700)
+    except IOError:
+        # Already created by a previous run, make sure it was not tampered with
+        attributes = sftp.lstat(REMOTE_PRIVATE_DIRECTORY)
+        
+        if not stat.S_ISDIR(attributes.st_mode) or attributes.st_uid != sftp.stat(".").st_uid:
+            raise ValueError("{0} on VPS is not a directory owned by the user".format(REMOTE_PRIVATE_DIRECTORY))
+        
+        if attributes.st_mode & 0o077:
+            sftp.chmod(REMOTE_PRIVATE_DIRECTORY, 0o700)
+    
+    return REMOTE_PRIVATE_DIRECTORY
+
+def readRemoteFile(sftp, filePath):
+    """Read the contents of a file on the VPS.
+    
+    Args:
+        sftp (obj): The SFTP client of the connection.
+        filePath (str): Full path of the file.
+        
+    Returns:
+        Bytes: The contents of the file, or None if it doesn't exist.
+    """
+    try:
+        with sftp.open(filePath, 'rb') as f:
+            return f.read()
+    except IOError:
+        return None
+    
+def isRemoteFileUnchanged(sftp, filePath, contents):
+    """Check if a file on the VPS already holds the specified contents.
+    
+    The size is compared first so that the file is only read when it may be identical.
+    
+    Args:
+        sftp (obj): The SFTP client of the connection.
+        filePath (str): Full path of the file.
+        contents (bytes): The expected contents.
+        
+    Returns:
+        Boolean: True if the file exists with identical contents, False otherwise.
+    """
+    try:
+        if sftp.stat(filePath).st_size != len(contents):
+            return False
+    except IOError:
+        return False
+    
+    current = readRemoteFile(sftp, filePath)
+    return current is not None and hashlib.sha256(current).digest() == hashlib.sha256(contents).digest()
+
+def readFile(server, username, password, filePath):
+    """Read a file on the specified server.
+    
+    Args:
+        server (str): The IP address of the server to connect to.
+        username (str): The username to be used in the connection.
+        password (str): The password associated with the user.
+        filePath (str): The full path of the file to be read.
+        
+    Returns:
+        String: The contents of the file, or None if it doesn't exist.
+    """
+    # Open SSH connection
+    channel = openChannel(server, username, password)
+    
+    try:
+        sftp = channel.openSftp()
+        
+        with trace.span("readFile", trace.NETWORK, server=server, path=filePath):
+            contents = readRemoteFile(sftp, filePath)
+    finally:
+        # Close ssh connection
+        closeChannel(channel)
+    
+    return None if contents is None else contents.decode(DEFAULT_DECODE)
 
 def createFileWithContents(server, username, password, filePath, data):
     """Create a file on the specified server with the contents provided.
     
+    Nothing is written if the file already holds the same contents. Otherwise the contents
+    are written to a temporary file which is then renamed into place, so that the file is
+    never left partially written.
+    
     Args:
         server (str): The IP address of the server to connect to.
         username (str): The username to be used in the connection.
         password (str): The password associated with the user.
-        filePath (str): The relative path of the file to be written (relative to $HOME)
+        filePath (str): The full path of the file to be written.
         data (str): The data to be written into the file.
+        
+    Returns:
+        Boolean: True if the file was written, False if it was unchanged.
     """        
-    directory = os.path.dirname(filePath)
+    contents = data.encode(DEFAULT_DECODE)
+    temporaryPath = "{0}.{1}.tmp".format(filePath, binascii.hexlify(os.urandom(4)).decode("ascii"))
     
     # Open SSH connection
     channel = openChannel(server, username, password)
-    sftp = channel.open_sftp()
-
-    # Create directory if necessary
-    try:
-        sftp.mkdir(directory)
-    except IOError:
-        pass
-      
-    # Transfer and replace the file contents
+    
     try:
-        with sftp.open(filePath, 'w') as f:
-            f.write(data)
+        sftp = channel.openSftp()
+        
+        with trace.span("createFileWithContents", trace.NETWORK, server=server, path=filePath):
+            if isRemoteFileUnchanged(sftp, filePath, contents):
+                return False
+            
+            # Create directory if necessary
+            makeDirectories(sftp, posixpath.dirname(filePath))
+            
+            # Transfer the contents and replace the file
+            with sftp.open(temporaryPath, 'wb') as f:
+                f.write(contents)
+            
+            sftp.posix_rename(temporaryPath, filePath)
     finally:
         # Close ssh connection
         closeChannel(channel)
+    
+    return True
         
-def checkRelease(channel, codeName):
+def uploadFile(channel, localPath, remotePath, checksum):
+    """Stream a local file to the VPS over the existing SSH connection and verify its checksum.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        localPath (str): Full path to the local file.
+        remotePath (str): Full path of the destination file on the VPS.
+        checksum (str): The sha256 checksum of the file.
+    """
+    sftp = channel.openSftp()
+    
+    with trace.span("uploadFile", trace.NETWORK, server=channel.server, path=remotePath):
+        sftp.put(localPath, remotePath)
+    
+    output = sendCommand(channel, REMOTE_CHECKSUM_COMMAND.format(remotePath))
+    
+    if output.split()[0].lower() != checksum:
+        raise ValueError("Checksum mismatch for file sent to VPS: {0}".format(remotePath))
+        
+def getRemoteChecksum(channel, remotePath):
+    """Compute the checksum of a file on the VPS.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        remotePath (str): Full path of the file on the VPS.
+        
+    Returns:
+        String: The sha256 checksum of the file, or None if the file doesn't exist.
+    """
+    exitStatus, output, errors = runCommand(channel, REMOTE_CHECKSUM_COMMAND.format(remotePath))
+    
+    if exitStatus != 0 or not output.strip():
+        return None
+    
+    return output.split()[0].lower()
+        
+def uploadFileResumable(channel, localPath, remotePath, checksum):
+    """Send a large local file to the VPS, resuming any previously interrupted upload.
+    
+    The file is written to a partial file on the VPS which is only renamed into place once its
+    checksum is verified. Nothing is sent if the destination already matches the checksum.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        localPath (str): Full path to the local file.
+        remotePath (str): Full path of the destination file on the VPS.
+        checksum (str): The sha256 checksum of the file.
+    """
+    if getRemoteChecksum(channel, remotePath) == checksum:
+        print("{0} is already present on VPS.. skipping upload.".format(remotePath))
+        return
+    
+    sftp = channel.openSftp()
+    partialPath = remotePath + PARTIAL_UPLOAD_SUFFIX
+    localSize = os.path.getsize(localPath)
+    
+    try:
+        offset = sftp.stat(partialPath).st_size
+    except IOError:
+        offset = 0
+    
+    if offset > localSize:
+        offset = 0
+    
+    if offset > 0:
+        print("Resuming upload of {0} at {1} of {2} bytes..".format(remotePath, offset, localSize))
+    
+    with trace.span("uploadFileResumable", trace.NETWORK, server=channel.server, path=remotePath, offset=offset):
+        with open(localPath, "rb") as source, sftp.open(partialPath, "ab" if offset > 0 else "wb") as destination:
+            source.seek(offset)
+            destination.set_pipelined(True)
+            
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                destination.write(chunk)
+    
+    if getRemoteChecksum(channel, partialPath) != checksum:
+        # Start over on the next attempt
+        sftp.remove(partialPath)
+        raise ValueError("Checksum mismatch for file sent to VPS: {0}".format(remotePath))
+    
+    sftp.posix_rename(partialPath, remotePath)
+        
+def parseFacts(output):
+    """Parse the output of the facts gathering command.
+
+    Args:
+        output (str): The output of the GATHER_FACTS_COMMAND.
+
+    Returns:
+        Dict: The release codename and description, the path of each binary (None if not installed),
+              the daemon version, the running process names, the coin user id (None if missing) and
+              the total and free disk and memory in MB.
+    """
+    values = dict()
+    binaries = dict()
+
+    for line in output.splitlines():
+        key, separator, value = line.partition("=")
+
+        if not separator:
+            continue
+
+        if key.startswith("binary."):
+            binaries[key[len("binary."):]] = value.strip() or None
+        else:
+            values[key] = value.strip()
+
+    missing = [key for key in GATHER_FACTS_KEYS if key not in values]
+    if missing:
+        raise ValueError("Incomplete VPS facts, missing: {0}".format(", ".join(missing)))
+
+    # df -Pk: filesystem, 1024-blocks, used, available, capacity, mount point
+    disk = values["disk"].split()
+
+    # MemTotal: <kB> kB MemAvailable: <kB> kB
+    memory = values["memory"].split()
+    memory = dict(zip(memory[0::3], memory[1::3]))
+
+    return {"codename": values["codename"],
+            "description": values["description"],
+            "binaries": binaries,
+            "version": values["version"] or None,
+            "processes": values["processes"].split(),
+            "uid": int(values["uid"]) if values["uid"] else None,
+            "disk": {"total": int(disk[1]) // 1024, "free": int(disk[3]) // 1024},
+            "memory": {"total": int(memory.get("MemTotal:", 0)) // 1024, "free": int(memory.get("MemAvailable:", 0)) // 1024}}
+
+@trace.traced()
+def gatherFacts(channel, daemonName, cliName, coinName):
+    """Gather the facts the preflight checks are decided on with a single command.
+
+    Args:
+        channel (obj): The client object returned by the open function.
+        daemonName (str): The name of the daemon binary.
+        cliName (str): The name of the cli binary.
+        coinName (str): Name of the coin, also the name of its user.
+
+    Returns:
+        Dict: The facts as returned by parseFacts, None if they could not be gathered in which case
+              each check runs its own command.
+    """
+    print("Gathering VPS facts..")
+
+    try:
+        facts = parseFacts(sendCommand(channel, GATHER_FACTS_COMMAND.format(daemonName, cliName, coinName)))
+    except Exception as e:
+        print("Failed to gather VPS facts, checking them one by one. Reason: {0}\n".format(str(e)))
+        return None
+
+    print("Disk: {0} MB free of {1} MB, memory: {2} MB available of {3} MB\n".format(facts["disk"]["free"], facts["disk"]["total"], facts["memory"]["free"], facts["memory"]["total"]))
+    return facts
+
+@trace.traced()
+def checkRelease(channel, codeName, facts=None):
     """Check and verify the release on the VPS server.
 
     Args:
         channel (obj): The client object returned by the open function.
         codeName (str): The expected release code name to verify.
+        facts (dict): The facts returned by gatherFacts, if None the release is queried.
     """    
     print("Checking VPS operating system release..\n")
-    output = sendCommand(channel, CHECK_RELEASE_COMMAND)
+    
+    if facts is None:
+        output = sendCommand(channel, CHECK_RELEASE_COMMAND)
+    else:
+        output = "Description:\t{0}\nCodename:\t{1}\n".format(facts["description"], facts["codename"])
     
     print(output)
     if codeName not in output:
-        raise ValueError("Unsupported operating system, refer to documentation for more info")
+        raise ValueError(UNSUPPORTED_RELEASE_MESSAGE)
 
-def checkDaemonNotRunning(channel, daemonName):
+@trace.traced()
+def checkDaemonNotRunning(channel, daemonName, facts=None):
     """Check that the daemon is not currently running. This is done to avoid potential problems in the future.
 
     Args:
         channel (obj): The client object returned by the open function.
         daemonName (str): The name of the daemon to check.
+        facts (dict): The facts returned by gatherFacts, if None the processes are queried.
     """
     print("Checking that daemon is not currently running on VPS..")
-    if isProcessRunning(channel, daemonName):
-        message = "The \'{0}\' daemon is currently running, please stop it and try again".format(daemonName)
-        raise ValueError(message)
+    if isProcessRunning(channel, daemonName, facts):
+        raise ValueError(DAEMON_RUNNING_MESSAGE_FMT.format(daemonName))
         
     print("")
         
-def updateTools(channel):
-    """Update the installation and tools on the VPS.
+class LineSplitter(object):
+    """Output callback of runCommand handing each line to onLine as soon as it is complete."""
+    
+    def __init__(self):
+        self.pending = ""
+        
+    def __call__(self, text):
+        lines = (self.pending + text).split("\n")
+        self.pending = lines.pop()
+        
+        for line in lines:
+            self.onLine(line)
+            
+    def onLine(self, line):
+        """Handle a complete line, without its line feed.
+        
+        Args:
+            line (str): The line received.
+        """
+        raise NotImplementedError()
+
+class OutputPrinter(LineSplitter):
+    """Output callback of runCommand printing each line as soon as it is complete.
+    
+    Args:
+        prefix (str): Text printed before each line, e.g. to tell apart the VPS of a fleet.
+    """
+    
+    def __init__(self, prefix=""):
+        LineSplitter.__init__(self)
+        self.prefix = prefix
+        
+    def onLine(self, line):
+        print("{0}{1}".format(self.prefix, line.rstrip("\r")))
+            
+    def flush(self):
+        """Print the last line, if it was not terminated."""
+        if self.pending:
+            self("\n")
+
+def getUpgradesPath():
+    """Get the path of the file recording the time of the last tools update of each VPS."""
+    return os.path.join(storage.getDirectory("vps"), UPGRADES_FILENAME)
+
+def isUpgradeFresh(server, freshness):
+    """Check if the tools on a VPS were updated recently enough not to be updated again.
+    
+    Args:
+        server (str): The IP address of the server, None if unknown.
+        freshness (float): The number of seconds after an update during which the tools are not updated again, 0 to always update.
+        
+    Returns:
+        Boolean: True if the update is to be skipped, False otherwise.
+    """
+    lastUpgrade = getLastUpgrade(server) if server and freshness > 0 else None
     
-    Note: The output won't be printed until the update is complete.
+    if lastUpgrade is not None and time.time() - lastUpgrade < freshness:
+        print("Tools on VPS were updated {0} minutes ago.. skipping.\n".format(int((time.time() - lastUpgrade) / 60)))
+        return True
+    
+    return False
+
+def getLastUpgrade(server):
+    """Get the time of the last successful update of the tools on a VPS.
+    
+    Args:
+        server (str): The IP address of the server.
+        
+    Returns:
+        Float: The time of the update in seconds since the epoch, None if it was never recorded.
+    """
+    return storage.loadJson(getUpgradesPath(), dict()).get(server)
+
+def recordUpgrade(server):
+    """Record that the tools on a VPS were just updated.
+    
+    Args:
+        server (str): The IP address of the server.
+    """
+    with upgradesLock:
+        upgrades = storage.loadJson(getUpgradesPath(), dict())
+        upgrades[server] = time.time()
+        
+        storage.saveJson(getUpgradesPath(), upgrades)
+
+@trace.traced()
+def updateTools(channel, freshness=0, proxy=None):
+    """Update the installation and tools on the VPS, unless they were updated recently.
+    
+    The output is printed as the update runs, each line prefixed with the VPS address.
 
     Args:
         channel (obj): The client object returned by the open function.
+        freshness (float): The number of seconds after an update during which the tools are not updated again, 0 to always update.
+        proxy (str): The url of an apt cache proxy (e.g. apt-cacher-ng) the packages are downloaded through, if any.
     """    
+    server = getattr(channel, "server", None)
+    
+    if isUpgradeFresh(server, freshness):
+        return
+    
     print("Updating tools on VPS..\n")
-    print(sendCommand(channel, UPDATE_TOOLS_COMMAND))
+    
+    printer = OutputPrinter("[{0}] ".format(server) if server else "")
+    options = APT_PROXY_OPTION.format(proxy) if proxy else ""
+    
+    sendCommand(channel, UPDATE_TOOLS_COMMAND.format(options), printer)
+    printer.flush()
+    print("")
+    
+    if server:
+        recordUpgrade(server)
 
-def getInstallCommand(coinName, gitOwner, gitProject, namePattern):
+def findReleaseAsset(release, namePattern):
+    """Find the release asset to be installed.
+    
+    Args:
+        release (dict): The release, as returned by the github releases api.
+        namePattern (str): A pattern to be used to identify the release version to get.
+        
+    Returns:
+        Dict: The asset matching the pattern.
+    """
+    matches = [asset for asset in release["assets"] if namePattern in asset["name"]]
+        
+    if len(matches) != 1:
+        message = "Unexpected number of matches: {0} for the specified pattern {1}, please check configuration".format(len(matches), namePattern)
+        raise ValueError(message)
+    
+    return matches[0]
+
+def getInstallCommand(coinName, gitOwner, gitProject, namePattern, apiUrl=releases.DEFAULT_API_URL, cacheTtl=releases.DEFAULT_CACHE_TTL_SEC):
     """Determine the installation command based on the coin's latest release.
     
     Args:
@@ -181,54 +912,111 @@ def getInstallCommand(coinName, gitOwner, gitProject, namePattern):
         gitOwner (str): The Git owner of the project.
         gitProject (str): The name of the project in Git.
         namePattern (str): A pattern to be used to identify the release version to get.
+        apiUrl (str): The base url of the github api.
+        cacheTtl (float): The number of seconds the release lookup is cached for.
         
     Returns:
         String: A string containing the install command to be executed.
     """
     print("Get the latest masternode release")
     
-    url = GET_LATEST_GIT_RELEASE_COMMAND.format(gitOwner, gitProject)
-    releases = json.load(urlopen(url))
-
-    matches = [release for release in releases["assets"] if namePattern in release["name"]]
-        
-    if len(matches) != 1:
-        message = "Unexpected number of matches: {0} for the specified pattern {1}, please check configuration".format(len(txValues), namePattern)
-        raise ValueError(message)
-        
-    downloadUrl = matches[0]["browser_download_url"]    
+    release = releases.getLatestRelease(gitOwner, gitProject, apiUrl, cacheTtl)
+    downloadUrl = findReleaseAsset(release, namePattern)["browser_download_url"]
+    
     print("Latest release found: {0}\n".format(downloadUrl))
     return INSTALL_COIN_COMMAND.format(coinName, downloadUrl)
     
-def installMasternode(coinName, channel, daemonName, installCommand):
+def getPushInstallCommand(coinName, gitOwner, gitProject, namePattern, apiUrl=releases.DEFAULT_API_URL, cacheTtl=releases.DEFAULT_CACHE_TTL_SEC):
+    """Determine the installation command for a release sent from this computer.
+    
+    Args:
+        coinName (str): Name of the coin to install.
+        gitOwner (str): The Git owner of the project.
+        gitProject (str): The name of the project in Git.
+        namePattern (str): A pattern to be used to identify the release version to get.
+        apiUrl (str): The base url of the github api.
+        cacheTtl (float): The number of seconds the release lookup is cached for.
+        
+    Returns:
+        3-Tuple: Tuple containing the install command, a function sending the release to the VPS and the path it is sent to.
+    """
+    print("Get the latest masternode release")
+    
+    release = releases.getLatestRelease(gitOwner, gitProject, apiUrl, cacheTtl)
+    asset = findReleaseAsset(release, namePattern)
+    remotePath = posixpath.join(REMOTE_PRIVATE_DIRECTORY, asset["name"])
+    
+    print("Latest release found: {0}\n".format(asset["browser_download_url"]))
+    
+    def upload(channel):
+        # The release is only downloaded once, no matter how many VPS instances it is sent to
+        localPath, checksum = artifacts.getAsset(release, asset)
+        
+        print("Sending release {0} to VPS..".format(asset["name"]))
+        makePrivateDirectory(channel)
+        uploadFile(channel, localPath, remotePath, checksum)
+    
+    return (INSTALL_COIN_FROM_FILE_COMMAND.format(coinName, remotePath), upload, remotePath)
+    
+@trace.traced()
+def installMasternode(coinName, channel, daemonName, installCommand, upload=None, facts=None):
     """Install the masternode binaries on the VPS.
 
     Args:
         channel (obj): The client object returned by the open function.
         daemonName (str): The name of the daemon binary associated with the installation.
         installCommand (str): The full command to be executed for installation.
+        upload (callable): Function sending the release to the VPS before installation, if required.
+        facts (dict): The facts returned by gatherFacts, if None the binaries are queried.
     """
     print("Installing masternode on VPS..")
     print("Install command:\n\n{0}\n".format(installCommand))
     
+    if not isCoinInstalled(channel, daemonName, facts):
+        if upload is not None:
+            upload(channel)
+            
+        print(sendCommand(channel, installCommand))
+    else:
+        print("{0} is already installed.. skipping installation.\n".format(coinName))    
+
+def isCoinInstalled(channel, daemonName, facts=None):
+    """Check if the masternode binaries are installed.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        daemonName (str): The name of the daemon binary.
+        facts (dict): The facts returned by gatherFacts, if None the binaries are queried.
+    
+    Returns:
+        Boolean: True if the daemon is installed, False otherwise.
+    """
+    if facts is not None:
+        return facts["binaries"].get(daemonName) is not None
+    
     try:
-        # This command will fail if masternode binaries already installed
+        # This command will fail if masternode binaries are not installed
         sendCommand(channel, IS_COIN_INSTALLED_COMMAND.format(daemonName))
     except:
-        print(sendCommand(channel, installCommand))
+        return False
     else:
-        print("{0} is already installed.. skipping installation.\n".format(coinName))    
+        return True
 
-def isProcessRunning(channel, processName):
+def isProcessRunning(channel, processName, facts=None):
     """Check if the specified process is currently running.
     
     Args:
         channel (obj): The client object returned by the open function.
         processName (str): The name of the process to check.
+        facts (dict): The facts returned by gatherFacts, if None the processes are queried.
     
     Returns:
         Boolean: True if the process is running, False otherwise.
     """
+    if facts is not None:
+        # Matches the same way as grep does on the ps output
+        return any(processName in name for name in facts["processes"])
+    
     try: 
         # If process is not running, an exception is raised
         command = CHECK_IF_PROCESS_RUNNING_COMMAND_FMT.format(processName)
@@ -238,21 +1026,27 @@ def isProcessRunning(channel, processName):
     else:
         return True
 
-def createUser(channel, coinName):
+@trace.traced()
+def createUser(channel, coinName, facts=None):
     """Creates a user for the coin if necessary.
     
     Args:
         channel (obj): The client object returned by the open function.
         coinName (str): Name of the coin.
+        facts (dict): The facts returned by gatherFacts, if None the user is queried.
     """
     print("Creating user for masternode: {0}, if necessary..".format(coinName))
     
-    try:
-        # If this command fails, the user doesn't exist
-        sendCommand(channel, "id -u {0}".format(coinName))
-    except:
-        # Create user
-        sendCommand(channel, "useradd {0}".format(coinName))
+    if facts is not None:
+        if facts["uid"] is None:
+            sendCommand(channel, "useradd {0}".format(coinName))
+    else:
+        try:
+            # If this command fails, the user doesn't exist
+            sendCommand(channel, "id -u {0}".format(coinName))
+        except:
+            # Create user
+            sendCommand(channel, "useradd {0}".format(coinName))
  
     print("")
  
@@ -280,7 +1074,224 @@ def sendSingleCommand(server, user, password, command):
 
     return output
         
-def setup(server, user, password, config):
+def getInstall(config):
+    """Determine how the masternode binaries are installed on the VPS as specified by the configuration.
+
+    Args:
+        config (dict): Dictionary containing the options parsed by the utility.
+        
+    Returns:
+        3-Tuple: Tuple containing the install command, the function sending the release to the VPS and the path it is sent to, both None if the VPS downloads it.
+    """
+    apiUrl = config["Git"].get("ApiUrl", releases.DEFAULT_API_URL)
+    cacheTtl = config["Git"].getfloat("ReleaseCacheTtl", releases.DEFAULT_CACHE_TTL_SEC)
+    
+    if config["Git"].get("InstallMode", INSTALL_MODE_DIRECT) == INSTALL_MODE_PUSH:
+        return getPushInstallCommand(config["Coin"]["Name"], config["Git"]["Owner"], config["Git"]["Project"], config["Git"]["NamePattern"], apiUrl, cacheTtl)
+    
+    return (getInstallCommand(config["Coin"]["Name"], config["Git"]["Owner"], config["Git"]["Project"], config["Git"]["NamePattern"], apiUrl, cacheTtl), None, None)
+
+def install(channel, config, facts=None):
+    """Install the masternode binaries on the VPS as specified by the configuration.
+
+    Args:
+        channel (obj): The client object returned by the open function.
+        config (dict): Dictionary containing the options parsed by the utility.
+        facts (dict): The facts returned by gatherFacts, if None the binaries are queried.
+    """
+    installCommand, upload, remotePath = getInstall(config)
+    installMasternode(config["Coin"]["Name"], channel, config["Coin"]["Daemon"], installCommand, upload, facts)
+
+class AgentEventReader(LineSplitter):
+    """Output callback of runCommand parsing the progress events written by the agent, one JSON object per line.
+    
+    Args:
+        onEvent (callable): Function called with every event as soon as its line is complete.
+    """
+    
+    def __init__(self, onEvent):
+        LineSplitter.__init__(self)
+        self.onEvent = onEvent
+        self.events = list()
+        
+    def onLine(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            # Interpreter errors, reported from the stderr of the command
+            return
+        
+        if isinstance(event, dict):
+            self.events.append(event)
+            self.onEvent(event)
+
+def getAgentRemotePath():
+    """Get the path of the agent on the VPS, relative to the home directory of the user."""
+    return AGENT_REMOTE_PATH_FMT.format(artifacts.computeChecksum(AGENT_SOURCE_FILE)[:12])
+
+def uploadAgent(channel):
+    """Send the agent to the VPS.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+    """
+    print("Sending agent to VPS..")
+    makePrivateDirectory(channel)
+    uploadFile(channel, AGENT_SOURCE_FILE, getAgentRemotePath(), artifacts.computeChecksum(AGENT_SOURCE_FILE))
+
+@trace.traced()
+def runAgent(channel, plan, onEvent):
+    """Run a plan with the agent on the VPS, sending the agent first if it is missing or altered.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        plan (dict): The plan to be executed, see agent.runPlan.
+        onEvent (callable): Function called with every progress event as it arrives.
+        
+    Returns:
+        List: The events written by the agent.
+    """
+    command = AGENT_COMMAND.format(artifacts.computeChecksum(AGENT_SOURCE_FILE), getAgentRemotePath(), AGENT_MISSING_STATUS)
+    data = json.dumps(plan).encode(DEFAULT_DECODE)
+    
+    reader = AgentEventReader(onEvent)
+    exitStatus, output, errors = runCommand(channel, command, reader, data)
+    
+    if exitStatus == AGENT_MISSING_STATUS and not reader.events:
+        uploadAgent(channel)
+        
+        reader = AgentEventReader(onEvent)
+        exitStatus, output, errors = runCommand(channel, command, reader, data)
+    
+    if exitStatus == PYTHON_MISSING_STATUS:
+        raise ValueError("python3 is required on the VPS to run the agent")
+    
+    if exitStatus not in (0, agent.EXIT_FAILED, agent.EXIT_UPLOAD_REQUIRED) or not reader.events:
+        raise ValueError("Agent failed with status: {0} {1}".format(exitStatus, errors.strip()).strip())
+    
+    return reader.events
+
+def runAgentPlan(channel, steps, uploads=None, onDone=None):
+    """Run steps on the VPS with the agent, a single round trip executes every step.
+    
+    The agent stops when a step needs a file that is not on the VPS yet, the file is then sent
+    and the remaining steps run again.
+    
+    Args:
+        channel (obj): The client object returned by the open function.
+        steps (list): The steps to be executed, each a dictionary with a name, an agent action and its arguments.
+        uploads (dict): Functions sending the files the steps may need, taking the channel, keyed by path on the VPS.
+        onDone (callable): Function called with the name of each step once it is done.
+    """
+    server = getattr(channel, "server", None)
+    prefix = "[{0}] ".format(server) if server else ""
+    uploads = dict(uploads or dict())
+    pending = list(steps)
+    
+    def onEvent(event):
+        kind = event.get("event")
+        
+        if kind == agent.EVENT_STEP:
+            print("{0}Running {1} on VPS..".format(prefix, event["step"]))
+        elif kind == agent.EVENT_OUTPUT:
+            for line in event["text"].split("\n"):
+                print("{0}{1}".format(prefix, line))
+        elif kind == agent.EVENT_DONE and onDone is not None:
+            onDone(event["step"])
+    
+    while pending:
+        events = runAgent(channel, {"steps": pending}, onEvent)
+        
+        done = set(event["step"] for event in events if event.get("event") == agent.EVENT_DONE)
+        pending = [step for step in pending if step["name"] not in done]
+        
+        for event in events:
+            if event.get("event") == agent.EVENT_FAILED:
+                raise ValueError(event["error"])
+        
+        required = [event["path"] for event in events if event.get("event") == agent.EVENT_UPLOAD]
+        
+        if pending and not required:
+            raise ValueError("Agent stopped before step {0}".format(pending[0]["name"]))
+        
+        for path in required:
+            if path not in uploads:
+                raise ValueError("Agent requires {0} which is not sent by this utility".format(path))
+            
+            # Each file is sent at most once
+            uploads.pop(path)(channel)
+    
+    print("")
+
+def getSetupPlan(server, config):
+    """Get the agent steps of the VPS setup, the counterpart of the steps run by setup.
+    
+    Args:
+        server (str): The IP address of the server.
+        config (dict): Dictionary containing the options parsed by the utility.
+        
+    Returns:
+        2-Tuple: Tuple containing the steps and the functions sending the files they may need, keyed by path on the VPS.
+    """
+    coinName = config["Coin"]["Name"]
+    daemonName = config["Coin"]["Daemon"]
+    
+    steps = list()
+    uploads = dict()
+    
+    steps.append({"name": "checkRelease", "action": "require", "command": CHECK_RELEASE_COMMAND, "contains": config["VPS"]["UbuntuCodename"], "error": UNSUPPORTED_RELEASE_MESSAGE})
+    steps.append({"name": "checkDaemonNotRunning", "action": "refuse", "command": CHECK_IF_PROCESS_RUNNING_COMMAND_FMT.format(daemonName), "error": DAEMON_RUNNING_MESSAGE_FMT.format(daemonName)})
+    
+    if not isUpgradeFresh(server, config["VPS"].getfloat("UpgradeFreshness", fallback=0)):
+        proxy = config["VPS"].get("AptProxy", "")
+        steps.append({"name": "updateTools", "action": "run", "command": UPDATE_TOOLS_COMMAND.format(APT_PROXY_OPTION.format(proxy) if proxy else "")})
+    
+    installCommand, upload, remotePath = getInstall(config)
+    steps.append({"name": "installMasternode", "action": "unless", "test": IS_COIN_INSTALLED_COMMAND.format(daemonName), "command": installCommand, "upload": remotePath, "message": "{0} is already installed.. skipping installation.".format(coinName)})
+    
+    if upload is not None:
+        uploads[remotePath] = upload
+    
+    steps.append({"name": "createUser", "action": "unless", "test": "id -u {0}".format(coinName), "command": "useradd {0}".format(coinName)})
+    
+    return (steps, uploads)
+
+def setupWithAgent(server, user, password, config, journal=None):
+    """Setup the VPS with the agent, the steps of setup are all executed on the VPS in a single round trip.
+
+    Args:
+        server (str): The IP address of the server to connect to.
+        username (str): The username to be used in the connection.
+        password (str): The password associated with the user.
+        config (dict): Dictionary containing the options parsed by the utility.
+        journal (obj): The checkpoints Journal of the masternode, steps it records as completed are skipped.
+    """
+    steps, uploads = getSetupPlan(server, config)
+    
+    if journal is not None:
+        for step in steps:
+            if journal.isDone(step["name"]):
+                print("Step {0} was completed by a previous run.. skipping.\n".format(step["name"]))
+        
+        steps = [step for step in steps if not journal.isDone(step["name"])]
+    
+    def onDone(step):
+        if step == "updateTools":
+            recordUpgrade(server)
+        
+        if journal is not None:
+            journal.markDone(step)
+    
+    # Open SSH connection
+    channel = openChannel(server, user, password)
+    
+    try:
+        runAgentPlan(channel, steps, uploads, onDone)
+    finally:
+        # Close ssh connection
+        closeChannel(channel)
+
+def setup(server, user, password, config, journal=None):
     """Program entry point. This function will setup the VPS per the coin requirements.
 
     Args:
@@ -288,26 +1299,35 @@ def setup(server, user, password, config):
         username (str): The username to be used in the connection.
         password (str): The password associated with the user.
         config (dict): Dictionary containing the options parsed by the utility.
+        journal (obj): The checkpoints Journal of the masternode, steps it records as completed are skipped.
     """
+    if config["VPS"].getboolean("Agent", fallback=False):
+        setupWithAgent(server, user, password, config, journal)
+        return
+    
     # Open SSH connection
     channel = openChannel(server, user, password)
     
     try:
+        # Gather everything the checks below depend on at once, unless a previous run completed them all
+        facts = None
+        if journal is None or not all(journal.isDone(step) for step in ("checkRelease", "checkDaemonNotRunning", "installMasternode", "createUser")):
+            facts = gatherFacts(channel, config["Coin"]["Daemon"], config["Coin"]["Cli"], config["Coin"]["Name"])
+        
         # Check that OS is the right version
-        checkRelease(channel, config["VPS"]["UbuntuCodename"])
+        checkpoints.runStep(journal, "checkRelease", lambda: checkRelease(channel, config["VPS"]["UbuntuCodename"], facts))
         
         # Check that daemon is not running
-        checkDaemonNotRunning(channel, config["Coin"]["Daemon"])
+        checkpoints.runStep(journal, "checkDaemonNotRunning", lambda: checkDaemonNotRunning(channel, config["Coin"]["Daemon"], facts))
     
         # Update OS tools
-        updateTools(channel)
+        checkpoints.runStep(journal, "updateTools", lambda: updateTools(channel, config["VPS"].getfloat("UpgradeFreshness", fallback=0), config["VPS"].get("AptProxy", "")))
     
-        # Install masternode
-        installCommand = getInstallCommand(config["Coin"]["Name"], config["Git"]["Owner"], config["Git"]["Project"], config["Git"]["NamePattern"])
-        installMasternode(config["Coin"]["Name"], channel, config["Coin"]["Daemon"], installCommand)
+        # Install masternode, the facts were gathered before the tools update which leaves the binaries alone
+        checkpoints.runStep(journal, "installMasternode", lambda: install(channel, config, facts))
         
         # Create user for masternode
-        createUser(channel, config["Coin"]["Name"])
+        checkpoints.runStep(journal, "createUser", lambda: createUser(channel, config["Coin"]["Name"], facts))
     finally:
         # Close ssh connection
         closeChannel(channel)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import json
+import stat
+import time
+import hashlib
+import threading
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+RPC_IN_WARMUP = -28
+RPC_METHOD_NOT_FOUND = -32601
+RPC_MISC_ERROR = -1
+
+DEFAULT_HEADERS = 100000
+
+# Executables standing in for the coin binaries, they forward to the fake daemon over JSON-RPC
+CLI_SCRIPT = """#!{python}
+import sys, json
+from urllib.request import Request, urlopen
+
+def parse(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+payload = {{"id": 0, "method": sys.argv[1], "params": [parse(value) for value in sys.argv[2:]]}}
+request = Request("http://127.0.0.1:{port}/", json.dumps(payload).encode("utf-8"))
+
+try:
+    response = json.loads(urlopen(request).read().decode("utf-8"))
+except Exception as e:
+    response = json.loads(e.read().decode("utf-8")) if hasattr(e, "read") else {{"error": {{"message": str(e)}}}}
+
+if response.get("error"):
+    sys.stderr.write("error: {{0}}\\n".format(response["error"]["message"]))
+    sys.exit(1)
+
+result = response["result"]
+print(result if isinstance(result, str) else json.dumps(result, indent=2))
+"""
+
+DAEMON_SCRIPT = """#!{python}
+import json
+from urllib.request import Request, urlopen
+
+# Like the real daemon started with -daemon, return as soon as the daemon is started
+payload = {{"id": 0, "method": "benchmark-start", "params": []}}
+urlopen(Request("http://127.0.0.1:{port}/", json.dumps(payload).encode("utf-8"))).read()
+"""
+
+class RpcError(Exception):
+    """Error returned to the client in the JSON-RPC error object."""
+
+    def __init__(self, code, message):
+        super(RpcError, self).__init__(message)
+        self.code = code
+
+class FakeCoin(object):
+    """In-memory wallet and chain answering the RPC calls made by the utility.
+
+    The chain syncs linearly over syncTime seconds once the daemon is started, after a
+    warmup during which calls fail with the warmup error like the real daemon. A new block is
+    then found every blockTime seconds, collateral outputs are only listed by masternode outputs
+    once they have the required confirmations.
+    """
+
+    def __init__(self, balance, collateral, warmupTime=0.0, syncTime=0.0, blockTime=0.0, confirmations=0, headers=DEFAULT_HEADERS):
+        self.lock = threading.Lock()
+        self.newBlock = threading.Condition(self.lock)
+
+        self.collateral = collateral
+        self.confirmations = confirmations
+
+        self.warmupTime = warmupTime
+        self.syncTime = syncTime
+        self.blockTime = blockTime
+        self.headers = headers
+
+        self.startedAt = None
+        self.addresses = dict()
+        self.unspent = [{"txid": "funding", "vout": 0, "address": "funding", "amount": balance, "height": 0}]
+        self.keys = 0
+        self.transactions = 0
+        self.started = list()
+
+        self.stats = {"requests": 0, "calls": 0, "connections": 0}
+
+    def getChain(self):
+        """Get the (blocks, headers) tuple of the chain at the current time."""
+        elapsed = time.time() - self.startedAt - self.warmupTime
+
+        if elapsed < self.syncTime:
+            return (int(self.headers * max(0.0, elapsed / self.syncTime)), self.headers)
+
+        found = int((elapsed - self.syncTime) / self.blockTime) if self.blockTime > 0 else 0
+        return (self.headers + found, self.headers + found)
+
+    def getBlocks(self):
+        return self.getChain()[0]
+
+    def isConfirmed(self, output):
+        return self.blockTime <= 0 or self.getBlocks() - output["height"] >= self.confirmations
+
+    def dispatch(self, method, params):
+        """Execute a single call.
+
+        Args:
+            method (str): The name of the RPC method.
+            params (list): The parameters of the call.
+
+        Returns:
+            Obj: The result of the call.
+        """
+        with self.lock:
+            self.stats["calls"] += 1
+
+            if method == "benchmark-start":
+                if self.startedAt is None:
+                    self.startedAt = time.time()
+                return None
+
+            if self.startedAt is None:
+                raise RpcError(RPC_IN_WARMUP, "Daemon is not running")
+
+            if time.time() - self.startedAt < self.warmupTime:
+                raise RpcError(RPC_IN_WARMUP, "Loading block index...")
+
+            handler = getattr(self, "rpc_" + method.replace("-", "_"), None)
+            if handler is None:
+                raise RpcError(RPC_METHOD_NOT_FOUND, "Method not found")
+
+            return handler(*params)
+
+    def rpc_getblockchaininfo(self):
+        blocks, headers = self.getChain()
+        return {"blocks": blocks, "headers": headers, "bestblockhash": "{0:064x}".format(blocks),
+                "verificationprogress": float(blocks) / headers, "initialblockdownload": blocks < headers}
+
+    def rpc_waitfornewblock(self, timeout=0):
+        blocks = self.getBlocks()
+        deadline = time.time() + (timeout / 1000.0 if timeout > 0 else 3600)
+
+        while self.getBlocks() == blocks and time.time() < deadline:
+            if self.blockTime > 0:
+                # Wake up right after the next block is found
+                elapsed = time.time() - self.startedAt - self.warmupTime - self.syncTime
+                nextBlock = (int(elapsed / self.blockTime) + 1) * self.blockTime - elapsed
+            else:
+                nextBlock = deadline - time.time()
+
+            self.newBlock.wait(max(0.0, min(nextBlock + 0.001, deadline - time.time())))
+
+        blocks = self.getBlocks()
+        return {"hash": "{0:064x}".format(blocks), "height": blocks}
+
+    def rpc_getblockheader(self, blockHash):
+        return {"hash": blockHash, "time": int(time.time())}
+
+    def rpc_getinfo(self):
+        return {"blocks": self.getBlocks()}
+
+    def rpc_getbalance(self):
+        return sum(output["amount"] for output in self.unspent)
+
+    def rpc_listunspent(self, minconf=1, maxconf=9999999, addresses=None):
+        return [output for output in self.unspent if addresses is None or output["address"] in addresses]
+
+    def rpc_getnewaddress(self, label=""):
+        address = "addr{0}".format(len(self.addresses))
+        self.addresses[address] = label
+        return address
+
+    def rpc_walletpassphrase(self, passphrase, timeout):
+        return None
+
+    def send(self, amounts):
+        """Create a transaction spending the funding and change outputs.
+
+        Args:
+            amounts (list): List of (address, amount) tuples, one output each.
+
+        Returns:
+            String: The txid of the transaction.
+        """
+        spendable = [output for output in self.unspent if output["address"] in ("funding", "change")]
+        available = sum(output["amount"] for output in spendable)
+        total = sum(float(amount) for address, amount in amounts)
+
+        if total > available:
+            raise RpcError(RPC_MISC_ERROR, "Insufficient funds")
+
+        self.transactions += 1
+        txid = "{0:064x}".format(self.transactions)
+
+        self.unspent = [output for output in self.unspent if output not in spendable]
+        for vout, (address, amount) in enumerate(amounts + [("change", available - total)]):
+            self.unspent.append({"txid": txid, "vout": vout, "address": address, "amount": float(amount), "height": self.getBlocks()})
+
+        return txid
+
+    def rpc_sendtoaddress(self, address, amount):
+        return self.send([(address, amount)])
+
+    def rpc_sendmany(self, account, amounts):
+        # Shuffled like the real wallet does, the output order must not be relied upon
+        return self.send(sorted(amounts.items(), key=lambda item: hashlib.sha256(item[0].encode("utf-8")).digest()))
+
+    def rpc_masternode(self, command, *args):
+        if command == "genkey":
+            self.keys += 1
+            return "masternodekey{0}".format(self.keys)
+
+        elif command == "outputs":
+            return [{"txhash": output["txid"], "outputidx": output["vout"]} for output in self.unspent if output["amount"] == self.collateral and self.isConfirmed(output)]
+
+        elif command == "start-alias":
+            self.started.append(args[0])
+            return {"alias": args[0], "result": "successful"}
+
+        raise RpcError(RPC_MISC_ERROR, "Unknown masternode command")
+
+    def rpc_stop(self):
+        self.startedAt = None
+        return "Cosmos server stopping"
+
+class RpcHandler(BaseHTTPRequestHandler):
+    """JSON-RPC 1.0 over HTTP/1.1 with keep-alive and batch support."""
+
+    protocol_version = "HTTP/1.1"
+
+    # The headers and the body are written separately, don't let the body wait for an ack
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        self.server.coin.stats["connections"] += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def call(self, request):
+        try:
+            return {"id": request.get("id"), "result": self.server.coin.dispatch(request["method"], request.get("params", [])), "error": None}
+        except RpcError as e:
+            return {"id": request.get("id"), "result": None, "error": {"code": e.code, "message": str(e)}}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+
+        requests = body if isinstance(body, list) else [body]
+        if self.server.coin.startedAt is None and all(request.get("method") != "benchmark-start" for request in requests):
+            # Like a daemon that is not running, don't answer at all
+            self.close_connection = True
+            return
+
+        self.server.coin.stats["requests"] += 1
+
+        if isinstance(body, list):
+            response, status = [self.call(request) for request in body], 200
+        else:
+            response = self.call(body)
+            status = 200 if response["error"] is None else 500
+
+        data = json.dumps(response).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class RpcServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def serve(coin):
+    """Serve the fake daemon on a free local port.
+
+    Args:
+        coin (obj): The FakeCoin answering the calls.
+
+    Returns:
+        Obj: The running server, its port is server_address[1].
+    """
+    server = RpcServer(("127.0.0.1", 0), RpcHandler)
+    server.coin = coin
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def writeScript(path, contents):
+    with open(path, "w") as f:
+        f.write(contents)
+
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+def createWallet(homeDirectory, userDirectory, port, config):
+    """Lay out the local wallet installation expected by the utility.
+
+    Args:
+        homeDirectory (str): The directory the home environment variable points to.
+        userDirectory (str): The directory the user environment variable points to.
+        port (int): The port of the fake daemon.
+        config (dict): Dictionary containing the options parsed by the utility.
+    """
+    binaries = os.path.join(homeDirectory, "daemon")
+    os.makedirs(binaries, exist_ok=True)
+    os.makedirs(userDirectory, exist_ok=True)
+
+    writeScript(os.path.join(binaries, config["Coin"]["Cli"]), CLI_SCRIPT.format(python=sys.executable, port=port))
+    writeScript(os.path.join(binaries, config["Coin"]["Daemon"]), DAEMON_SCRIPT.format(python=sys.executable, port=port))
+
+    with open(os.path.join(userDirectory, config["Wallet"]["WalletConf"]), "w") as f:
+        f.write("rpcuser=benchmark\nrpcpassword=benchmark\nrpcport={0}\n".format(port))
+
+    open(os.path.join(userDirectory, config["Wallet"]["MasternodeConf"]), "w").close()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import json
+import time
+import tarfile
+import hashlib
+import threading
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+RELEASE_TAG = "v1.0.0"
+RELEASE_ETAG = "\"benchmark-release\""
+
+def buildRelease(daemonName, cliName, size):
+    """Build a release archive laid out like the coin releases (<dir>/bin/<binaries>).
+
+    Args:
+        daemonName (str): The name of the daemon binary.
+        cliName (str): The name of the cli binary.
+        size (int): The size of each binary, padding makes the transfer times realistic.
+
+    Returns:
+        Bytes: The .tar.gz archive.
+    """
+    data = io.BytesIO()
+
+    with tarfile.open(fileobj=data, mode="w:gz") as archive:
+        for name in (daemonName, cliName):
+            # Random contents so that compression does not hide the transfer size
+            contents = hashlib.sha256(name.encode("utf-8")).digest() * (size // 32)
+
+            info = tarfile.TarInfo("cosmos-{0}/bin/{1}".format(RELEASE_TAG, name))
+            info.size = len(contents)
+            info.mode = 0o755
+            info.mtime = time.time()
+
+            archive.addfile(info, io.BytesIO(contents))
+
+    return data.getvalue()
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    """Answer the latest release lookup and the asset downloads."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, data, headers=None):
+        self.send_response(status)
+
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.stats["requests"] += 1
+
+        if self.path.endswith("/releases/latest"):
+            if self.headers.get("If-None-Match") == RELEASE_ETAG:
+                self.send(304, b"", {"ETag": RELEASE_ETAG})
+                return
+
+            release = {"tag_name": RELEASE_TAG, "assets": [{"name": server.assetName,
+                       "browser_download_url": "http://127.0.0.1:{0}/download/{1}".format(server.server_address[1], server.assetName),
+                       "digest": "sha256:" + hashlib.sha256(server.asset).hexdigest()}]}
+
+            self.send(200, json.dumps(release).encode("utf-8"), {"Content-Type": "application/json", "ETag": RELEASE_ETAG})
+
+        elif self.path.endswith("/download/" + server.assetName):
+            with server.lock:
+                server.stats["downloads"] += 1
+
+            self.send(200, server.asset, {"Content-Type": "application/octet-stream"})
+
+        else:
+            self.send(404, b"Not found")
+
+class ReleaseServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def serve(assetName, asset):
+    """Serve a single release on a free local port.
+
+    Args:
+        assetName (str): The name of the release asset.
+        asset (bytes): The contents of the release asset.
+
+    Returns:
+        Obj: The running server, use getApiUrl for the api base url.
+    """
+    server = ReleaseServer(("127.0.0.1", 0), ReleaseHandler)
+    server.assetName = assetName
+    server.asset = asset
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "downloads": 0}
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def getApiUrl(server):
+    return "http://127.0.0.1:{0}".format(server.server_address[1])
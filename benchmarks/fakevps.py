@@ -0,0 +1,608 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import io
+import json
+import time
+import shutil
+import socket
+import tarfile
+import hashlib
+import struct
+import types
+import paramiko
+import tempfile
+import threading
+
+from urllib.request import urlopen
+
+# The agent sent by the utility, run against the emulated host rather than executed
+AGENT_COMMAND_PATTERN = r"^echo \"(\w+)  (\S+)\" \| sha256sum -c --status - 2> /dev/null \|\| exit (\d+); python3 \2$"
+
+# Directories present on a fresh VPS
+BASE_DIRECTORIES = ("/tmp", "/root", "/home", "/usr/local/bin")
+
+LSB_RELEASE_OUTPUT = "Distributor ID:\tUbuntu\nDescription:\tUbuntu 16.04.5 LTS\nRelease:\t16.04\nCodename:\t{0}\n"
+DEBUG_LOG_OUTPUT = "2018-06-01 12:00:00 Cosmos version v1.0.0\n2018-06-01 12:00:05 init message: Done loading\n" \
+                   "2018-06-01 12:00:06 CActiveMasternode::ManageStatus() - Not capable masternode: waiting for remote activation\n"
+
+# Generating a host key is slow, every emulated host shares the same one
+hostKey = None
+hostKeyLock = threading.Lock()
+
+def getHostKey():
+    global hostKey
+
+    with hostKeyLock:
+        if hostKey is None:
+            hostKey = paramiko.RSAKey.generate(2048)
+
+        return hostKey
+
+class Stats(object):
+    """Counters shared by every emulated host, one round trip is one exec or SFTP request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"connections": 0, "commands": 0, "sftp": 0, "unknown": 0}
+        self.unknownCommands = list()
+
+    def add(self, name, count=1):
+        with self.lock:
+            self.counters[name] += count
+
+    def addUnknown(self, command):
+        with self.lock:
+            self.counters["unknown"] += 1
+            self.unknownCommands.append(command)
+
+class FakeVps(object):
+    """A single emulated VPS: an SSH server listening on a local port with its own filesystem
+    and process table. The commands issued by the utility are emulated rather than executed.
+
+    Args:
+        stats (obj): The Stats shared by all hosts.
+        codeName (str): The ubuntu release code name reported.
+        latency (float): Seconds added to every exec and SFTP request, emulating the network.
+        aptDelay (float): Seconds taken by the apt-get commands.
+        warmupTime (float): Seconds after start before the daemon answers RPC calls.
+        stopTime (float): Seconds after stop before the daemon process exits.
+    """
+
+    def __init__(self, stats, codeName, latency=0.0, aptDelay=0.0, warmupTime=0.0, stopTime=0.0):
+        self.stats = stats
+        self.codeName = codeName
+        self.latency = latency
+        self.aptDelay = aptDelay
+        self.warmupTime = warmupTime
+        self.stopTime = stopTime
+
+        self.root = tempfile.mkdtemp(prefix="fakevps-")
+        for directory in BASE_DIRECTORIES:
+            os.makedirs(self.getPath(directory))
+        self.lock = threading.Lock()
+
+        self.users = set(["root"])
+        self.binaries = set()
+        self.daemonName = None
+        self.daemonStartedAt = None
+        self.daemonStoppedAt = None
+
+        self.commands = [
+            (r"^lsb_release -a$", self.lsbRelease),
+            (r"^apt-get ", self.aptGet),
+            (r"^command -v (\S+)$", self.commandExists),
+            (r"^ps cax \| grep (\S+) > /dev/null$", self.isProcessRunning),
+            (r"^sha256sum (\S+)$", self.sha256sum),
+            (r"^mkdir -p /home/(\S+) && tar xvzf (\S+) --strip-components=1 -C \S+ && cp \S+ /usr/local/bin && rm -f \S+$", self.installFromFile),
+            (r"^mkdir -p /home/(\S+) && wget -qO- (\S+) \| tar xvz --strip-components=1 -C \S+ && cp \S+ /usr/local/bin$", self.installFromUrl),
+            (r"^mkdir -p (\S+) && tar xzf (\S+) -C \S+ && rm -f \S+$", self.extractSnapshot),
+            (r"^id -u (\S+)$", self.userId),
+            (r"^useradd (\S+)$", self.userAdd),
+            (r"^chmod -R 777 (\S+)$", self.chmod),
+            (r"^rm -rf? (\S+)$", self.remove),
+            (r"^test -d (\S+)$", self.isDirectory),
+            (r"^su -c \"(\S+) -daemon\" (\S+)$", self.startDaemon),
+            (r"^su -c \"(\S+) stop\" (\S+)$", self.stopDaemon),
+            (r"^su -c \"(\S+) getinfo\" (\S+)(?: > /dev/null)?$", self.getInfo),
+            (r"^timeout (\d+) tail -n \+1 -F (\S+) 2> /dev/null$", self.tailLog),
+            (r"^echo \"codename=.* echo \"binary\.(\S+)=\$\(command -v \S+\)\"; echo \"binary\.(\S+)=.*\$\(id -u (\S+) 2> /dev/null", self.gatherFacts),
+            (r"^ps cax \| grep (\S+) > /dev/null && echo running \|\| echo stopped; su -c \"(\S+) getblockcount\" (\S+) .*; df -Pk (\S+) \| tail -n 1$", self.health),
+        ]
+
+        self.socket = socket.socket()
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.listen(16)
+        self.port = self.socket.getsockname()[1]
+
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                connection, address = self.socket.accept()
+            except OSError:
+                return
+
+            self.stats.add("connections")
+
+            transport = FakeTransport(connection)
+            transport.add_server_key(getHostKey())
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, FakeSftp, self)
+            transport.start_server(server=FakeSshServer(self))
+
+    def close(self):
+        self.socket.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def getPath(self, path):
+        """Map an absolute path on the emulated host to the local directory holding its files."""
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))
+
+    def isDaemonRunning(self):
+        return self.daemonStartedAt is not None and (self.daemonStoppedAt is None or time.time() < self.daemonStoppedAt)
+
+    def execute(self, command):
+        """Emulate a command.
+
+        Args:
+            command (str): The command sent by the utility.
+
+        Returns:
+            3-Tuple: Tuple containing the exit status, stdout and stderr.
+        """
+        self.stats.add("commands")
+        time.sleep(self.latency)
+
+        return self.dispatch(command)
+
+    def dispatch(self, command):
+        """Emulate a command run on the host itself, which costs no round trip."""
+        for pattern, handler in self.commands:
+            match = re.match(pattern, command)
+
+            if match:
+                with self.lock:
+                    result = handler(*match.groups())
+
+                if isinstance(result, int):
+                    return (result, "", "")
+
+                return result
+
+        self.stats.addUnknown(command)
+        return (127, "", "bash: {0}: command not found\n".format(command.split(" ")[0]))
+
+    def runAgent(self, checksum, path, missingStatus, channel):
+        """Run the agent sent by the utility, streaming its events over the channel.
+
+        The uploaded file is loaded and its plan executed against the emulated host, so that the
+        agent logic is the one of the utility while its commands are emulated.
+
+        Args:
+            checksum (str): The checksum the agent is verified against before it is run.
+            path (str): The path of the agent on the emulated host.
+            missingStatus (str): The exit status of the command when the agent is missing or altered.
+            channel (obj): The paramiko channel of the exec request, the plan is read from it.
+
+        Returns:
+            3-Tuple: Tuple containing the exit status, stdout and stderr.
+        """
+        self.stats.add("commands")
+        time.sleep(self.latency)
+
+        if self.sha256sum(path)[1].split(" ")[0] != checksum:
+            return (int(missingStatus), "", "")
+
+        agent = types.ModuleType("agent")
+        with open(self.getPath(path)) as f:
+            exec(compile(f.read(), path, "exec"), agent.__dict__)
+
+        data = b""
+        for chunk in iter(lambda: channel.recv(32768), b""):
+            data += chunk
+
+        def emit(event):
+            channel.sendall((json.dumps(event) + "\n").encode("utf-8"))
+
+        return (agent.runPlan(json.loads(data.decode("utf-8")), FakeAgentHost(self, agent), emit), "", "")
+
+    def lsbRelease(self):
+        return (0, LSB_RELEASE_OUTPUT.format(self.codeName), "No LSB modules are available.\n")
+
+    def aptGet(self):
+        time.sleep(self.aptDelay)
+        return (0, "Reading package lists... Done\n", "")
+
+    def commandExists(self, name):
+        return 0 if name in self.binaries else 1
+
+    def isProcessRunning(self, name):
+        return 0 if self.isDaemonRunning() and name in self.daemonName else 1
+
+    def sha256sum(self, path):
+        try:
+            with open(self.getPath(path), "rb") as f:
+                checksum = hashlib.sha256(f.read()).hexdigest()
+        except IOError:
+            return (1, "", "sha256sum: {0}: No such file or directory\n".format(path))
+
+        return (0, "{0}  {1}\n".format(checksum, path), "")
+
+    def extract(self, archive, directory, stripComponents):
+        with tarfile.open(fileobj=archive, mode="r:gz") as f:
+            for member in f.getmembers():
+                parts = member.name.split("/")[stripComponents:]
+                if not parts or not member.isfile():
+                    continue
+
+                path = self.getPath(os.path.join(directory, *parts))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                with open(path, "wb") as destination:
+                    destination.write(f.extractfile(member).read())
+
+    def install(self, coinName, archive):
+        self.extract(archive, "/home/" + coinName, 1)
+
+        binaries = self.getPath("/home/{0}/bin".format(coinName))
+        self.binaries.update(os.listdir(binaries))
+
+        for name in os.listdir(binaries):
+            os.makedirs(self.getPath("/usr/local/bin"), exist_ok=True)
+            shutil.copy(os.path.join(binaries, name), self.getPath("/usr/local/bin"))
+
+    def installFromFile(self, coinName, path):
+        try:
+            with open(self.getPath(path), "rb") as f:
+                self.install(coinName, io.BytesIO(f.read()))
+        except IOError:
+            return (2, "", "tar: {0}: Cannot open: No such file or directory\n".format(path))
+
+        os.remove(self.getPath(path))
+        return 0
+
+    def installFromUrl(self, coinName, url):
+        self.install(coinName, io.BytesIO(urlopen(url).read()))
+        return 0
+
+    def extractSnapshot(self, directory, path):
+        with open(self.getPath(path), "rb") as f:
+            self.extract(f, directory, 0)
+
+        os.remove(self.getPath(path))
+        return 0
+
+    def userId(self, name):
+        return (0, "1000\n", "") if name in self.users else (1, "", "id: '{0}': no such user\n".format(name))
+
+    def userAdd(self, name):
+        self.users.add(name)
+        return 0
+
+    def chmod(self, path):
+        return 0
+
+    def remove(self, path):
+        path = self.getPath(path)
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+        return 0
+
+    def isDirectory(self, path):
+        return 0 if os.path.isdir(self.getPath(path)) else 1
+
+    def startDaemon(self, daemonName, user):
+        if posixBasename(daemonName) not in self.binaries:
+            return (127, "", "{0}: command not found\n".format(daemonName))
+
+        self.daemonName = daemonName
+        self.daemonStartedAt = time.time()
+        self.daemonStoppedAt = None
+
+        return (0, "Cosmos server starting\n", "")
+
+    def stopDaemon(self, cli, user):
+        if not self.isDaemonRunning():
+            return (1, "", "error: couldn't connect to server\n")
+
+        self.daemonStoppedAt = time.time() + self.stopTime
+        return (0, "Cosmos server stopping\n", "")
+
+    def getInfo(self, cli, user):
+        if not self.isDaemonRunning() or time.time() - self.daemonStartedAt < self.warmupTime:
+            return (1, "", "error: couldn't connect to server\n")
+
+        return (0, json.dumps({"blocks": 0}), "")
+
+    def tailLog(self, timeout, path):
+        # The daemon logs that it waits for remote activation once it answers RPC calls
+        if not self.isDaemonRunning():
+            time.sleep(int(timeout))
+            return (124, "", "")
+
+        time.sleep(max(0.0, self.daemonStartedAt + self.warmupTime - time.time()))
+        return (0, DEBUG_LOG_OUTPUT, "")
+
+    def gatherFacts(self, daemonName, cli, user):
+        lines = ["codename={0}".format(self.codeName), "description=Ubuntu 16.04.5 LTS"]
+
+        for name in (daemonName, cli):
+            lines.append("binary.{0}={1}".format(name, "/usr/local/bin/" + name if name in self.binaries else ""))
+
+        running = self.isDaemonRunning()
+        lines.append("version={0}".format("Cosmos Core Daemon version v1.0.0" if daemonName in self.binaries else ""))
+        lines.append("processes=bash sshd systemd{0}".format(" " + posixBasename(self.daemonName) if running else ""))
+        lines.append("uid={0}".format("1000" if user in self.users else ""))
+        lines.append("disk=/dev/vda1 20509264 4123456 16385808 21% /")
+        lines.append("memory=MemTotal: 2048000 kB MemAvailable: 1536000 kB ")
+
+        return (0, "\n".join(lines) + "\n", "")
+
+    def health(self, daemonName, cli, user, path):
+        running = self.isDaemonRunning() and daemonName in self.daemonName
+        ready = running and time.time() - self.daemonStartedAt >= self.warmupTime
+
+        lines = ["running" if running else "stopped"]
+        lines.append(str(int(time.time()) // 60) if ready else "")
+        lines.append(json.dumps({"status": "Masternode successfully started"}) if ready else "")
+        lines.append("/dev/vda1 20509264 4123456 16385808 21% /")
+
+        return (0, "\n".join(lines) + "\n", "")
+
+    def provision(self, coinName, daemonName):
+        """Put the host in the state left by the utility, with the masternode daemon running."""
+        with self.lock:
+            self.users.add(coinName)
+            self.binaries.add(daemonName)
+            self.daemonName = daemonName
+            self.daemonStartedAt = time.time() - self.warmupTime
+
+def posixBasename(path):
+    return path.rsplit("/", 1)[-1]
+
+class FakeAgentHost(object):
+    """The host the agent runs on, backed by an emulated VPS.
+
+    Args:
+        vps (obj): The FakeVps the agent was sent to.
+        agent (obj): The agent module, as loaded from the file sent by the utility.
+    """
+
+    def __init__(self, vps, agent):
+        self.vps = vps
+        self.agent = agent
+
+    def run(self, command, onLine=None):
+        exitStatus, output, errors = self.vps.dispatch(command)
+
+        if onLine is None:
+            return (exitStatus, output, errors)
+
+        for line in (output + errors).splitlines(True):
+            onLine(line)
+
+        return (exitStatus, output + errors, "")
+
+    def exists(self, path):
+        return os.path.exists(self.vps.getPath(path))
+
+    def readFile(self, path):
+        try:
+            with open(self.vps.getPath(path)) as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def writeFile(self, path, contents):
+        os.makedirs(os.path.dirname(self.vps.getPath(path)), exist_ok=True)
+
+        with open(self.vps.getPath(path), "w") as f:
+            f.write(contents)
+
+    def waitForLog(self, path, pattern, timeout):
+        # Same as following the log with tail, the activation line is logged once the daemon answers RPC calls
+        exitStatus, output, errors = self.vps.tailLog(timeout, path)
+
+        for line in output.split("\n"):
+            if re.search(pattern, line):
+                return line
+
+        raise self.agent.StepError("Timed out after {0} seconds waiting for {1} in {2}".format(timeout, pattern, path))
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class FakeTransport(paramiko.Transport):
+    """Server transport signalling when an exec request was acknowledged.
+
+    A real server only sends the output of a command once it accepted the request, the client
+    fails with "Channel closed" if the output and exit status arrive first.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FakeTransport, self).__init__(*args, **kwargs)
+        self.acknowledged = dict()
+
+    def _send_user_message(self, data):
+        paramiko.Transport._send_user_message(self, data)
+
+        message = data.asbytes()
+        if message[:1] == bytes([paramiko.common.MSG_CHANNEL_SUCCESS]):
+            event = self.acknowledged.pop(struct.unpack(">I", message[1:5])[0], None)
+
+            if event is not None:
+                event.set()
+
+class FakeSshServer(paramiko.ServerInterface):
+    """Accepts any password and runs the exec requests through the emulated host."""
+
+    def __init__(self, vps):
+        self.vps = vps
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_subsystem_request(self, channel, name):
+        self.vps.stats.add("sftp")
+        return paramiko.ServerInterface.check_channel_subsystem_request(self, channel, name)
+
+    def check_channel_exec_request(self, channel, command):
+        acknowledged = channel.transport.acknowledged[channel.remote_chanid] = threading.Event()
+
+        def run():
+            acknowledged.wait(5)
+
+            try:
+                agent = re.match(AGENT_COMMAND_PATTERN, command.decode("utf-8"))
+
+                if agent:
+                    exitStatus, output, errors = self.vps.runAgent(agent.group(1), agent.group(2), agent.group(3), channel)
+                else:
+                    exitStatus, output, errors = self.vps.execute(command.decode("utf-8"))
+
+                channel.sendall(output.encode("utf-8"))
+                channel.sendall_stderr(errors.encode("utf-8"))
+                channel.send_exit_status(exitStatus)
+                channel.close()
+            except (EOFError, OSError):
+                # The client disconnected meanwhile
+                pass
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+class FakeSftpHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+class FakeSftp(paramiko.SFTPServerInterface):
+    """SFTP requests served from the directory holding the files of the emulated host."""
+
+    def __init__(self, server, vps):
+        paramiko.SFTPServerInterface.__init__(self, server)
+        self.vps = vps
+
+    def request(self, function, *args):
+        self.vps.stats.add("sftp")
+        time.sleep(self.vps.latency)
+
+        try:
+            return function(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        return self.request(lambda: paramiko.SFTPAttributes.from_stat(os.stat(self.vps.getPath(path))))
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        def openFile():
+            localPath = self.vps.getPath(path)
+            fd = os.open(localPath, flags, 0o644)
+
+            if flags & os.O_WRONLY:
+                mode = "ab" if flags & os.O_APPEND else "wb"
+            elif flags & os.O_RDWR:
+                mode = "a+b" if flags & os.O_APPEND else "r+b"
+            else:
+                mode = "rb"
+
+            handle = FakeSftpHandle(flags)
+            handle.filename = localPath
+            handle.readfile = handle.writefile = os.fdopen(fd, mode)
+            return handle
+
+        return self.request(openFile)
+
+    def remove(self, path):
+        return self.request(lambda: os.remove(self.vps.getPath(path)) or paramiko.SFTP_OK)
+
+    def rename(self, oldPath, newPath):
+        return self.request(lambda: os.rename(self.vps.getPath(oldPath), self.vps.getPath(newPath)) or paramiko.SFTP_OK)
+
+    posix_rename = rename
+
+    def mkdir(self, path, attr):
+        mode = attr.st_mode & 0o7777 if attr.st_mode is not None else 0o777
+        return self.request(lambda: os.mkdir(self.vps.getPath(path), mode) or paramiko.SFTP_OK)
+
+    def chattr(self, path, attr):
+        if attr.st_mode is not None:
+            return self.request(lambda: os.chmod(self.vps.getPath(path), attr.st_mode & 0o7777) or paramiko.SFTP_OK)
+
+        return paramiko.SFTP_OK
+
+class FakeFleet(object):
+    """A set of emulated hosts, addressed by made up IP addresses.
+
+    Args:
+        count (int): The number of hosts.
+        kwargs (dict): The options of each FakeVps.
+    """
+
+    def __init__(self, count, **kwargs):
+        self.stats = Stats()
+        self.hosts = dict()
+
+        for index in range(count):
+            self.hosts["10.0.{0}.{1}".format(index // 250, index % 250 + 1)] = FakeVps(self.stats, **kwargs)
+
+        self.originalConnect = None
+
+    def install(self):
+        """Route the SSH connections of the utility to the emulated hosts."""
+        fleet = self
+        self.originalConnect = originalConnect = paramiko.SSHClient.connect
+
+        def connect(client, hostname, port=22, *args, **kwargs):
+            if hostname in fleet.hosts:
+                hostname, port = "127.0.0.1", fleet.hosts[hostname].port
+
+            kwargs.setdefault("look_for_keys", False)
+            kwargs.setdefault("allow_agent", False)
+            return originalConnect(client, hostname, port, *args, **kwargs)
+
+        paramiko.SSHClient.connect = connect
+
+    def close(self):
+        if self.originalConnect is not None:
+            paramiko.SSHClient.connect = self.originalConnect
+
+        for host in self.hosts.values():
+            host.close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Fleet health monitor benchmark, run from the repository root:
+
+    python -m benchmarks.monitoring --hosts 100 500
+
+The masternodes are emulated in process (see fakevps), already provisioned and running.
+Each cycle reports the wall time and the SSH round trips it made, the first cycle of a
+scenario includes establishing the pooled connections.
+"""
+
+import time
+import logging
+import argparse
+
+from MasternodeSetup import vps
+from MasternodeSetup import fleet
+from MasternodeSetup import monitor
+from MasternodeSetup import settings
+from MasternodeSetup import masternode
+
+from . import fakevps
+
+DESCRIPTION = "Benchmark the fleet health monitor against emulated masternodes"
+
+DEFAULT_HOSTS = [100, 500]
+DEFAULT_CYCLES = 3
+DEFAULT_LATENCY_SEC = 0.02
+
+VPS_PASSWORD = "benchmark"
+
+def runScenario(count, options):
+    """Run monitor cycles over the specified number of emulated masternodes.
+
+    Args:
+        count (int): The number of hosts.
+        options (obj): The parsed command line options.
+
+    Returns:
+        List: The measurements of each cycle.
+    """
+    config = settings.getConfig()
+
+    hosts = fakevps.FakeFleet(count, codeName=config["VPS"]["UbuntuCodename"], latency=options.latency)
+    hosts.install()
+
+    for host in hosts.hosts.values():
+        host.provision(config["Coin"]["Name"], config["Coin"]["Daemon"])
+
+    nodes = [fleet.Node("mn{0}".format(index + 1), host, masternode.ROOT_USER, VPS_PASSWORD) for index, host in enumerate(sorted(hosts.hosts))]
+
+    results = list()
+
+    try:
+        for cycle in range(options.cycles):
+            counters = dict(hosts.stats.counters)
+            start = time.time()
+
+            samples = monitor.runCycle(nodes, config, options.workers)
+
+            wall = time.time() - start
+            healthy = len([sample for sample in samples if sample.get("running") and sample.get("height") is not None])
+
+            result = {"hosts": count, "cycle": cycle + 1, "wall": wall, "healthy": healthy}
+            result.update((name, value - counters[name]) for name, value in hosts.stats.counters.items())
+            results.append(result)
+    finally:
+        vps.closeAllChannels()
+        hosts.close()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+
+    parser.add_argument("--hosts", type=int, nargs="+", default=DEFAULT_HOSTS, help="The number of hosts of each scenario")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES, help="The number of cycles of each scenario")
+    parser.add_argument("--workers", type=int, default=monitor.DEFAULT_WORKERS, help="The maximum number of hosts checked concurrently")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY_SEC, help="Seconds added to every SSH exec")
+
+    options = parser.parse_args()
+
+    # The emulated servers log every connection reset once the scenario is closed
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+    line = "{0:>5}  {1:>5}  {2:>7}  {3:>7}  {4:>8}  {5:>8}"
+    print(line.format("Hosts", "Cycle", "Wall", "Healthy", "SSH conn", "SSH exec"))
+
+    for count in options.hosts:
+        for result in runScenario(count, options):
+            print(line.format(result["hosts"], result["cycle"], "{0:.2f}s".format(result["wall"]), result["healthy"], result["connections"], result["commands"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""End to end provisioning benchmark, run from the repository root:
+
+    python -m benchmarks.provisioning --hosts 1 10 100
+
+The VPS instances, the local coin daemon and the github releases api are emulated in process
+(see fakevps, fakecoin and fakegithub), so no VPS, wallet or network access is needed. Each
+scenario reports the wall time, the round trips made to each emulated service and the time
+spent in deliberate sleeps.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+from MasternodeSetup import vps
+from MasternodeSetup import core
+from MasternodeSetup import fleet
+from MasternodeSetup import trace
+from MasternodeSetup import storage
+from MasternodeSetup import settings
+from MasternodeSetup import masternode
+
+from . import fakevps
+from . import fakecoin
+from . import fakegithub
+
+DESCRIPTION = "Benchmark the provisioning of masternodes against emulated VPS instances and coin daemon"
+
+DEFAULT_HOSTS = [1, 10, 100]
+DEFAULT_LATENCY_SEC = 0.02
+DEFAULT_APT_DELAY_SEC = 1.0
+DEFAULT_WARMUP_SEC = 1.0
+DEFAULT_STOP_SEC = 0.5
+DEFAULT_SYNC_SEC = 0.0
+DEFAULT_BLOCK_SEC = 1.0
+DEFAULT_CONFIRMATIONS = 1
+DEFAULT_ASSET_SIZE = 1024 * 1024
+
+VPS_PASSWORD = "benchmark"
+
+REPORT_COLUMNS = (("hosts", "Hosts", "{0}"), ("run", "Run", "{0}"), ("wall", "Wall", "{0:.2f}s"), ("connections", "SSH conn", "{0}"),
+                  ("commands", "SSH exec", "{0}"), ("sftp", "SFTP req", "{0}"), ("rpcRequests", "RPC req", "{0}"),
+                  ("rpcCalls", "RPC calls", "{0}"), ("github", "HTTP req", "{0}"), ("sleeps", "Sleeps", "{0}"),
+                  ("sleepTime", "Sleep time", "{0:.2f}s"), ("unknown", "Unknown", "{0}"))
+
+def getConfig(apiUrl, installMode, waitForActivation, useAgent):
+    """Get the utility configuration, pointed at the emulated services."""
+    config = settings.getConfig()
+
+    config["Git"]["ApiUrl"] = apiUrl
+    config["Git"]["InstallMode"] = installMode
+    config["VPS"]["WaitForActivation"] = str(waitForActivation).lower()
+    config["VPS"]["Agent"] = str(useAgent).lower()
+    config["Bootstrap"]["Snapshot"] = ""
+
+    return config
+
+@contextlib.contextmanager
+def environment(values):
+    """Set environment variables for the duration of a scenario, restoring their previous values once done."""
+    previous = dict((name, os.environ.get(name)) for name in values)
+    os.environ.update(values)
+
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def runScenario(count, options):
+    """Provision the specified number of emulated hosts with a fresh wallet and storage.
+
+    A single host goes through the same path as --name/--vps, several hosts through the
+    fleet (--inventory). With several runs, each one provisions new hosts with the same
+    wallet and storage, back to back.
+
+    Args:
+        count (int): The number of hosts.
+        options (obj): The parsed command line options.
+
+    Returns:
+        List: The measurements of each run.
+    """
+    with tempfile.TemporaryDirectory(prefix="masternode-benchmark-") as directory:
+        with environment({storage.STORAGE_DIRECTORY_ENV: os.path.join(directory, "storage")}):
+            return runScenarioIn(directory, count, options)
+
+def runScenarioIn(directory, count, options):
+    """Provision the emulated hosts with the wallet, storage and release cache kept in a directory."""
+    config = settings.getConfig()
+    collateral = float(config["Coin"]["Collateral"])
+
+    coin = fakecoin.FakeCoin(collateral * count * options.runs + 1, collateral, options.warmup, options.sync, options.block_time, options.confirmations)
+    rpcServer = fakecoin.serve(coin)
+
+    asset = fakegithub.buildRelease(config["Coin"]["Daemon"], config["Coin"]["Cli"], options.asset_size)
+    releaseServer = fakegithub.serve("cosmos-" + config["Git"]["NamePattern"], asset)
+
+    config = getConfig(fakegithub.getApiUrl(releaseServer), options.install_mode, options.wait_for_activation, options.agent)
+
+    if options.keep_wallet:
+        config["Wallet"]["KeepDaemonRunning"] = "true"
+
+    homeDirectory = os.path.join(directory, "home")
+    userDirectory = os.path.join(directory, "user")
+    fakecoin.createWallet(homeDirectory, userDirectory, rpcServer.server_address[1], config)
+
+    results = list()
+
+    try:
+        with environment({config["Environment"]["Home"]: homeDirectory, config["Environment"]["User"]: userDirectory}):
+            for run in range(options.runs):
+                results.append(runOnce(count, run + 1, config, coin, releaseServer, options))
+    finally:
+        rpcServer.shutdown()
+        releaseServer.shutdown()
+
+    return results
+
+def runOnce(count, run, config, coin, releaseServer, options):
+    """Provision new emulated hosts, measuring only this run."""
+    hosts = fakevps.FakeFleet(count, codeName=config["VPS"]["UbuntuCodename"], latency=options.latency,
+                              aptDelay=options.apt_delay, warmupTime=options.warmup, stopTime=options.stop)
+    hosts.install()
+
+    nodes = [fleet.Node("mn{0}-{1}".format(run, index + 1), host, masternode.ROOT_USER, VPS_PASSWORD) for index, host in enumerate(sorted(hosts.hosts))]
+
+    coin.stats.update(requests=0, calls=0)
+    releaseServer.stats["requests"] = 0
+
+    trace.enable()
+    start = time.time()
+
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if options.verbose else devnull):
+            core.checkPrerequisites(config)
+
+            if count == 1:
+                masternode.setupMasternode(nodes[0].name, nodes[0].host, VPS_PASSWORD, config)
+            else:
+                fleet.setup(nodes, config, options.workers)
+    finally:
+        wall = time.time() - start
+
+        vps.closeAllChannels()
+        hosts.close()
+
+    sleeps, sleepTime = trace.getTotals()[trace.SLEEP]
+
+    if hosts.stats.unknownCommands:
+        print("Commands not emulated: {0}".format(sorted(set(hosts.stats.unknownCommands))))
+
+    results = {"hosts": count, "run": run, "wall": wall, "rpcRequests": coin.stats["requests"], "rpcCalls": coin.stats["calls"],
+               "github": releaseServer.stats["requests"], "sleeps": sleeps, "sleepTime": sleepTime}
+    results.update(hosts.stats.counters)
+
+    return results
+
+def printReport(results):
+    """Print one row per scenario."""
+    rows = [[column[2].format(result[column[0]]) for column in REPORT_COLUMNS] for result in results]
+    widths = [max([len(column[1])] + [len(row[index]) for row in rows]) for index, column in enumerate(REPORT_COLUMNS)]
+
+    print("  ".join(column[1].rjust(width) for column, width in zip(REPORT_COLUMNS, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+
+    parser.add_argument("--hosts", type=int, nargs="+", default=DEFAULT_HOSTS, help="The number of hosts of each scenario")
+    parser.add_argument("--workers", type=int, default=fleet.DEFAULT_WORKERS, help="The maximum number of hosts setup concurrently")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY_SEC, help="Seconds added to every SSH exec and SFTP request")
+    parser.add_argument("--apt-delay", type=float, default=DEFAULT_APT_DELAY_SEC, help="Seconds taken by the apt-get commands")
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP_SEC, help="Seconds before a started daemon answers RPC calls")
+    parser.add_argument("--stop", type=float, default=DEFAULT_STOP_SEC, help="Seconds for a VPS daemon to exit once stopped")
+    parser.add_argument("--sync", type=float, default=DEFAULT_SYNC_SEC, help="Seconds for the local wallet to sync once started")
+    parser.add_argument("--block-time", type=float, default=DEFAULT_BLOCK_SEC, help="Seconds between two blocks once the local wallet is synced")
+    parser.add_argument("--confirmations", type=int, default=DEFAULT_CONFIRMATIONS, help="Confirmations required before a collateral is listed in the masternode outputs")
+    parser.add_argument("--asset-size", type=int, default=DEFAULT_ASSET_SIZE, help="The size in bytes of each binary of the release")
+    parser.add_argument("--install-mode", choices=(vps.INSTALL_MODE_PUSH, vps.INSTALL_MODE_DIRECT), default=vps.INSTALL_MODE_PUSH, help="How the release is installed on the VPS")
+    parser.add_argument("--wait-for-activation", action="store_true", help="Wait for each VPS daemon to be ready for remote activation")
+    parser.add_argument("--agent", action="store_true", help="Run the VPS steps with the agent")
+    parser.add_argument("--runs", type=int, default=1, help="The number of back to back runs of each scenario, sharing the wallet and storage")
+    parser.add_argument("--keep-wallet", action="store_true", help="Leave the local wallet daemon running between the runs")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the utility")
+
+    options = parser.parse_args()
+
+    results = list()
+    for count in options.hosts:
+        results.extend(runScenario(count, options))
+
+    printReport(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# MIT License
+#
+# Copyright (c) 2018 Cosmos Coin Developers, https://cosmoscoin.co/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Command line cold start benchmark, run from the repository root:
+
+    python -m benchmarks.startup
+
+Every subcommand is run in a fresh interpreter against an emulated local wallet (see fakecoin)
+and the median wall time of the runs is reported, along with a bare interpreter start.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from MasternodeSetup import settings
+
+from . import fakecoin
+
+DESCRIPTION = "Benchmark the cold start of the command line subcommands"
+
+DEFAULT_RUNS = 10
+
+SCENARIOS = (("python", ["-c", "pass"]),
+             ("conf Coin.Collateral", ["-m", "MasternodeSetup.command_line", "conf", "Coin.Collateral"]),
+             ("status", ["-m", "MasternodeSetup.command_line", "status"]),
+             ("sync-wait", ["-m", "MasternodeSetup.command_line", "sync-wait", "--quiet"]),
+             ("provision --help", ["-m", "MasternodeSetup.command_line", "provision", "--help"]))
+
+def measure(arguments, environment, runs):
+    """Run a command in fresh interpreters.
+
+    Returns:
+        Float: The median wall time in seconds.
+    """
+    times = list()
+
+    for run in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable] + arguments, env=environment, stdout=subprocess.DEVNULL)
+        times.append(time.time() - start)
+
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="The number of runs of each subcommand")
+
+    options = parser.parse_args()
+
+    config = settings.getConfig()
+
+    # A wallet that is running and synced
+    coin = fakecoin.FakeCoin(0, float(config["Coin"]["Collateral"]), 0, 0, 0, 1)
+    coin.dispatch("benchmark-start", [])
+    rpcServer = fakecoin.serve(coin)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="masternode-benchmark-") as directory:
+            run(directory, config, rpcServer, options)
+    finally:
+        rpcServer.shutdown()
+
+def run(directory, config, rpcServer, options):
+    """Measure every subcommand against a wallet kept in a directory."""
+    fakecoin.createWallet(os.path.join(directory, "home"), os.path.join(directory, "user"), rpcServer.server_address[1], config)
+
+    environment = dict(os.environ)
+    environment[config["Environment"]["Home"]] = os.path.join(directory, "home")
+    environment[config["Environment"]["User"]] = os.path.join(directory, "user")
+
+    # Run the command line of this checkout
+    paths = [os.getcwd()]
+    if environment.get("PYTHONPATH"):
+        paths.append(environment["PYTHONPATH"])
+
+    environment["PYTHONPATH"] = os.pathsep.join(paths)
+
+    print("{0:<22}  {1:>8}".format("Command", "Median"))
+
+    for name, arguments in SCENARIOS:
+        print("{0:<22}  {1:>7.0f}ms".format(name, measure(arguments, environment, options.runs) * 1000))
+
+if __name__ == "__main__":
+    main()